@@ -0,0 +1,31 @@
+import os
+import threading
+
+# Pricing backends: 'c' loads ISDA_Clib.dll through ctypes, 'c_threadsafe' is the
+# same dll behind ThreadSafeCInterface for concurrent use from threads, 'numpy'
+# runs the pure NumPy implementation in isda.numpy_model.  The default can be
+# set with the ISDA_BACKEND environment variable.
+BACKENDS = ('c', 'c_threadsafe', 'numpy')
+DEFAULT_BACKEND = os.environ.get('ISDA_BACKEND', 'c')
+
+_interfaces = {}
+_interfaces_lock = threading.Lock()
+
+
+def get_interface(backend=None):
+    """Interface of the backend, one instance per process shared by all callers."""
+    backend = backend or DEFAULT_BACKEND
+    with _interfaces_lock:
+        if backend not in _interfaces:
+            if backend == 'c':
+                from isda.c_interface import CInterface
+                _interfaces[backend] = CInterface()
+            elif backend == 'c_threadsafe':
+                from isda.thread_safe_interface import ThreadSafeCInterface
+                _interfaces[backend] = ThreadSafeCInterface()
+            elif backend == 'numpy':
+                from isda.numpy_interface import NumpyInterface
+                _interfaces[backend] = NumpyInterface()
+            else:
+                raise ValueError('Unknown backend {}, expected one of {}'.format(backend, BACKENDS))
+        return _interfaces[backend]
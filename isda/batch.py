@@ -0,0 +1,107 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import os
+
+import numpy as np
+
+from isda.portfolio import ISDAPortfolioModel
+from isda.trade_store import TradeStore
+
+# per process state of the pool workers, set by _init_worker
+_worker = {}
+
+
+def read_trade_file(path):
+    """Trade columns from a CSV file with a header row naming TRADE_COLUMNS.
+
+    Dates are ISO formatted (YYYY-MM-DD) and is_buy_protection is true/false
+    or 1/0.
+    """
+    return TradeStore.read_csv(path).columns()
+
+
+def shard_trades(trades, chunk_size):
+    """Split trade columns into chunks of about chunk_size trades that never split a reference entity.
+
+    Yields (positions, columns) with positions the rows of each chunk in the
+    input, so every chunk builds the credit curves of its own names only.
+    """
+    if chunk_size < 1:
+        raise ValueError('Chunk size must be at least 1')
+    order = np.argsort(trades['refob'], kind='stable')
+    refobs = trades['refob'][order]
+    starts = np.flatnonzero(np.concatenate(([True], refobs[1:] != refobs[:-1])))
+    ends = np.append(starts[1:], len(order))
+    first = 0
+    for start, end in zip(starts, ends):
+        if end - first > chunk_size and start > first:
+            yield _chunk(trades, order[first:start])
+            first = start
+    yield _chunk(trades, order[first:])
+
+
+def _chunk(trades, positions):
+    return positions, {name: column[positions] for name, column in trades.items()}
+
+
+def _init_worker(market, credit_spreads, credit_spread_tenors):
+    _worker['market'] = market
+    _worker['credit_spreads'] = credit_spreads
+    _worker['credit_spread_tenors'] = credit_spread_tenors
+
+
+def _price_chunk(chunk):
+    positions, trades = chunk
+    book = ISDAPortfolioModel(trades, _worker['market'], _worker['credit_spreads'], _worker['credit_spread_tenors'])
+    return positions, book.portfolio_pricer()
+
+
+class BatchRunner:
+    """Prices a trade book in reference entity shards over a pool of worker processes.
+
+    Each worker receives the market data and credit spreads once, then prices
+    whole shards with ISDAPortfolioModel.  At most max_pending shards are in
+    flight, so results stream back as they complete without the whole book
+    being queued at once.  workers=1 prices in the calling process.
+    """
+
+    def __init__(self, market, credit_spreads, credit_spread_tenors, workers=None, chunk_size=5000, max_pending=None):
+        self.market = market
+        self.credit_spreads = credit_spreads
+        self.credit_spread_tenors = credit_spread_tenors
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending
+
+    def run(self, trades):
+        """Yields (positions, results) per shard as soon as it is priced."""
+        if isinstance(trades, TradeStore):
+            trades = trades.columns()
+        chunks = shard_trades(trades, self.chunk_size)
+        if self.workers == 1:
+            _init_worker(self.market, self.credit_spreads, self.credit_spread_tenors)
+            for chunk in chunks:
+                yield _price_chunk(chunk)
+            return
+        workers = self.workers or os.cpu_count() or 1
+        max_pending = self.max_pending or 2 * workers
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.market, self.credit_spreads, self.credit_spread_tenors)) as pool:
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(pool.submit(_price_chunk, chunk))
+            for future in pending:
+                yield future.result()
+
+    def price(self, trades):
+        """portfolio_pricer results for the whole book, in trade order."""
+        if isinstance(trades, TradeStore):
+            trades = trades.columns()
+        results = {}
+        for positions, chunk_results in self.run(trades):
+            for key, values in chunk_results.items():
+                results.setdefault(key, np.empty(len(trades['refob'])))[positions] = values
+        return results
@@ -1,15 +1,13 @@
 from ctypes import *
 import os.path
 import pathlib
+import threading
 
 class CInterface:
     def __init__(self):
-       dll = str((pathlib.Path(__file__).parent).joinpath('ISDA_Clib.dll'))
-       if os.path.isfile(dll):
-           self.dll = CDLL(dll)
-       else:
-           raise RuntimeError(f"Path not found {dll}") 
-    #define the prototypes of various functions exported by dll
+       # the dll is loaded and its prototypes set once per process, see load_library
+       self.dll = load_library()
+    #the prototypes of the functions exported by dll are in PROTOTYPES below
 
     #C signature
     #int JpmcdsDateIntervalToFreq (TDateInterval *interval, double *freq); '''
@@ -20,14 +18,24 @@ class CInterface:
 
     def JpmcdsErrMsgEnableRecord(self, lines, length):
         func = self.dll.JpmcdsErrMsgEnableRecord
-        func.argtypes = [c_int, c_int]
-        func.restype = c_int
         return func(lines,length)
 
+    #C signature
+    #int JpmcdsErrMsgDisableRecord(void);
+
+    def JpmcdsErrMsgDisableRecord(self):
+        func = self.dll.JpmcdsErrMsgDisableRecord
+        return func()
+
+    #C signature
+    #char** JpmcdsErrGetMsgRecord(void);  NULL terminated lines of the record
+
+    def JpmcdsErrGetMsgRecord(self):
+        func = self.dll.JpmcdsErrGetMsgRecord
+        return func()
+
     def JpmcdsDateIntervalToFreq(self, interval, freq):
       func = self.dll.JpmcdsDateIntervalToFreq
-      func.argtypes = [POINTER(TDateInterval), POINTER(c_double)]
-      func.restype = c_int
       return func(byref(interval), freq)
 
 
@@ -36,8 +44,6 @@ class CInterface:
 
     def JpmcdsStringToDayCountConv(self, dayCountString, type):
       func = self.dll.JpmcdsStringToDayCountConv
-      func.argtypes = [POINTER(c_char), POINTER(c_long)]
-      func.restype = c_int
       return func(dayCountString.encode('utf-8'), type)
 
     #C signature
@@ -50,8 +56,6 @@ class CInterface:
 
     def JpmcdsDateFwdThenAdjust(self, date, interval, badDayMethod, holidayFile, advAdjustedDate):
       func = self.dll.JpmcdsDateFwdThenAdjust
-      func.argtypes = [c_int, POINTER(TDateInterval), c_long, POINTER(c_char), POINTER(c_int)]
-      func.restype = c_int
       return func(date, byref(interval), badDayMethod, holidayFile.encode('utf-8'), advAdjustedDate)
 
     #C signature
@@ -62,8 +66,6 @@ class CInterface:
 
     def JpmcdsStringToDateInterval(self, input, label, interval):
         func = self.dll.JpmcdsStringToDateInterval
-        func.argtypes = [POINTER(c_char), POINTER(c_char), POINTER(TDateInterval)]
-        func.restype = c_int
         return func(input.encode('utf-8'), label.encode('utf-8'), byref(interval))
 
     #C signature
@@ -75,8 +77,6 @@ class CInterface:
 
     def JpmcdsDate(self, year, month, day):
       func = self.dll.JpmcdsDate
-      func.argtypes = [c_long, c_long, c_long]
-      func.restype = c_int
       return func(year, month, day)
 
     #C signature
@@ -96,28 +96,8 @@ class CInterface:
 
     def JpmcdsBuildIRZeroCurve(self, spotDate, instrNames, dates, rates, nInstr, swapFreq, floatFreq, mmDCC, swapDCC, floatDCC, badDayConv, holidayFile):
       func = self.dll.JpmcdsBuildIRZeroCurve
-      func.argtypes = [c_int, POINTER(c_char), POINTER(c_int), POINTER(c_double), c_long, c_long, c_long, c_long, c_long, c_long, c_long, POINTER(c_char)]
-      func.restype = POINTER(TCurve)
       return func(spotDate,instrNames.encode('utf-8'),dates,rates,nInstr,mmDCC,swapFreq,floatFreq,swapDCC,floatDCC,badDayConv,holidayFile.encode('utf-8'))
 
-    #C signature
-    '''TContingentLeg* JpmcdsCdsContingentLegMake(
-        /** Date when protection begins. Either at start or end of day (depends
-            on protectStart) */
-        TDate     startDate,
-        /** Date when protection ends (end of day) */
-        TDate     endDate,
-        /** Notional value protected */
-        double    notional,
-        /** Should protection include the start date */
-        TBoolean  protectStart)'''
-
-    def JpmcdsCdsContingentLegMake(self, startDate, endDate, notional, protectStart):
-      func = self.dll.JpmcdsCdsContingentLegMake
-      func.argtypes = [c_int, c_int, c_double, c_int]
-      func.restype = POINTER(TContingentLeg)
-      return func(startDate, endDate, notional, protectStart)
-
     #C signature
     '''int JpmcdsCdsContingentLegPV(
         /** Risk starts at the end of today */
@@ -144,44 +124,8 @@ class CInterface:
 
     def JpmcdsCdsContingentLegPV(self, today, valueDate, startDate, endDate, notional, discCurve, spreadCurve, recoveryRate, protectStart, pv):
       func = self.dll.JpmcdsCdsContingentLegPV
-      func.argtypes = [c_int, c_int, c_int, c_int, c_double, POINTER(TCurve), POINTER(TCurve), c_double, c_int, POINTER(c_double)]
-      func.restype = c_int
       return func(today, valueDate, startDate, endDate, notional, discCurve, spreadCurve, recoveryRate, protectStart, pv)
 
-    #C signature
-    '''TFeeLeg* JpmcdsCdsFeeLegMake(
-        /** Date when protection begins. Either at start or end of day (depends
-            on protectStart) */
-        TDate           startDate,
-        /** Date when protection ends (end of day) */
-        TDate           endDate,
-        /** Should accrued interest be paid on default. Usually set to TRUE */
-        TBoolean        payAccOnDefault,
-        /** Interval between coupon payments. Can be NULL when 3M is assumed */
-        TDateInterval  *couponInterval,
-        /** If the startDate and endDate are not on cycle, then this parameter
-            determines location of coupon dates. */
-        TStubMethod    *stubType,
-        /** Notional value protected */
-        double          notional, 
-        /** Fixed coupon rate (a.k.a. spread) for the fee leg */
-        double          couponRate,
-        /** Day count convention for coupon payment. Normal is ACT_360 */
-        long            paymentDcc,
-        /** Bad day convention for adjusting coupon payment dates. */
-        long            badDayConv,
-        /** Calendar used when adjusting coupon dates. Can be NULL which equals
-            a calendar with no holidays and including weekends. */
-        char           *calendar,
-        /** Should protection include the start date */
-        TBoolean        protectStart)'''
-
-    def JpmcdsCdsFeeLegMake(self, startDate, endDate, payAccOnDefault, couponInterval, stubType, notional, couponRate, paymentDcc, badDayConv, calendar, protectStart):
-      func = self.dll.JpmcdsCdsFeeLegMake
-      func.argtypes = [c_int, c_int, c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_double, c_double, c_long, c_long, POINTER(c_char), c_int]
-      func.restype = POINTER(TFeeLeg)
-      return func(startDate, endDate, payAccOnDefault, couponInterval, byref(stubType), notional, couponRate, paymentDcc, badDayConv, calendar, protectStart)  #byref(couponInterval), calendar.encode('utf-8')
-
     #C signature
     '''int JpmcdsCdsFeeLegPV(
         /** Risk starts at the end of today */
@@ -227,8 +171,6 @@ class CInterface:
 
     def JpmcdsCdsFeeLegPV(self, today, valueDate, stepinDate, startDate, endDate, payAccOnDefault, couponInterval, stubType, notional, couponRate, paymentDcc, badDayConv, calendar, discCurve, spreadCurve, protectStart, isPriceClean, pv):
       func = self.dll.JpmcdsCdsFeeLegPV
-      func.argtypes = [c_int, c_int, c_int, c_int, c_int, c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_double, c_double, c_long, c_long, POINTER(c_char), POINTER(TCurve), POINTER(TCurve), c_int, c_int, POINTER(c_double)]
-      func.restype = c_int
       return func(today, valueDate, stepinDate, startDate, endDate, payAccOnDefault, couponInterval, stubType, notional, couponRate, paymentDcc, badDayConv, calendar.encode('utf-8'), discCurve, spreadCurve, protectStart, isPriceClean, pv)#byref(couponInterval), calendar.encode('utf-8')
 
     #C signature
@@ -274,8 +216,6 @@ class CInterface:
 
     def JpmcdsCdsPrice(self, today, valueDate, stepinDate, startDate, endDate, couponRate, payAccOnDefault, couponInterval, stubType, paymentDcc, badDayConv, calendar, discCurve, spreadCurve, recoveryRate, isPriceClean, price):
       func = self.dll.JpmcdsCdsPrice
-      func.argtypes = [c_int, c_int, c_int, c_int, c_int, c_double, c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_long, c_long, POINTER(c_char), POINTER(TCurve), POINTER(TCurve), c_double, c_int, POINTER(c_double)]
-      func.restype = c_int
       return func(today, valueDate, stepinDate, startDate, endDate, couponRate, payAccOnDefault, couponInterval, stubType, paymentDcc, badDayConv, calendar.encode('utf-8'), discCurve, spreadCurve, recoveryRate, isPriceClean, price)
 
     #C signature
@@ -316,8 +256,6 @@ class CInterface:
 
     def JpmcdsCdsParSpreads(self, today, stepinDate, startDate, nbEndDates, endDate, payAccOnDefault, couponInterval, stubType, paymentDcc, badDayConv, calendar, discCurve, spreadCurve, recoveryRate, parSpread):
       func = self.dll.JpmcdsCdsParSpreads
-      func.argtypes = [c_int, c_int, c_int, c_long, POINTER(c_int), c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_long, c_long, POINTER(c_char), POINTER(TCurve), POINTER(TCurve), c_double, POINTER(c_double)]
-      func.restype = c_int
       return func(today, stepinDate, startDate, nbEndDates, endDate, payAccOnDefault, couponInterval, stubType, paymentDcc, badDayConv, calendar.encode('utf-8'), discCurve, spreadCurve, recoveryRate, parSpread)
 
     #C signature
@@ -346,8 +284,6 @@ class CInterface:
 
     def JpmcdsCdsFeeLegFlows(self, startDate, endDate, dateInterval, stubType, notional, couponRate, paymentDcc, badDayConv, calendar):
       func = self.dll.JpmcdsCdsFeeLegFlows
-      func.argtypes = [c_int, c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_double, c_double, c_long, c_long, POINTER(c_char)]
-      func.restype = POINTER(TCashFlowList)
       return func(startDate, endDate, dateInterval, stubType, notional, couponRate, paymentDcc, badDayConv, calendar.encode('utf-8'))
 
     #C signature
@@ -393,9 +329,6 @@ class CInterface:
 
     def JpmcdsCleanSpreadCurve(self, today, discCurve, startDate, stepinDate, cashSettleDate, nbDate, endDates, couponRates, includes, recoveryRate, payAccOnDefault, couponInterval, paymentDcc, stubType, badDayConv, calendar):
       func = self.dll.JpmcdsCleanSpreadCurve
-      func.argtypes = [c_int, POINTER(TCurve), c_int, c_int, c_int, c_long, POINTER(c_int), POINTER(c_double), POINTER(c_int), c_double, c_int, POINTER(TDateInterval), c_long, POINTER(TStubMethod), c_long, POINTER(c_char)]
-      #func.argtypes = [c_int, POINTER(TCurve), c_int, c_int, c_int, c_long, POINTER(c_int), POINTER(c_double), POINTER(c_int), c_double, c_int, POINTER(TDateInterval), c_long, TStubMethod, c_long, POINTER(c_char)]
-      func.restype = POINTER(TCurve)
       return func(today, discCurve, startDate, stepinDate, cashSettleDate, nbDate, endDates, couponRates, includes, recoveryRate, payAccOnDefault, couponInterval, paymentDcc, stubType, badDayConv, calendar.encode('utf-8'))
 
     #C signature
@@ -405,8 +338,6 @@ class CInterface:
 
     def JpmcdsHolidayLoadFromDisk(self, name, file):
         func = self.dll.JpmcdsHolidayLoadFromDisk
-        func.argtypes = [POINTER(c_char), POINTER(c_char)]
-        func.restype = c_int
         return func(name.encode('utf-8'), file.encode('utf-8'))
 
     #C signature
@@ -417,9 +348,6 @@ class CInterface:
 
     def JpmcdsStringToStubMethod(self, name, stubmethod):
         func = self.dll.JpmcdsStringToStubMethod
-        #func.argtypes = [POINTER(c_char), POINTER(TStubMethod)]
-        func.argtypes = [c_char_p, POINTER(TStubMethod)]
-        func.restype = c_int
         return func(name.encode('utf-8'), stubmethod)
 
     #C signature
@@ -429,17 +357,26 @@ class CInterface:
 
     def JpmcdsZeroPrice(self, creditCurve, date):
       func = self.dll.JpmcdsZeroPrice
-      func.argtypes = [POINTER(TCurve), c_int]
-      func.restype = c_double
       return func(creditCurve,date)
 
+    #C signature
+    #void JpmcdsFreeTCurve(TCurve *curve);
+    #not exported by the dll: the points and the curve are freed with the C runtime the dll allocated them with
+
+    def JpmcdsFreeTCurve(self, curve):
+      if not isinstance(curve, TCurve):
+        if not curve:
+          return
+        curve = curve.contents
+      free = load_c_runtime().free
+      free(cast(curve.fArray, c_void_p))
+      free(addressof(curve))
+
     #C signature
     #char* JpmcdsFormatDate(TDate date);
 
     def JpmcdsFormatDate(self, tdate):
       func = self.dll.JpmcdsFormatDate
-      func.argtypes = [c_int]
-      func.restype = c_char_p
       return func(tdate)
 
     #C signature
@@ -468,9 +405,6 @@ class CInterface:
      payAccruedOnDefault, couponInterval, stub, accrueDCC, badDayConv, calendar, discCurve, oneSpread, recoveryRate,
      payAccruedAtStart, upfrontCharge) :
       func = self.dll.JpmcdsCdsoneUpfrontCharge
-      func.argtypes = [c_int, c_int, c_int, c_int, c_int, c_int, c_double, c_int, POINTER(TDateInterval),POINTER(TStubMethod),
-                       c_long, c_long, POINTER(c_char), POINTER(TCurve), c_double, c_double, c_int, POINTER(c_double)]
-      func.restype = c_int
       return func(today, settlementDate, startDate1, stepinDate, startDate2, maturityDate, coupon,
         payAccruedOnDefault, couponInterval, stub, accrueDCC, badDayConv, calendar.encode('utf-8'), discCurve, oneSpread, recoveryRate,
         payAccruedAtStart, upfrontCharge)
@@ -484,8 +418,6 @@ class CInterface:
 
     def JpmcdsNewDateList(self, startDate, maturityDate, interval, stubAtEnd):
         func = self.dll.JpmcdsNewDateList
-        func.argtypes = [c_int, c_int, POINTER(TDateInterval),c_int]
-        func.restype = POINTER(TDateList)
         return func(startDate,maturityDate,interval,stubAtEnd)
 
     #C signature
@@ -495,8 +427,6 @@ class CInterface:
 
     def JpmcdsDateToMDY(self, jpmDate, mdy):
         func = self.dll.JpmcdsDateToMDY
-        func.argtypes = [c_int, POINTER(TMonthDayYear)]
-        func.restype = c_int
         return func(jpmDate, mdy)
 
 
@@ -598,3 +528,68 @@ class TMonthDayYear(Structure):
         ('year', c_long)
     ]
 
+
+#define the prototypes of various functions exported by dll
+#JpmcdsCdsContingentLegMake, JpmcdsCdsFeeLegMake and JpmcdsFreeTCurve are not exported by ISDA_Clib.dll
+PROTOTYPES = {
+    'JpmcdsErrMsgOn': ([], c_int),
+    'JpmcdsErrMsgEnableRecord': ([c_int, c_int], c_int),
+    'JpmcdsErrMsgDisableRecord': ([], c_int),
+    'JpmcdsErrGetMsgRecord': ([], POINTER(c_char_p)),
+    'JpmcdsDateIntervalToFreq': ([POINTER(TDateInterval), POINTER(c_double)], c_int),
+    'JpmcdsStringToDayCountConv': ([POINTER(c_char), POINTER(c_long)], c_int),
+    'JpmcdsDateFwdThenAdjust': ([c_int, POINTER(TDateInterval), c_long, POINTER(c_char), POINTER(c_int)], c_int),
+    'JpmcdsStringToDateInterval': ([POINTER(c_char), POINTER(c_char), POINTER(TDateInterval)], c_int),
+    'JpmcdsDate': ([c_long, c_long, c_long], c_int),
+    'JpmcdsBuildIRZeroCurve': ([c_int, POINTER(c_char), POINTER(c_int), POINTER(c_double), c_long, c_long, c_long, c_long, c_long, c_long, c_long, POINTER(c_char)], POINTER(TCurve)),
+    'JpmcdsCdsContingentLegPV': ([c_int, c_int, c_int, c_int, c_double, POINTER(TCurve), POINTER(TCurve), c_double, c_int, POINTER(c_double)], c_int),
+    'JpmcdsCdsFeeLegPV': ([c_int, c_int, c_int, c_int, c_int, c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_double, c_double, c_long, c_long, POINTER(c_char), POINTER(TCurve), POINTER(TCurve), c_int, c_int, POINTER(c_double)], c_int),
+    'JpmcdsCdsPrice': ([c_int, c_int, c_int, c_int, c_int, c_double, c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_long, c_long, POINTER(c_char), POINTER(TCurve), POINTER(TCurve), c_double, c_int, POINTER(c_double)], c_int),
+    'JpmcdsCdsParSpreads': ([c_int, c_int, c_int, c_long, POINTER(c_int), c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_long, c_long, POINTER(c_char), POINTER(TCurve), POINTER(TCurve), c_double, POINTER(c_double)], c_int),
+    'JpmcdsCdsFeeLegFlows': ([c_int, c_int, POINTER(TDateInterval), POINTER(TStubMethod), c_double, c_double, c_long, c_long, POINTER(c_char)], POINTER(TCashFlowList)),
+    #[c_int, POINTER(TCurve), c_int, c_int, c_int, c_long, POINTER(c_int), POINTER(c_double), POINTER(c_int), c_double, c_int, POINTER(TDateInterval), c_long, TStubMethod, c_long, POINTER(c_char)]
+    'JpmcdsCleanSpreadCurve': ([c_int, POINTER(TCurve), c_int, c_int, c_int, c_long, POINTER(c_int), POINTER(c_double), POINTER(c_int), c_double, c_int, POINTER(TDateInterval), c_long, POINTER(TStubMethod), c_long, POINTER(c_char)], POINTER(TCurve)),
+    'JpmcdsHolidayLoadFromDisk': ([POINTER(c_char), POINTER(c_char)], c_int),
+    #[POINTER(c_char), POINTER(TStubMethod)]
+    'JpmcdsStringToStubMethod': ([c_char_p, POINTER(TStubMethod)], c_int),
+    'JpmcdsZeroPrice': ([POINTER(TCurve), c_int], c_double),
+    'JpmcdsFormatDate': ([c_int], c_char_p),
+    'JpmcdsCdsoneUpfrontCharge': ([c_int, c_int, c_int, c_int, c_int, c_int, c_double, c_int, POINTER(TDateInterval), POINTER(TStubMethod),
+                                   c_long, c_long, POINTER(c_char), POINTER(TCurve), c_double, c_double, c_int, POINTER(c_double)], c_int),
+    'JpmcdsNewDateList': ([c_int, c_int, POINTER(TDateInterval), c_int], POINTER(TDateList)),
+    'JpmcdsDateToMDY': ([c_int, POINTER(TMonthDayYear)], c_int),
+}
+
+_library = None
+_library_lock = threading.Lock()
+
+def load_library():
+    """Load ISDA_Clib.dll and set the PROTOTYPES of its functions, once per process."""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                dll = str((pathlib.Path(__file__).parent).joinpath('ISDA_Clib.dll'))
+                if not os.path.isfile(dll):
+                    raise RuntimeError(f"Path not found {dll}")
+                library = CDLL(dll)
+                for name, (argtypes, restype) in PROTOTYPES.items():
+                    func = getattr(library, name)
+                    func.argtypes = argtypes
+                    func.restype = restype
+                _library = library
+    return _library
+
+_c_runtime = None
+
+def load_c_runtime():
+    """Load the debug C runtime shipped with the dll, which allocates the curves it returns, on first use."""
+    global _c_runtime
+    if _c_runtime is None:
+        with _library_lock:
+            if _c_runtime is None:
+                crt = CDLL(str((pathlib.Path(__file__).parent).joinpath('ucrtbased.dll')))
+                crt.free.argtypes = [c_void_p]
+                crt.free.restype = None
+                _c_runtime = crt
+    return _c_runtime
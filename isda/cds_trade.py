@@ -1,4 +1,4 @@
-from isda.c_interface import *
+from isda.dates import jpm_date, tenor_months
 
 class CDSTrade:
 
@@ -15,22 +15,11 @@ class CDSTrade:
         else:
             self.credit_risk_direction_scale_factor = 1.0
 
-        self.c_interface = CInterface()
-
         self.trade_date = self.py_to_jpm_date(self.arg_trade_date)
         self.effective_date = self.py_to_jpm_date(self.arg_effective_date)
         self.accrual_start_date = self.py_to_jpm_date(self.arg_accrual_start_date)
         self.maturity_date = self.py_to_jpm_date(self.arg_maturity_date)
 
-        badDayConvModified = ord('N')
-        holidayNone = 'None'
-
-        interval = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('1D', 'CDSTrade', interval)
-        start_date = (c_int * 1)()
-        success = self.c_interface.JpmcdsDateFwdThenAdjust(self.trade_date, interval, badDayConvModified, holidayNone, start_date)
-
-
         self.running_coupon = kwargs['running_coupon']
         if 'par_spread' in kwargs:
             self.par_spread = kwargs['par_spread']
@@ -50,6 +39,9 @@ class CDSTrade:
         if len(self.credit_spreads) != len(self.credit_spread_tenors):
             raise ValueError('CDS Trade - credit spread tenors and spreads do not match')
 
+        # months of the tenors, the credit curve dates are the IMM dates that many months ahead
+        self.credit_spread_months = tenor_months(self.credit_spread_tenors)
+
         self.upfront_charge = None
         self.accrued_premium = None
         self.days_accrued = None
@@ -61,4 +53,4 @@ class CDSTrade:
         self.dv01 = None
 
     def py_to_jpm_date(self,pydate):
-        return self.c_interface.JpmcdsDate(pydate.year, pydate.month,pydate.day)
+        return int(jpm_date(pydate.year, pydate.month, pydate.day))
@@ -0,0 +1,111 @@
+from ctypes import byref, c_double, c_long
+import threading
+import weakref
+
+from isda.c_interface import TDateInterval, TStubMethod
+from isda.dates import string_to_interval
+
+
+class FrozenDateInterval(TDateInterval):
+    """TDateInterval shared between callers, its fields cannot be assigned."""
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Shared date interval is read only')
+
+
+class FrozenStubMethod(TStubMethod):
+    """TStubMethod shared between callers, its fields cannot be assigned."""
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Shared stub method is read only')
+
+
+class ConventionRegistry:
+    """Day count, interval, frequency, stub and bad day strings parsed once per interface.
+
+    Each string goes through the library the first time it is asked for; the
+    result is interned and the same read only instance is handed to every
+    later caller, so the pricing path does no string parsing.
+    """
+
+    def __init__(self, c_interface):
+        # a proxy, so that the registry kept for an interface does not keep it alive
+        self.c_interface = weakref.proxy(c_interface)
+        self._parsed = {}
+        self._lock = threading.RLock()
+
+    def _get(self, kind, name, parse):
+        key = (kind, name.upper())
+        try:
+            return self._parsed[key]
+        except KeyError:
+            with self._lock:
+                if key not in self._parsed:
+                    self._parsed[key] = parse(name)
+            return self._parsed[key]
+
+    def day_count(self, name):
+        """Day count code of 'Act/360', '30/360', ..."""
+        return self._get('day_count', name, self._parse_day_count)
+
+    def interval(self, name):
+        """TDateInterval of '3M', '6M', '1D', ..."""
+        return self._get('interval', name, self._parse_interval)
+
+    def frequency(self, name):
+        """Payments per year of an interval, as a long."""
+        return self._get('frequency', name, self._parse_frequency)
+
+    def tenor(self, name):
+        """(periods, 'M' or 'D') of an interval, for the isda.dates functions."""
+        return self._get('tenor', name, string_to_interval)
+
+    def stub(self, name):
+        """TStubMethod of 'F/S', 'B/L', ..."""
+        return self._get('stub', name, self._parse_stub)
+
+    def bad_day(self, name):
+        """Bad day convention code of 'N', 'F', 'P' or 'M'."""
+        return self._get('bad_day', name, self._parse_bad_day)
+
+    def _parse_day_count(self, name):
+        type = (c_long * 1)()
+        if self.c_interface.JpmcdsStringToDayCountConv(name, type) != 0:
+            raise ValueError('Unknown day count convention {}'.format(name))
+        return type[0]
+
+    def _parse_interval(self, name):
+        interval = TDateInterval()
+        if self.c_interface.JpmcdsStringToDateInterval(name, 'ConventionRegistry', interval) != 0:
+            raise ValueError('Unknown date interval {}'.format(name))
+        return FrozenDateInterval.from_buffer_copy(interval)
+
+    def _parse_frequency(self, name):
+        freq = (c_double * 1)()
+        self.c_interface.JpmcdsDateIntervalToFreq(self.interval(name), freq)
+        return int(freq[0])
+
+    def _parse_stub(self, name):
+        stub = TStubMethod(False, False)
+        if self.c_interface.JpmcdsStringToStubMethod(name, byref(stub)) != 0:
+            raise ValueError('Unknown stub method {}'.format(name))
+        return FrozenStubMethod.from_buffer_copy(stub)
+
+    @staticmethod
+    def _parse_bad_day(name):
+        name = name.strip().upper()
+        if name not in ('N', 'F', 'P', 'M'):
+            raise ValueError('Unknown bad day convention {}'.format(name))
+        return ord(name)
+
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+def get_conventions(c_interface):
+    """The registry of an interface, shared by every model using it and dropped with the interface."""
+    with _registries_lock:
+        if c_interface not in _registries:
+            _registries[c_interface] = ConventionRegistry(c_interface)
+        return _registries[c_interface]
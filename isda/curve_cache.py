@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+from isda.struct_views import curve_array
+
+
+class CurveCache:
+    """Bounded LRU cache of built curves keyed on a market data fingerprint.
+
+    build() is only called on a miss.  Evicted curves are released with the
+    free routine given when they were built (JpmcdsFreeTCurve for the C
+    library), so a curve handed out by the cache is only valid until it is
+    evicted or the cache is cleared.
+    """
+
+    def __init__(self, max_size=64):
+        if max_size < 1:
+            raise ValueError('Curve cache size must be at least 1')
+        self.max_size = max_size
+        self._curves = OrderedDict()
+        self._keys = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, build, free=None):
+        if key in self._curves:
+            self._curves.move_to_end(key)
+            self.hits += 1
+            return self._curves[key][0]
+        self.misses += 1
+        curve = build()
+        self._curves[key] = (curve, free)
+        self._keys[id(curve)] = key
+        while len(self._curves) > self.max_size:
+            self._release(*self._curves.popitem(last=False))
+            self.evictions += 1
+        return curve
+
+    def key_of(self, curve):
+        """Key a cached curve was built under, None for curves the cache does not hold."""
+        return self._keys.get(id(curve))
+
+    def clear(self):
+        while self._curves:
+            self._release(*self._curves.popitem(last=False))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._curves), 'max_size': self.max_size}
+
+    def _release(self, key, entry):
+        curve, free = entry
+        del self._keys[id(curve)]
+        if free is not None:
+            free(curve)
+
+    def __len__(self):
+        return len(self._curves)
+
+    def __contains__(self, key):
+        return key in self._curves
+
+
+def curve_fingerprint(curve):
+    """Content key of a TCurve that did not come from a cache."""
+    return ('curve', curve.fBaseDate, curve.fBasis, curve.fDayCountConv, curve_array(curve).tobytes())
@@ -0,0 +1,237 @@
+import os.path
+import threading
+
+import numpy as np
+
+# Pure NumPy date arithmetic on ISDA TDates (days since 1 January 1601, the
+# epoch of JpmcdsDate) held in int64 arrays: tenor parsing, business day
+# adjustment with holiday calendars, day count fractions, IMM dates and
+# conversion to and from datetime64.  Results match the C library date
+# routines without a ctypes call per date.
+
+TDATE_EPOCH = np.datetime64('1601-01-01', 'D')
+DAYS_IN_YEAR = 365.0
+
+# day count conventions, same codes as the C library
+ACT_365 = 1
+ACT_365F = 2
+ACT_360 = 3
+B30_360 = 4
+B30E_360 = 5
+
+_DAY_COUNT_NAMES = {
+    'ACT/365': ACT_365,
+    'ACT/ACT': ACT_365,
+    'ACT/365F': ACT_365F,
+    'ACT/360': ACT_360,
+    '30/360': B30_360,
+    'B30/360': B30_360,
+    '30E/360': B30E_360,
+    'B30E/360': B30E_360,
+}
+
+_INTERVAL_UNITS = {'D': ('D', 1), 'W': ('D', 7), 'M': ('M', 1), 'Q': ('M', 3), 'S': ('M', 6), 'A': ('M', 12), 'Y': ('M', 12)}
+
+_ROLL = {'F': 'forward', 'P': 'backward', 'M': 'modifiedfollowing'}
+
+# the library's holiday cache: calendar names (upper case) to numpy business day
+# calendars, 'NONE' has weekends only and 'NO_WEEKENDS' no holidays at all
+_calendars = {'NONE': np.busdaycalendar(), 'NO_WEEKENDS': np.busdaycalendar(weekmask='1111111')}
+_calendars_lock = threading.Lock()
+
+IMM_DAY_OF_MONTH = 20
+# from the 20 December 2015 roll, standard CDS roll semi-annually: maturities on
+# 20 March and 20 September move back to the previous IMM date
+SEMI_ANNUAL_ROLL_START = np.datetime64('2015-12-20')
+
+
+def jpm_date(year, month, day):
+    """TDate(s) for the given year, month and day (scalars or arrays)."""
+    months = (np.asarray(year, dtype=np.int64) - 1970) * 12 + np.asarray(month, dtype=np.int64) - 1
+    dt64 = months.astype('datetime64[M]').astype('datetime64[D]') + (np.asarray(day, dtype=np.int64) - 1)
+    return from_datetime64(dt64)
+
+
+def from_datetime64(dates):
+    return (np.asarray(dates, dtype='datetime64[D]') - TDATE_EPOCH).astype(np.int64)
+
+
+def to_datetime64(tdates):
+    return TDATE_EPOCH + np.asarray(tdates, dtype=np.int64).astype('timedelta64[D]')
+
+
+def format_date(tdate):
+    """YYYYMMDD as bytes, like JpmcdsFormatDate."""
+    return str(to_datetime64(tdate)).replace('-', '').encode('utf-8')
+
+
+def string_to_interval(text):
+    """Parse '3M', '1Y', '1D', ... into (periods, 'M' or 'D')."""
+    text = text.strip().upper()
+    try:
+        unit, scale = _INTERVAL_UNITS[text[-1]]
+        return int(text[:-1]) * scale, unit
+    except (KeyError, ValueError):
+        raise ValueError('Unknown date interval {}'.format(text))
+
+
+def interval_to_freq(interval):
+    prd, prd_type = interval
+    return 12.0 / prd if prd_type == 'M' else DAYS_IN_YEAR / prd
+
+
+def string_to_day_count(text):
+    try:
+        return _DAY_COUNT_NAMES[text.strip().upper()]
+    except KeyError:
+        raise ValueError('Unsupported day count convention {}'.format(text))
+
+
+def add_months(tdates, months):
+    """Move dates by whole months, clipping the day to the end of the target month."""
+    dt64 = to_datetime64(tdates)
+    month_start = dt64.astype('datetime64[M]')
+    day = (dt64 - month_start.astype('datetime64[D]')).astype(np.int64)
+    target = month_start + np.asarray(months, dtype=np.int64)
+    days_in_month = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(np.int64)
+    return from_datetime64(target.astype('datetime64[D]') + np.minimum(day, days_in_month - 1))
+
+
+def tenor_months(tenors):
+    """Number of months of tenors such as '6M' or '10Y'."""
+    months = []
+    for tenor in tenors:
+        prd, prd_type = string_to_interval(tenor)
+        if prd_type != 'M':
+            raise ValueError('Tenor {} is not a whole number of months'.format(tenor))
+        months.append(prd)
+    return np.array(months, dtype=np.int64)
+
+
+def next_imm_date(dates, months=0):
+    """First IMM date strictly after each date moved forward by months, as TDates.
+
+    Closed form of Utils.next_imm(Utils.move_n_months(date, 0, months)),
+    semi-annual roll included.  dates are TDates or datetime64 and broadcast
+    against months, so the maturities of a whole book come from one call.
+    """
+    dates = np.asarray(dates)
+    dt64 = dates.astype('datetime64[D]') if dates.dtype.kind == 'M' else to_datetime64(dates)
+    month = dt64.astype('datetime64[M]').astype(np.int64) + np.asarray(months, dtype=np.int64)
+    day = (dt64 - dt64.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+    # months are counted from January 1970, IMM months are 2, 5, 8 and 11 modulo 12
+    imm = month + (2 - month) % 3
+    imm = np.where((imm == month) & (day >= IMM_DAY_OF_MONTH), imm + 3, imm)
+    imm_date = imm.astype('datetime64[M]').astype('datetime64[D]') + (IMM_DAY_OF_MONTH - 1)
+    imm = np.where((imm_date >= SEMI_ANNUAL_ROLL_START) & (imm % 6 == 2), imm - 3, imm)
+    return from_datetime64(imm.astype('datetime64[M]').astype('datetime64[D]') + (IMM_DAY_OF_MONTH - 1))
+
+
+def date_fwd(tdates, interval, count=1):
+    prd, prd_type = interval
+    steps = np.asarray(count, dtype=np.int64) * prd
+    if prd_type == 'M':
+        return add_months(tdates, steps)
+    return np.asarray(tdates, dtype=np.int64) + steps
+
+
+def add_calendar(name, holidays, weekends=(5, 6)):
+    """Register holiday TDates (or datetime64) under name, weekends are the days (Monday is 0) never worked."""
+    holidays = np.asarray(holidays)
+    if holidays.dtype.kind != 'M':
+        holidays = to_datetime64(holidays)
+    weekmask = ''.join('0' if day in weekends else '1' for day in range(7))
+    with _calendars_lock:
+        _calendars[name.upper()] = np.busdaycalendar(weekmask=weekmask, holidays=holidays)
+
+
+def load_holidays(name, filename):
+    """Register the holidays of an ISDA holiday file, as JpmcdsHolidayLoadFromDisk.
+
+    The file holds one YYYYMMDD date per line, '#' starts a comment, and the
+    '# SATURDAY_NOT_ALWAYS_HOLIDAY' / '# SUNDAY_NOT_ALWAYS_HOLIDAY' markers make
+    that day a business day unless listed.
+    """
+    holidays = []
+    weekends = {5, 6}
+    with open(filename) as f:
+        for line in f:
+            text, _, comment = line.partition('#')
+            comment = comment.strip().upper()
+            if comment.startswith('SATURDAY_NOT_ALWAYS_HOLIDAY'):
+                weekends.discard(5)
+            elif comment.startswith('SUNDAY_NOT_ALWAYS_HOLIDAY'):
+                weekends.discard(6)
+            text = text.strip()
+            if text:
+                holidays.append(np.datetime64('{}-{}-{}'.format(text[:4], text[4:6], text[6:8]), 'D'))
+    add_calendar(name, np.array(holidays, dtype='datetime64[D]'), tuple(weekends))
+
+
+def _busday_calendar(calendar):
+    if calendar is None:
+        return _calendars['NONE']
+    if isinstance(calendar, np.busdaycalendar):
+        return calendar
+    if isinstance(calendar, bytes):
+        calendar = calendar.decode('utf-8')
+    if isinstance(calendar, str):
+        # like the C library, an unknown name is read as a holiday file
+        if calendar.upper() not in _calendars and os.path.isfile(calendar):
+            load_holidays(calendar, calendar)
+        try:
+            return _calendars[calendar.upper()]
+        except KeyError:
+            raise ValueError('Unknown holiday calendar {}'.format(calendar))
+    return np.busdaycalendar(holidays=to_datetime64(np.asarray(calendar, dtype=np.int64)))
+
+
+def business_day_adjust(tdates, bad_day_conv, calendar=None):
+    """Adjust dates with 'N'one, 'F'ollowing, 'P'revious or 'M'odified following."""
+    conv = chr(bad_day_conv) if isinstance(bad_day_conv, int) else bad_day_conv
+    conv = conv.upper()
+    tdates = np.asarray(tdates, dtype=np.int64)
+    if conv == 'N':
+        return tdates
+    if conv not in _ROLL:
+        raise ValueError('Unknown bad day convention {}'.format(conv))
+    adjusted = np.busday_offset(to_datetime64(tdates), 0, roll=_ROLL[conv], busdaycal=_busday_calendar(calendar))
+    return from_datetime64(adjusted)
+
+
+def date_fwd_then_adjust(tdates, interval, bad_day_conv, calendar=None):
+    return business_day_adjust(date_fwd(tdates, interval), bad_day_conv, calendar)
+
+
+def day_count_fraction(start, end, dcc):
+    start = np.asarray(start, dtype=np.int64)
+    end = np.asarray(end, dtype=np.int64)
+    if dcc == ACT_360:
+        return (end - start) / 360.0
+    if dcc == ACT_365F:
+        return (end - start) / 365.0
+    if dcc == ACT_365:
+        # actual/actual: the days in each calendar year over the number of days of that year
+        first, last = np.minimum(start, end), np.maximum(start, end)
+        y1 = _ymd(first)[0]
+        y2 = _ymd(last)[0]
+        fraction = (jpm_date(y1 + 1, 1, 1) - first) / (jpm_date(y1 + 1, 1, 1) - jpm_date(y1, 1, 1)) + (y2 - y1 - 1) + \
+            (last - jpm_date(y2, 1, 1)) / (jpm_date(y2 + 1, 1, 1) - jpm_date(y2, 1, 1))
+        return np.where(end < start, -fraction, fraction)
+    if dcc in (B30_360, B30E_360):
+        y1, m1, d1 = _ymd(start)
+        y2, m2, d2 = _ymd(end)
+        d1 = np.minimum(d1, 30)
+        if dcc == B30_360:
+            d2 = np.where((d2 == 31) & (d1 == 30), 30, d2)
+        else:
+            d2 = np.minimum(d2, 30)
+        return ((y2 - y1) * 360 + (m2 - m1) * 30 + (d2 - d1)) / 360.0
+    raise ValueError('Unsupported day count convention {}'.format(dcc))
+
+
+def _ymd(tdates):
+    dt64 = to_datetime64(tdates)
+    months = dt64.astype('datetime64[M]').astype(np.int64)
+    day = (dt64 - dt64.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+    return months // 12 + 1970, months % 12 + 1, day
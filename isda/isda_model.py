@@ -1,112 +1,95 @@
 from ctypes import *
+import logging
+import numpy as np
 from isda.c_interface import *
+from isda.curve_cache import curve_fingerprint
+from isda.dates import jpm_date, next_imm_date
+from isda.numpy_model import accrued_interest
+from isda.numpy_interface import zero_prices
+from isda.results import PricingResult
+from isda.struct_views import cash_flow_array, curve_array
 from isda.utils import *
-import datetime as dt
+from isda.valuation_context import ValuationContext
+
+# curve and cash flow diagnostics of single_name_pricer and every price are logged at DEBUG level
+logger = logging.getLogger(__name__)
+
+# conventions baked into buildZeroCurve and buildCreditCurve, part of the curve cache keys
+ZERO_CURVE_CONVENTIONS = ('Act/360', '6M', '3M', '30/360', 'ACT/360', 'N', 'None')
+CREDIT_CURVE_CONVENTIONS = ('Act/360', 'F/S', 'N', 'M', 'F', 'None', True)
 
 class ISDAModel:
-    def __init__(self, cds, market):
+    def __init__(self, cds, market, backend=None, curve_cache=None, context=None):
         self.cds = cds
         self.market = market
-        self.c_interface = CInterface()
+        self.context = ValuationContext(market, backend) if context is None else context
+        self.c_interface = self.context.c_interface
+        self.conventions = self.context.conventions
+        self.curve_cache = curve_cache
+
+    def zero_curve_key(self, shift=None):
+        rates = self.market.rates if shift is None else [r + shift for r in self.market.rates]
+        return ('zero', self.py_to_jpm_date(self.market.valuation_date), self.market.instr_names,
+                tuple(self.market.expiries), tuple(rates), ZERO_CURVE_CONVENTIONS)
+
+    def credit_curve_key(self, zero_curve, shift=None):
+        zero_curve_key = self.curve_cache.key_of(zero_curve) or curve_fingerprint(zero_curve)
+        spreads = self.cds.credit_spreads if shift is None else [s + shift for s in self.cds.credit_spreads]
+        return ('credit', zero_curve_key, self.py_to_jpm_date(self.market.valuation_date), self.cds.effective_date,
+                tuple(spreads), tuple(self.cds.credit_spread_tenors), self.cds.recovery_rate, CREDIT_CURVE_CONVENTIONS)
+
+    def free_curve(self, curve):
+        self.c_interface.JpmcdsFreeTCurve(curve)
 
     def buildZeroCurve(self, shift=None):
-        valuation_date = self.py_to_jpm_date(self.market.valuation_date)
-        routine = 'BuildExampleZeroCurve'
-        badDayConvModified = ord('N')
-        holidayNone = 'None'
-        nInstr = len(self.market.instr_names)
-        adv_dates = []
-        for i in range(nInstr):
-            tmp = TDateInterval()
-            self.c_interface.JpmcdsStringToDateInterval(self.market.expiries[i], routine, tmp)
-            dt = (c_int * 1)()
-            success = self.c_interface.JpmcdsDateFwdThenAdjust(valuation_date, tmp, badDayConvModified, holidayNone, dt)
-            adv_dates.append(dt[0])
-        dates = (c_int * len(adv_dates))(*adv_dates)
-
-        temp_rates = None
-        if shift is None:
-            temp_rates = self.market.rates
-        else:
-            temp_rates = [r + shift for r in self.market.rates]
-
-        rates = (c_double * len(temp_rates))(*temp_rates)
-
-        type = (c_long * 1)()
-        self.c_interface.JpmcdsStringToDayCountConv('Act/360', type)
-        mmDCC = c_long(type[0])
-
-        tmp = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('6M', 'BuildExampleZeroCurve', tmp)
-        freq_p = (c_double * 1)()
-        self.c_interface.JpmcdsDateIntervalToFreq(tmp, freq_p)
-        fixedSwapFreq = c_long(int(freq_p[0]))
-
-        tmp = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('3M', 'BuildExampleZeroCurve', tmp)
-        freq_p = (c_double * 1)()
-        self.c_interface.JpmcdsDateIntervalToFreq(tmp, freq_p)
-        floatSwapFreq = c_long(int(freq_p[0]))
-
-        type = (c_long * 1)()
-        self.c_interface.JpmcdsStringToDayCountConv('30/360', type)
-        swapDCC = c_long(type[0])
-
-        type = (c_long * 1)()
-        self.c_interface.JpmcdsStringToDayCountConv('ACT/360', type)
-        floatDCC = c_long(type[0])
-
-        zero_curve = self.c_interface.JpmcdsBuildIRZeroCurve(
-                        valuation_date,
-                        self.market.instr_names,
-                        dates,
-                        rates,
-                        nInstr,
-                        fixedSwapFreq,
-                        floatSwapFreq,
-                        mmDCC,
-                        swapDCC,
-                        floatDCC,
-                        badDayConvModified,
-                        holidayNone)
-
-        return zero_curve[0], adv_dates[-1]
+        if self.curve_cache is None:
+            return self.context.zero_curve(shift), self.context.zero_curve_dates[-1]
+        zero_curve = self.curve_cache.get(self.zero_curve_key(shift), lambda: self.context.build_zero_curve(shift),
+                                          self.free_curve)
+        return zero_curve, zero_curve.fArray[zero_curve.fNumItems - 1].fDate
 
     def ymd_to_jpm_date(self, ymd):
         dt = datetime.datetime.strptime(ymd,'%m/%d/%Y').date()
-        return self.c_interface.JpmcdsDate(dt.year, dt.month,dt.day)
+        return int(jpm_date(dt.year, dt.month, dt.day))
 
     def print_curves(self, zero_curve, credit_curve):
-        base_date = credit_curve.fBaseDate
-        print('Date:{}, Discount Factor:{}, Survival Probability:{}'.format(self.c_interface.JpmcdsFormatDate(base_date),
-                                                                            self.c_interface.JpmcdsZeroPrice(zero_curve,base_date),
-                                                                            self.c_interface.JpmcdsZeroPrice(credit_curve, base_date)))
-        for i in range(credit_curve.fNumItems):
-            dt = credit_curve.fArray[i].fDate
-            print('Date:{}, Discount Factor:{}, Survival Probability:{}'.format(self.c_interface.JpmcdsFormatDate(dt),
-                                                                                self.c_interface.JpmcdsZeroPrice(zero_curve, dt),
-                                                                                self.c_interface.JpmcdsZeroPrice(credit_curve, dt)))
-
-        three_month_interval = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('3M', 'test', three_month_interval)
-        stubFS = TStubMethod(False, False)
-        ret = self.c_interface.JpmcdsStringToStubMethod('F/S', byref(stubFS))
-        type = (c_long * 1)()
-        self.c_interface.JpmcdsStringToDayCountConv('Act/360', type)
-        paymentDCC = type[0]
-        bad_day_conv_following = ord('F')
+        for line in self.curve_report(zero_curve, credit_curve):
+            print(line)
+
+    def curve_report(self, zero_curve, credit_curve):
+        """Lines of print_curves: discount factors and survival probabilities at the credit curve dates, then the fee leg cash flows."""
+        dates = [credit_curve.fBaseDate] + curve_array(credit_curve)['fDate'].tolist()
+        discount_factors = zero_prices(zero_curve, dates)
+        survival_probabilities = zero_prices(credit_curve, dates)
+        for dt, discount_factor, survival_probability in zip(dates, discount_factors, survival_probabilities):
+            yield 'Date:{}, Discount Factor:{}, Survival Probability:{}'.format(self.c_interface.JpmcdsFormatDate(dt),
+                                                                               discount_factor, survival_probability)
+
+        three_month_interval = self.conventions.interval('3M')
+        stubFS = self.conventions.stub('F/S')
+        paymentDCC = self.conventions.day_count('Act/360')
+        bad_day_conv_following = self.conventions.bad_day('F')
         cashFlows = self.c_interface.JpmcdsCdsFeeLegFlows(self.cds.accrual_start_date, self.cds.maturity_date, three_month_interval, stubFS, self.cds.notional, self.cds.running_coupon,
                                          paymentDCC, bad_day_conv_following, 'none')
-        for i in range(cashFlows[0].fNumItems):
-            date = cashFlows[0].fArray[i].fDate
-            amount = cashFlows[0].fArray[i].fAmount
-            print('Date:%s, CashFlow:%s' % (self.c_interface.JpmcdsFormatDate(date), amount))
+        for (date, amount) in cash_flow_array(cashFlows).tolist():
+            yield 'Date:%s, CashFlow:%s' % (self.c_interface.JpmcdsFormatDate(date), amount)
+
+    def set_fee_leg_conventions(self):
+        self.paymentDCC = self.context.payment_dcc
+        self.stubFS = self.context.stub
 
     def buildCreditCurve(self, zero_curve, shift=None):
+        self.set_fee_leg_conventions()
+        if self.curve_cache is None:
+            return self._build_credit_curve(zero_curve, shift)
+        credit_curve = self.curve_cache.get(self.credit_curve_key(zero_curve, shift),
+                                            lambda: self._build_credit_curve(zero_curve, shift)[0], self.free_curve)
+        return credit_curve, credit_curve.fArray[credit_curve.fNumItems - 1].fDate
 
-        valuation_date = self.py_to_jpm_date(self.market.valuation_date)
-        future_imm_dates = Utils.imm_date_vector(dt.datetime.combine(self.market.valuation_date, dt.datetime.min.time()), tenor_list=self.cds.credit_spread_tenors)
-        jpm_imm_dates = [self.ymd_to_jpm_date(dt[1]) for dt in future_imm_dates]
+    def _build_credit_curve(self, zero_curve, shift=None):
+
+        valuation_date = self.context.valuation_date
+        jpm_imm_dates = next_imm_date(np.datetime64(self.market.valuation_date), self.cds.credit_spread_months).tolist()
         tenors = (c_int * len(jpm_imm_dates))(*jpm_imm_dates)
 
         nbDates = len(jpm_imm_dates)
@@ -123,27 +106,11 @@ class ISDAModel:
         pay_accrual_on_default = True
         coupon_interval = None  # 3M is assumed
 
-        type = (c_long * 1)()
-        self.c_interface.JpmcdsStringToDayCountConv('Act/360', type)
-        self.paymentDCC = type[0]
-
-        self.stubFS = TStubMethod(False, False)
-        ret = self.c_interface.JpmcdsStringToStubMethod('F/S', byref(self.stubFS))
-
-        bad_day_conv_none = ord('N')
-        bad_day_conv_modified = ord('M')
         bad_day_conv_following = ord('F')
-        calendar = 'None'
-
-        one_day_interval = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('1D', 'CDSTrade', one_day_interval)
-        step_in_date = (c_int * 1)()
-        success = self.c_interface.JpmcdsDateFwdThenAdjust(valuation_date, one_day_interval, bad_day_conv_none, calendar, step_in_date)
+        calendar = self.context.calendar
 
-        three_days_interval = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('3D', 'CDSTrade', three_days_interval)
-        cash_settle_date = (c_int * 1)()
-        success = self.c_interface.JpmcdsDateFwdThenAdjust(valuation_date, three_days_interval, bad_day_conv_modified, calendar, cash_settle_date)
+        step_in_date = self.context.step_in_date
+        cash_settle_date = self.context.cash_settle_date
 
         self.c_interface.JpmcdsErrMsgOn
         self.c_interface.JpmcdsErrMsgEnableRecord(20,128)
@@ -151,8 +118,8 @@ class ISDAModel:
             valuation_date,
             zero_curve,
             self.cds.effective_date,
-            step_in_date[0],
-            cash_settle_date[0],
+            step_in_date,
+            cash_settle_date,
             nbDates,
             tenors,
             spreads,
@@ -167,40 +134,86 @@ class ISDAModel:
 
         return credit_curve[0],jpm_imm_dates[-1]
 
+    def par_spreads(self, zero_curve, credit_curve, end_dates=None):
+        """Par spreads of the credit curve at end_dates (TDates), by default the IMM dates of the credit spread tenors.
+
+        All maturities are priced by a single JpmcdsCdsParSpreads call.
+        """
+        if end_dates is None:
+            end_dates = next_imm_date(np.datetime64(self.market.valuation_date), self.cds.credit_spread_months).tolist()
+        nbEndDates = len(end_dates)
+        dates = (c_int * nbEndDates)(*end_dates)
+        par_spreads = (c_double * nbEndDates)()
+        ret = self.c_interface.JpmcdsCdsParSpreads(
+            self.context.valuation_date,
+            self.context.step_in_date,
+            self.cds.effective_date,
+            nbEndDates,
+            dates,
+            True,
+            None,
+            self.context.stub,
+            self.context.payment_dcc,
+            ord('F'),
+            self.context.calendar,
+            zero_curve,
+            credit_curve,
+            self.cds.recovery_rate,
+            par_spreads)
+        if ret != 0:
+            raise ValueError('Unable to compute par spreads')
+        return list(par_spreads)
+
+    def calc_cds_prices(self, coupon, zero_curve, credit_curve):
+        """(clean price, dirty price, accrued) with clean = dirty - accrued, from one pricing.
+
+        An interface with cds_prices (the numpy backend) values the legs once
+        for all three.  Otherwise the dirty price comes from JpmcdsCdsPrice and
+        the accrued, as in get_accrued_premium, from accrued_interest, whose
+        fee leg schedule is the one of the library.
+        """
+        cds_prices = getattr(self.c_interface, 'cds_prices', None)
+        if cds_prices is not None:
+            clean_price, dirty_price, accrued = cds_prices(*self.cds_price_args(coupon, zero_curve, credit_curve))
+            return -clean_price, -dirty_price, accrued
+        dirty_price = self.calc_cds_price(coupon, zero_curve, credit_curve, is_clean=False)
+        accrued = self.accrued(coupon)
+        return dirty_price - accrued, dirty_price, accrued
+
+    def accrued(self, coupon):
+        """Accrued of the fee leg at the step-in date per unit notional, coupon in basis points."""
+        stub = (bool(self.stubFS.stubAtEnd), bool(self.stubFS.longStub))
+        return float(accrued_interest(self.context.step_in_date, self.cds.accrual_start_date, self.cds.maturity_date,
+                                      coupon / 10000., None, stub, self.paymentDCC, ord('F'),
+                                      self.context.calendar)[0])
+
+    def cds_price_args(self, coupon, zero_curve, credit_curve):
+        """Arguments of JpmcdsCdsPrice up to the recovery rate."""
+        return (self.context.valuation_date, self.context.cash_settle_date, self.context.step_in_date,
+                self.cds.accrual_start_date, self.cds.maturity_date, coupon / 10000., True, None, self.stubFS,
+                self.paymentDCC, ord('F'), self.context.calendar, zero_curve, credit_curve, self.cds.recovery_rate)
+
     def calc_cds_price(self, coupon, zero_curve, credit_curve, is_clean):
 
-        valuation_date = self.py_to_jpm_date(self.market.valuation_date)
+        valuation_date = self.context.valuation_date
 
-        bad_day_conv_none = ord('N')
-        bad_day_conv_modified = ord('M')
         bad_day_conv_following = ord('F')
-        calendar = 'None'
-
-        one_day_interval = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('1D', 'CDSTrade', one_day_interval)
-        step_in_date = (c_int * 1)()
-        success = self.c_interface.JpmcdsDateFwdThenAdjust(valuation_date, one_day_interval, bad_day_conv_none,
-                                                           calendar, step_in_date)
+        calendar = self.context.calendar
 
-        three_days_interval = TDateInterval()
-        self.c_interface.JpmcdsStringToDateInterval('3D', 'CDSTrade', three_days_interval)
-        cash_settle_date = (c_int * 1)()
-        success = self.c_interface.JpmcdsDateFwdThenAdjust(valuation_date, three_days_interval, bad_day_conv_modified,
-                                                           calendar, cash_settle_date)
+        step_in_date = self.context.step_in_date
+        cash_settle_date = self.context.cash_settle_date
 
         is_price_clean = is_clean
         cdsprice = (c_double * 1)()
 
-        include = None  # include all dates and rates
         pay_accrual_on_default = True
         coupon_interval = None  # 3M is assumed
 
         ret = self.c_interface.JpmcdsCdsPrice(
             valuation_date,
-            cash_settle_date[0],
-            step_in_date[0],
+            cash_settle_date,
+            step_in_date,
             self.cds.accrual_start_date,
-            #self.py_to_jpm_date(datetime.date(2019, 3, 21)),
             self.cds.maturity_date,
             coupon / 10000.,
             pay_accrual_on_default,
@@ -214,84 +227,78 @@ class ISDAModel:
             self.cds.recovery_rate,
             is_price_clean,
             cdsprice)
-        print('Coupon:{}, cdsprice:{}'.format(coupon, cdsprice[0] * -1.0))
+        if ret != 0:
+            raise ValueError('Unable to compute CDS price')
+        logger.debug('Coupon:%s, cdsprice:%s', coupon, cdsprice[0] * -1.0)
         return cdsprice[0] * -1.0
 
-    def get_upfront_charge(self, running_coupon):
-
-        isPriceClean = False
-        cdsprice = (c_double * 1)()
-
-        self.coupon_interval = TDateInterval()
-        self.JpmcdsStringToDateInterval('3M', 'BuildExampleZeroCurve', self.coupon_interval)
-
-        ret = self.JpmcdsCdsPrice(
-            self.cds.today,
-            self.cds.cash_settle_date,
-            self.cds.step_in_date,
-            self.cds.start_date,
-            self.cds.maturity_date,
-            self.cds.running_coupon/10000.,
-            self.payAccrualOnDefault,
-            byref(self.couponInterval),
-            self.stubFS,
-            self.paymentDCC,
-            self.badDayConvFollowing,
-            self.calendar,
-            self.zeroCurve[0],
-            self.creditCurve[0],
-            self.cds.recovery_rate,
-            isPriceClean,
-            cdsprice)
-
-        self.cds.upfront_charge = cdsprice[0] * self.cds.notional
-        print('Upfront Charge: %s' % self.upfrontCharge)
-
-    def get_accrued_premium(self):
-
-        c = CInterface()
-        isPriceClean = True
-        cdsprice = (c_double * 1)()
-
-        ret = self.c_interface.JpmcdsCdsPrice(
-            self.cds.today,
-            self.cds.cash_settle_date,
-            self.cds.step_in_date,
-            self.cds.start_date,
+    def get_upfront_charge(self, running_coupon, quoted_spread=None):
+        """Upfront charge of the trade paying running_coupon, quoted at quoted_spread (by default cds.par_spread).
+
+        The standard JpmcdsCdsoneUpfrontCharge conversion on a flat hazard
+        rate curve; the dirty upfront, paid by the protection buyer, is kept
+        on cds.upfront_charge and returned.
+        """
+        quoted_spread = self.cds.par_spread if quoted_spread is None else quoted_spread
+        self.set_fee_leg_conventions()
+        zero_curve, _ = self.buildZeroCurve()
+        upfront = (c_double * 1)()
+        ret = self.c_interface.JpmcdsCdsoneUpfrontCharge(
+            self.context.valuation_date,
+            self.context.cash_settle_date,
+            self.cds.accrual_start_date,
+            self.context.step_in_date,
+            self.cds.accrual_start_date,
             self.cds.maturity_date,
-            self.cds.running_coupon/10000.,
-            self.payAccrualOnDefault,
-            byref(self.coupon_interval),
+            running_coupon / 10000.,
+            True,
+            None,
             self.stubFS,
             self.paymentDCC,
-            self.badDayConvFollowing,
-            self.calendar,
-            self.zeroCurve[0],
-            self.creditCurve[0],
+            ord('F'),
+            self.context.calendar,
+            zero_curve,
+            quoted_spread,
             self.cds.recovery_rate,
-            isPriceClean,
-            cdsprice)
-
-        self.cds.accrued_premium = cdsprice[0] * self.cds.notional - self.cds.upfront_charge
-        print('Accrued Premium: %s' % self.cds.accrued_premium)
-        self.cds.days_accrued = self.cds.accrued_premium * (360. / self.cds.running_coupon) / self.cds.notional
-        print('Days Accrued: %s' % self.cds.days_accrued)
+            False,
+            upfront)
+        if ret != 0:
+            raise ValueError('Unable to compute the upfront charge')
+        self.cds.upfront_charge = upfront[0] * self.cds.notional
+        logger.debug('Upfront Charge: %s', self.cds.upfront_charge)
+        return self.cds.upfront_charge
+
+    def get_accrued_premium(self, running_coupon=None):
+        """Accrued premium, days accrued and clean price of the upfront from get_upfront_charge, kept on cds."""
+        if self.cds.upfront_charge is None:
+            raise ValueError('Upfront charge not computed, call get_upfront_charge first')
+        running_coupon = self.cds.running_coupon if running_coupon is None else running_coupon
+        self.set_fee_leg_conventions()
+        self.cds.accrued_premium = self.accrued(running_coupon) * self.cds.notional
+        self.cds.days_accrued = self.cds.accrued_premium * (360. / running_coupon) / self.cds.notional
         self.cds.clean_price = (self.cds.notional - self.cds.upfront_charge - self.cds.accrued_premium) / self.cds.notional * 100.
-        print('Clean Price: %s' % self.cds.clean_price)
+        logger.debug('Accrued Premium: %s, Days Accrued: %s, Clean Price: %s', self.cds.accrued_premium,
+                     self.cds.days_accrued, self.cds.clean_price)
+        return self.cds.accrued_premium
 
     def py_to_jpm_date(self,pydate):
-        return self.c_interface.JpmcdsDate(pydate.year, pydate.month,pydate.day)
+        return int(jpm_date(pydate.year, pydate.month, pydate.day))
 
     def single_name_pricer(self):
+        return self.price().as_dict()
+
+    def price(self):
+        """Measures of single_name_pricer as a PricingResult; nothing is printed."""
         zero_curve, last_date = self.buildZeroCurve(shift=None)
         credit_curve, last_date = self.buildCreditCurve(zero_curve, shift=None)
-        self.print_curves(zero_curve, credit_curve)
+        if logger.isEnabledFor(logging.DEBUG):
+            for line in self.curve_report(zero_curve, credit_curve):
+                logger.debug(line)
 
-        clean_price = self.calc_cds_price(self.cds.running_coupon, zero_curve, credit_curve, is_clean=True)
-        dirty_price = self.calc_cds_price(self.cds.running_coupon, zero_curve, credit_curve, is_clean=False)
+        clean_price, dirty_price, accrued = self.calc_cds_prices(self.cds.running_coupon, zero_curve, credit_curve)
         clean_pv = clean_price * self.cds.notional * self.cds.credit_risk_direction_scale_factor
         dirty_pv = dirty_price * self.cds.notional * self.cds.credit_risk_direction_scale_factor
-        accrued_premium = (dirty_price - clean_price) * self.cds.notional
+        accrued_premium = accrued * self.cds.notional
         days_accrued = accrued_premium * (360. / self.cds.running_coupon) / self.cds.notional
 
 
@@ -304,6 +311,6 @@ class ISDAModel:
         dirty_price_shifted_dv01 = self.calc_cds_price(self.cds.running_coupon, zero_curve_shifted, credit_curve, is_clean=False)
         dv01 = (dirty_price_shifted_dv01 - dirty_price) * self.cds.notional * self.cds.credit_risk_direction_scale_factor
 
-        return {'clean_price' : clean_price, 'dirty_price' : dirty_price, 'clean_pv' : clean_pv, 'dirty_pv' : dirty_pv, 'accrued_premium' : accrued_premium, 'days_accrued' : days_accrued, 'cs01' : cs01, 'dv01' : dv01}
+        return PricingResult(clean_price, dirty_price, clean_pv, dirty_pv, accrued_premium, days_accrued, cs01, dv01)
 
 
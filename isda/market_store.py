@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+
+from isda.market_data import Market_Data
+
+# files of a market store directory
+META_FILE = 'meta.json'
+DATES_FILE = 'dates.npy'
+RATES_FILE = 'rates.npy'
+SPREADS_FILE = 'spreads.npy'
+
+NO_ROW = -1
+
+
+def create_market_store(path, dates, instr_names, expiries, names, credit_spread_tenors):
+    """A new, writable market store of zeroed curves on dates, one row per date.
+
+    Fill it with store.rates[row] = ... and store.spreads[row] = ..., rows in
+    the order of dates, or with set_day, then flush().  Dates must be unique
+    and ascending, so that row + n is the nth store day after row.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if np.any(np.diff(dates) <= np.timedelta64(0, 'D')):
+        raise ValueError('Market store dates must be unique and ascending')
+    if len(instr_names) != len(expiries):
+        raise ValueError('Market store instruments and expiries do not match')
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump({'instr_names': instr_names, 'expiries': list(expiries), 'names': list(names),
+                   'credit_spread_tenors': list(credit_spread_tenors)}, f)
+    np.save(os.path.join(path, DATES_FILE), dates)
+    for file, shape in ((RATES_FILE, (len(dates), len(expiries))),
+                        (SPREADS_FILE, (len(dates), len(names), len(credit_spread_tenors)))):
+        np.lib.format.open_memmap(os.path.join(path, file), mode='w+', dtype=np.float64, shape=shape).flush()
+    return MarketDataStore(path, mode='r+')
+
+
+class MarketDataStore:
+    """Daily zero curve rates and CDS spread surfaces kept in memory-mapped files.
+
+    A store is a directory holding the zero curve instruments, reference
+    entities and spread tenors (meta.json), the dates and two arrays opened
+    with np.load(mmap_mode): rates (dates, instruments) and spreads (dates,
+    names, tenors).  Opening reads only the metadata and the dates, the curves
+    are paged in from disk when a day is looked up.  Days are found in O(1)
+    through a table indexed by the number of days from the first date.
+    """
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.instr_names = meta['instr_names']
+        self.expiries = meta['expiries']
+        self.names = meta['names']
+        self.credit_spread_tenors = meta['credit_spread_tenors']
+        self.name_index = {name: i for i, name in enumerate(self.names)}
+
+        self.dates = np.load(os.path.join(path, DATES_FILE))
+        self.rates = np.load(os.path.join(path, RATES_FILE), mmap_mode=mode)
+        self.spreads = np.load(os.path.join(path, SPREADS_FILE), mmap_mode=mode)
+
+        self.first_date = self.dates.min() if len(self.dates) else np.datetime64(0, 'D')
+        offsets = (self.dates - self.first_date).astype(np.int64)
+        self._rows = np.full(offsets.max() + 1 if len(offsets) else 0, NO_ROW, dtype=np.int64)
+        self._rows[offsets] = np.arange(len(offsets))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, date):
+        return self._row(date, missing=None) is not None
+
+    def row(self, date):
+        """Row of a date (datetime.date, datetime64 or ISO string)."""
+        return self._row(date)
+
+    def _row(self, date, missing=ValueError):
+        offset = int((np.datetime64(date, 'D') - self.first_date).astype(np.int64))
+        row = self._rows[offset] if 0 <= offset < len(self._rows) else NO_ROW
+        if row == NO_ROW:
+            if missing is None:
+                return None
+            raise missing('No market data for {}'.format(date))
+        return int(row)
+
+    def market_data(self, date):
+        """Market_Data of a day."""
+        row = self._row(date)
+        return Market_Data(self.dates[row].astype(object), rates=self.rates[row].tolist(),
+                           instr_names=self.instr_names, expiries=self.expiries)
+
+    def spread_surface(self, date):
+        """(names, tenors) credit spreads of a day, a view on the file."""
+        return self.spreads[self._row(date)]
+
+    def credit_spreads(self, date, names=None):
+        """{name: spreads} of a day for names (all by default), as taken by ISDAPortfolioModel and BatchRunner."""
+        surface = self.spread_surface(date)
+        names = self.names if names is None else names
+        return {name: surface[self.name_index[name]].tolist() for name in names}
+
+    def set_day(self, date, rates, spreads):
+        """Writes the curves of a day, the store must be open with mode='r+'."""
+        row = self._row(date)
+        self.rates[row] = rates
+        self.spreads[row] = spreads
+
+    def flush(self):
+        for array in (self.rates, self.spreads):
+            if isinstance(array, np.memmap):
+                array.flush()
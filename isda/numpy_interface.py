@@ -0,0 +1,189 @@
+from ctypes import POINTER, pointer
+import numpy as np
+
+from isda import numpy_model
+from isda.c_interface import TCurve
+from isda.dates import (ACT_360, ACT_365F, date_fwd_then_adjust, day_count_fraction, format_date, interval_to_freq,
+                        jpm_date, load_holidays, string_to_day_count, string_to_interval)
+from isda.struct_views import cash_flow_list_from_arrays, curve_array, curve_from_arrays
+
+
+class NumpyInterface:
+    """Drop-in replacement for CInterface backed by isda.numpy_model.
+
+    Methods take and return the same ctypes structures as CInterface so
+    ISDAModel, CDSTrade and the curve builders run unchanged on platforms
+    where ISDA_Clib.dll cannot be loaded.
+    """
+
+    def JpmcdsErrMsgOn(self):
+        return numpy_model.SUCCESS
+
+    def JpmcdsErrMsgEnableRecord(self, lines, length):
+        return numpy_model.SUCCESS
+
+    def JpmcdsDateIntervalToFreq(self, interval, freq):
+        freq[0] = interval_to_freq(interval_from_struct(interval))
+        return numpy_model.SUCCESS
+
+    def JpmcdsStringToDayCountConv(self, dayCountString, type):
+        type[0] = string_to_day_count(dayCountString)
+        return numpy_model.SUCCESS
+
+    def JpmcdsDateFwdThenAdjust(self, date, interval, badDayMethod, holidayFile, advAdjustedDate):
+        advAdjustedDate[0] = int(date_fwd_then_adjust(date, interval_from_struct(interval),
+                                                                  _value(badDayMethod), holidayFile))
+        return numpy_model.SUCCESS
+
+    def JpmcdsStringToDateInterval(self, input, label, interval):
+        prd, prd_type = string_to_interval(input)
+        interval.prd = prd
+        interval.prd_type = prd_type.encode('utf-8')
+        interval.flag = 0
+        return numpy_model.SUCCESS
+
+    def JpmcdsDate(self, year, month, day):
+        return int(jpm_date(year, month, day))
+
+    def JpmcdsBuildIRZeroCurve(self, spotDate, instrNames, dates, rates, nInstr, swapFreq, floatFreq, mmDCC, swapDCC, floatDCC, badDayConv, holidayFile):
+        nInstr = _value(nInstr)
+        curve = numpy_model.build_ir_zero_curve(spotDate, instrNames[:nInstr], list(dates[:nInstr]), list(rates[:nInstr]),
+                                                _value(swapFreq), _value(floatFreq), _value(mmDCC), _value(swapDCC),
+                                                _value(floatDCC), _value(badDayConv), holidayFile)
+        return pointer(curve_to_struct(curve))
+
+    def JpmcdsCdsPrice(self, today, valueDate, stepinDate, startDate, endDate, couponRate, payAccOnDefault, couponInterval, stubType, paymentDcc, badDayConv, calendar, discCurve, spreadCurve, recoveryRate, isPriceClean, price):
+        price[0] = float(numpy_model.cds_price(today, valueDate, stepinDate, startDate, endDate, couponRate,
+                                               payAccOnDefault, interval_from_struct(couponInterval),
+                                               stub_from_struct(stubType), _value(paymentDcc), _value(badDayConv),
+                                               calendar, curve_from_struct(discCurve), curve_from_struct(spreadCurve),
+                                               recoveryRate, isPriceClean)[0])
+        return numpy_model.SUCCESS
+
+    def cds_prices(self, today, valueDate, stepinDate, startDate, endDate, couponRate, payAccOnDefault, couponInterval, stubType, paymentDcc, badDayConv, calendar, discCurve, spreadCurve, recoveryRate):
+        """(clean, dirty, accrued) of JpmcdsCdsPrice from one valuation, the library has no such call."""
+        prices = numpy_model.cds_prices(today, valueDate, stepinDate, startDate, endDate, couponRate, payAccOnDefault,
+                                        interval_from_struct(couponInterval), stub_from_struct(stubType),
+                                        _value(paymentDcc), _value(badDayConv), calendar, curve_from_struct(discCurve),
+                                        curve_from_struct(spreadCurve), recoveryRate)
+        return tuple(float(price[0]) for price in prices)
+
+    def JpmcdsCdsParSpreads(self, today, stepinDate, startDate, nbEndDates, endDate, payAccOnDefault, couponInterval, stubType, paymentDcc, badDayConv, calendar, discCurve, spreadCurve, recoveryRate, parSpread):
+        nbEndDates = _value(nbEndDates)
+        par_spreads = numpy_model.cds_par_spreads(today, stepinDate, startDate, list(endDate[:nbEndDates]),
+                                                  payAccOnDefault, interval_from_struct(couponInterval),
+                                                  stub_from_struct(stubType), _value(paymentDcc), _value(badDayConv),
+                                                  calendar, curve_from_struct(discCurve),
+                                                  curve_from_struct(spreadCurve), recoveryRate)
+        for i, par_spread in enumerate(par_spreads):
+            parSpread[i] = float(par_spread)
+        return numpy_model.SUCCESS
+
+    def JpmcdsCdsoneUpfrontCharge(self, today, settlementDate, startDate1, stepinDate, startDate2, maturityDate, coupon,
+     payAccruedOnDefault, couponInterval, stub, accrueDCC, badDayConv, calendar, discCurve, oneSpread, recoveryRate,
+     payAccruedAtStart, upfrontCharge):
+        upfrontCharge[0] = float(numpy_model.cdsone_upfront(today, settlementDate, startDate1, stepinDate, startDate2,
+                                                            maturityDate, coupon, payAccruedOnDefault,
+                                                            interval_from_struct(couponInterval), stub_from_struct(stub),
+                                                            _value(accrueDCC), _value(badDayConv), calendar,
+                                                            curve_from_struct(discCurve), oneSpread, recoveryRate,
+                                                            payAccruedAtStart)[0])
+        return numpy_model.SUCCESS
+
+    def JpmcdsCdsFeeLegFlows(self, startDate, endDate, dateInterval, stubType, notional, couponRate, paymentDcc, badDayConv, calendar):
+        schedule = numpy_model.fee_leg_schedule(startDate, endDate, interval_from_struct(dateInterval),
+                                                stub_from_struct(stubType), _value(badDayConv), calendar)
+        valid = schedule['valid'][0]
+        amounts = notional * couponRate * day_count_fraction(schedule['acc_start'][0][valid],
+                                                                          schedule['acc_end'][0][valid], _value(paymentDcc))
+        return pointer(cash_flow_list_from_arrays(schedule['pay_date'][0][valid], amounts))
+
+    def JpmcdsCleanSpreadCurve(self, today, discCurve, startDate, stepinDate, cashSettleDate, nbDate, endDates, couponRates, includes, recoveryRate, payAccOnDefault, couponInterval, paymentDcc, stubType, badDayConv, calendar):
+        nbDate = _value(nbDate)
+        curve = numpy_model.clean_spread_curve(today, curve_from_struct(discCurve), startDate, stepinDate, cashSettleDate,
+                                               list(endDates[:nbDate]), list(couponRates[:nbDate]),
+                                               None if includes is None else list(includes[:nbDate]),
+                                               recoveryRate, payAccOnDefault, interval_from_struct(couponInterval),
+                                               _value(paymentDcc), stub_from_struct(stubType), _value(badDayConv), calendar)
+        return pointer(curve_to_struct(curve))
+
+    def JpmcdsHolidayLoadFromDisk(self, name, file):
+        load_holidays(name, file)
+        return numpy_model.SUCCESS
+
+    def JpmcdsStringToStubMethod(self, name, stubmethod):
+        stubmethod = getattr(stubmethod, '_obj', stubmethod)
+        stubmethod.stubAtEnd, stubmethod.longStub = numpy_model.string_to_stub_method(name)
+        return numpy_model.SUCCESS
+
+    def JpmcdsZeroPrice(self, creditCurve, date):
+        return float(curve_from_struct(creditCurve).zero_price(date))
+
+    def JpmcdsFreeTCurve(self, curve):
+        # curves are owned by Python, nothing to release
+        return None
+
+    def JpmcdsFormatDate(self, tdate):
+        return format_date(tdate)
+
+
+def zero_prices(curve, tdates):
+    """JpmcdsZeroPrice over an array of dates in one pass.
+
+    Gives discount factors for a zero curve and survival probabilities for a
+    credit curve, using the flat forward interpolation of the C library on the
+    TRatePt array of a TCurve (or pointer to one, or a NumpyCurve).
+    """
+    return curve_from_struct(curve).zero_price(np.asarray(tdates, dtype=np.int64))
+
+
+def _value(arg):
+    """Plain Python value of a ctypes scalar."""
+    return getattr(arg, 'value', arg)
+
+
+def interval_from_struct(interval):
+    if interval is None:
+        return None
+    interval = getattr(interval, '_obj', interval)
+    prd_type = interval.prd_type.decode('utf-8').upper()
+    return string_to_interval('{}{}'.format(interval.prd, prd_type))
+
+
+def stub_from_struct(stub):
+    stub = getattr(stub, '_obj', stub)
+    return bool(stub.stubAtEnd), bool(stub.longStub)
+
+
+# days in a year of each curve day count over the 365 of ACT/365F, only day counts linear in the days qualify
+_CURVE_YEAR_SCALES = {ACT_365F: 1.0, ACT_360: 365.0 / 360.0}
+
+
+def curve_from_struct(curve):
+    """NumpyCurve copy of a TCurve (or pointer to one).
+
+    Rates compounded fBasis times a year are turned into continuous ones and
+    ACT/360 times into ACT/365F, which leaves the discount factors unchanged;
+    other bases and day counts raise ValueError.
+    """
+    if isinstance(curve, numpy_model.NumpyCurve):
+        return curve
+    if isinstance(curve, POINTER(TCurve)):
+        curve = curve[0]
+    basis = curve.fBasis
+    if basis != numpy_model.CONTINUOUS_BASIS and not 0 < basis < numpy_model.CONTINUOUS_BASIS:
+        raise ValueError('Unsupported curve basis {}'.format(basis))
+    if curve.fDayCountConv not in _CURVE_YEAR_SCALES:
+        raise ValueError('Unsupported curve day count {}'.format(curve.fDayCountConv))
+    points = curve_array(curve)
+    dates = points['fDate'].astype(np.int64)
+    rates = points['fRate'].copy()
+    if basis != numpy_model.CONTINUOUS_BASIS:
+        rates = basis * np.log1p(rates / basis)
+    rates *= _CURVE_YEAR_SCALES[curve.fDayCountConv]
+    return numpy_model.NumpyCurve(curve.fBaseDate, dates, rates)
+
+
+def curve_to_struct(curve):
+    return curve_from_arrays(curve.base_date, curve.dates, curve.rates, numpy_model.CONTINUOUS_BASIS,
+                             ACT_365F)
@@ -0,0 +1,939 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from isda.dates import ACT_360, DAYS_IN_YEAR, add_months, business_day_adjust, date_fwd, day_count_fraction
+
+# Pure NumPy implementation of the pieces of the ISDA CDS Standard Model used by
+# ISDAModel: IR zero curve build, clean spread (hazard rate) bootstrap and CDS
+# pricing.  Dates are ISDA TDates (days since 1 January 1601) held in int64
+# arrays, curves are flat forward on continuously compounded ACT/365F rates.
+
+CONTINUOUS_BASIS = 5000
+
+# imaginary perturbation of complex step derivatives: f'(x) = Im f(x + ih) / h exactly up to rounding
+COMPLEX_STEP = 1e-20
+
+SUCCESS = 0
+FAILURE = -1
+
+
+def string_to_stub_method(text):
+    """'F/S' -> (stub_at_end, long_stub) = (False, False)."""
+    text = text.strip().upper()
+    if len(text) != 3 or text[0] not in 'FB' or text[2] not in 'SL':
+        raise ValueError('Unknown stub method {}'.format(text))
+    return text[0] == 'B', text[2] == 'L'
+
+
+class NumpyCurve:
+    """Flat forward curve, the NumPy counterpart of TCurve.
+
+    rates are continuously compounded ACT/365F zero rates at dates measured from
+    base_date.  rates may carry leading dimensions to hold several curves that
+    share the same node dates (one per name or scenario).  Complex rates are
+    kept complex so that a complex step can be carried through the pricer.
+    """
+
+    def __init__(self, base_date, dates, rates):
+        self.base_date = int(base_date)
+        self.dates = np.asarray(dates, dtype=np.int64)
+        rates = np.asarray(rates)
+        self.rates = rates.astype(np.result_type(rates.dtype, np.float64))
+        if self.rates.shape[-1:] != self.dates.shape:
+            raise ValueError('Curve dates and rates do not match')
+
+    @property
+    def times(self):
+        return (self.dates - self.base_date) / DAYS_IN_YEAR
+
+    def rt(self, tdates):
+        """-log(discount factor) from base_date, shape rates.shape[:-1] + tdates.shape.
+
+        Interpolation is linear in r*t (flat forwards) with a flat rate before
+        the first node and the last forward extrapolated after the last node.
+        """
+        t = (np.asarray(tdates, dtype=np.int64) - self.base_date) / DAYS_IN_YEAR
+        node_t = np.concatenate(([0.0], self.times))
+        node_rt = np.concatenate((np.zeros(self.rates.shape[:-1] + (1,)), self.rates * self.times), axis=-1)
+        i = np.clip(np.searchsorted(node_t, t, side='right') - 1, 0, len(node_t) - 2)
+        slope = (node_rt[..., i + 1] - node_rt[..., i]) / (node_t[i + 1] - node_t[i])
+        return node_rt[..., i] + slope * (t - node_t[i])
+
+    def zero_price(self, tdates):
+        return np.exp(-self.rt(tdates))
+
+    def __len__(self):
+        return len(self.dates)
+
+
+def build_ir_zero_curve(value_date, instr_names, dates, rates, fixed_swap_freq, float_swap_freq,
+                        mm_dcc, swap_dcc, float_dcc, bad_day_conv, holidays):
+    """Bootstrap money market ('M') and swap ('S') rates, as JpmcdsBuildIRZeroCurve.
+
+    Swap fixed legs are rolled back from the unadjusted maturity, on the day
+    of month of value_date, and bad day adjusted; the floating leg is taken
+    at par.  Every fixed coupon date beyond the previous maturity becomes a
+    curve node, as in the C library.  rates may carry
+    leading dimensions (one row per scenario), the curves are then built
+    together and returned as one multi-curve NumpyCurve.
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    rates = np.asarray(rates)
+    rates = rates.astype(np.result_type(rates.dtype, np.float64))
+    if not len(instr_names) == len(dates) == rates.shape[-1]:
+        raise ValueError('Zero curve instruments, dates and rates do not match')
+
+    node_dates = []
+    node_rt = []
+    coupon_interval = (int(round(12 / fixed_swap_freq)), 'M')
+    for k, (name, maturity) in enumerate(zip(instr_names, dates)):
+        rate = rates[..., k]
+        if node_dates and maturity <= node_dates[-1]:
+            continue
+        if name.upper() == 'M':
+            node_dates.append(int(maturity))
+            node_rt.append(np.log(1.0 + rate * day_count_fraction(value_date, maturity, mm_dcc)))
+        elif name.upper() == 'S':
+            months = _whole_months(value_date, maturity)
+            offsets = np.arange(months - coupon_interval[0], 0, -coupon_interval[0])[::-1]
+            unadjusted = add_months(value_date, offsets)
+            pay_dates = np.append(business_day_adjust(unadjusted, bad_day_conv, holidays), maturity)
+            accruals = day_count_fraction(np.insert(pay_dates[:-1], 0, value_date), pay_dates, swap_dcc)
+            new_dates, new_rt = _solve_swap(value_date, node_dates, node_rt, pay_dates, rate, accruals)
+            node_dates.extend(new_dates)
+            node_rt.extend(new_rt)
+        else:
+            raise ValueError('Unknown instrument type {}'.format(name))
+
+    node_dates = np.asarray(node_dates, dtype=np.int64)
+    return NumpyCurve(value_date, node_dates, np.stack(node_rt, axis=-1) / ((node_dates - value_date) / DAYS_IN_YEAR))
+
+
+def _whole_months(value_date, maturity):
+    """Months from value_date to the unadjusted date that maturity was bad day adjusted from."""
+    return int(round((maturity - value_date) * 12 / DAYS_IN_YEAR))
+
+
+def _solve_swap(value_date, node_dates, node_rt, pay_dates, rate, accruals):
+    """Newton solve for the r*t at swap maturity that prices the swap at par, for every row of rate at once."""
+    last_date = node_dates[-1] if node_dates else value_date
+    last_rt = np.asarray(node_rt[-1] if node_rt else 0.0)[..., None]
+    coupons = np.multiply.outer(rate, accruals)
+    known = pay_dates <= last_date
+    if node_dates:
+        known_curve = NumpyCurve(value_date, node_dates, np.stack(node_rt, axis=-1) / ((np.asarray(node_dates) - value_date) / DAYS_IN_YEAR))
+        known_pv = np.sum(coupons[..., known] * known_curve.zero_price(pay_dates[known]), axis=-1)
+    else:
+        known_pv = 0.0
+    new_dates = pay_dates[~known]
+    cash = coupons[..., ~known]
+    cash[..., -1] += 1.0
+    weight = (new_dates - last_date) / float(new_dates[-1] - last_date)
+
+    x = (rate * (new_dates[-1] - value_date) / DAYS_IN_YEAR)[..., None]
+    for _ in range(100):
+        df = np.exp(-(last_rt + (x - last_rt) * weight))
+        f = known_pv + np.sum(cash * df, axis=-1) - 1.0
+        step = (f / np.sum(cash * weight * df, axis=-1))[..., None]
+        x = x + step
+        if np.all(np.abs(step) < 1e-15):
+            break
+    new_rt = last_rt + (x - last_rt) * weight
+    return [int(d) for d in new_dates], [new_rt[..., j] for j in range(len(new_dates))]
+
+
+def fee_leg_schedule(start_date, end_date, coupon_interval=None, stub_type=(False, False),
+                     bad_day_conv=ord('F'), calendar=None, protect_start=True):
+    """Accrual and payment dates of CDS fee legs, as JpmcdsCdsFeeLegMake.
+
+    start_date and end_date are broadcast to N trades; the result holds
+    (N, K) arrays padded past each trade's last coupon, with `valid` marking
+    the real periods.
+    """
+    if coupon_interval is None:
+        coupon_interval = (3, 'M')
+    stub_at_end, long_stub = stub_type
+    start, end = np.broadcast_arrays(np.atleast_1d(np.asarray(start_date, dtype=np.int64)),
+                                     np.atleast_1d(np.asarray(end_date, dtype=np.int64)))
+    rows = np.arange(len(start))[:, None]
+    step_days = coupon_interval[0] * (30 if coupon_interval[1] == 'M' else 1)
+    size = int(np.max(end - start)) // max(step_days - 3, 1) + 3
+    count = np.arange(size + 1)
+
+    if stub_at_end:
+        cand = date_fwd(start[:, None], coupon_interval, count)
+        periods = np.sum(cand < end[:, None], axis=1)
+        stub = cand[rows[:, 0], periods] != end
+        periods = np.where(long_stub & stub & (periods > 1), periods - 1, periods)
+        bounds = np.where(count < periods[:, None], cand, end[:, None])
+    else:
+        cand = date_fwd(end[:, None], coupon_interval, -count)
+        periods = np.sum(cand > start[:, None], axis=1)
+        stub = cand[rows[:, 0], periods] != start
+        periods = np.where(long_stub & stub & (periods > 1), periods - 1, periods)
+        idx = periods[:, None] - count
+        bounds = np.where(idx >= 0, cand[rows, np.clip(idx, 0, size)], end[:, None])
+        bounds[:, 0] = start
+
+    width = int(np.max(periods))
+    adjusted = business_day_adjust(bounds[:, :width + 1], bad_day_conv, calendar)
+    period = np.arange(width)
+    last = period == (periods[:, None] - 1)
+    acc_start = adjusted[:, :-1].copy()
+    acc_start[:, 0] = start
+    acc_end = np.where(last, end[:, None] + (1 if protect_start else 0), adjusted[:, 1:])
+    pay_date = np.where(last, business_day_adjust(end, bad_day_conv, calendar)[:, None], adjusted[:, 1:])
+    return {'acc_start': acc_start, 'acc_end': acc_end, 'pay_date': pay_date, 'valid': period < periods[:, None]}
+
+
+class ScheduleCache:
+    """Fee leg schedules of distinct (accrual start, maturity) pairs, shared by every trade on them.
+
+    Standard CDS start and end on IMM dates, so a book of thousands of trades
+    holds a few hundred distinct schedules.  get() builds only the schedules
+    of pairs it has not seen under the same coupon interval, stub, payment
+    day count, bad day convention and calendar, and gathers the
+    fee_leg_schedule arrays of the trades from them, with the accrual
+    fractions of the periods ('accrual') precomputed.  At most max_size
+    schedules are kept, the least recently used are dropped first.
+    """
+
+    def __init__(self, max_size=4096):
+        if max_size < 1:
+            raise ValueError('Schedule cache size must be at least 1')
+        self.max_size = max_size
+        self._schedules = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, start_date, end_date, coupon_interval=None, stub_type=(False, False), payment_dcc=ACT_360,
+            bad_day_conv=ord('F'), calendar=None):
+        start, end = np.broadcast_arrays(np.atleast_1d(np.asarray(start_date, dtype=np.int64)),
+                                         np.atleast_1d(np.asarray(end_date, dtype=np.int64)))
+        # TDates fit in 32 bits, one int64 per pair sorts much faster than unique rows
+        codes, inverse = np.unique((start << 32) | end, return_inverse=True)
+        pairs = np.stack((codes >> 32, codes & 0xFFFFFFFF), axis=1)
+        conventions = (coupon_interval, tuple(stub_type), payment_dcc, bad_day_conv, calendar)
+        keys = [tuple(pair) + conventions for pair in pairs.tolist()]
+        entries = [self._schedules.get(key) for key in keys]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        for key in keys:
+            if key in self._schedules:
+                self._schedules.move_to_end(key)
+        if missing:
+            built = fee_leg_schedule(pairs[missing, 0], pairs[missing, 1], coupon_interval, stub_type, bad_day_conv,
+                                     calendar)
+            for row, i in enumerate(missing):
+                valid = built['valid'][row]
+                entry = {name: built[name][row][valid] for name in ('acc_start', 'acc_end', 'pay_date')}
+                entry['accrual'] = day_count_fraction(entry['acc_start'], entry['acc_end'], payment_dcc)
+                self._schedules[keys[i]] = entries[i] = entry
+            # the schedules of this call are already gathered, so even they may go
+            while len(self._schedules) > self.max_size:
+                self._schedules.popitem(last=False)
+                self.evictions += 1
+
+        periods = np.array([len(entry['accrual']) for entry in entries])
+        valid = np.arange(periods.max()) < periods[:, None]
+        schedule = {'valid': valid[inverse]}
+        for name in ('acc_start', 'acc_end', 'pay_date', 'accrual'):
+            # periods past the last coupon are padded with the end date and a zero accrual
+            block = np.zeros(valid.shape) if name == 'accrual' else np.repeat(pairs[:, 1:], valid.shape[1], axis=1)
+            block[valid] = np.concatenate([entry[name] for entry in entries])
+            schedule[name] = block[inverse]
+        return schedule
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._schedules),
+                'max_size': self.max_size}
+
+    def __len__(self):
+        return len(self._schedules)
+
+
+def _phi1(z):
+    """(1 - exp(-z)) / z"""
+    small = np.abs(z) < 1e-3
+    safe = np.where(small, 1.0, z)
+    # Horner form: powers of complex arrays are slow
+    return np.where(small, 1 - z * (1 / 2 - z * (1 / 6 - z * (1 / 24 - z / 120))), -np.expm1(-safe) / safe)
+
+
+def _phi2(z):
+    """(1 - exp(-z) * (1 + z)) / z**2"""
+    small = np.abs(z) < 1e-3
+    safe = np.where(small, 1.0, z)
+    return np.where(small, 1 / 2 - z * (1 / 3 - z * (1 / 8 - z * (1 / 30 - z / 144))),
+                    (1 - np.exp(-safe) * (1 + safe)) / (safe * safe))
+
+
+def _phi3(z):
+    """-d(_phi2)/dz = (2 * _phi2(z) - exp(-z)) / z"""
+    small = np.abs(z) < 1e-3
+    safe = np.where(small, 1.0, z)
+    return np.where(small, 1 / 3 - z * (1 / 4 - z * (1 / 10 - z * (1 / 36 - z / 168))),
+                    (2 * _phi2(safe) - np.exp(-safe)) / safe)
+
+
+class _Timeline:
+    """Survival and discounting on the merged node grid of a discount and a spread curve.
+
+    Hazard and forward rates are constant between grid points, so default
+    integrals are cumulated once per grid segment and then evaluated at any
+    date with a searchsorted.  Spread curves may hold several curves, selected
+    per trade with a curve index.
+    """
+
+    def __init__(self, today, disc_curve, spread_curve):
+        nodes = np.concatenate((disc_curve.dates, spread_curve.dates)) - today
+        self.today = today
+        self.grid = np.unique(np.concatenate(([0], nodes[nodes > 0])))
+        grid_dates = self.grid + today
+        log_s = np.atleast_2d(spread_curve.rt(grid_dates) - spread_curve.rt(today)[..., None])
+        log_p = np.atleast_2d(disc_curve.rt(grid_dates) - disc_curve.rt(today)[..., None])
+        log_s, log_p = np.broadcast_arrays(log_s, log_p)
+        dt = np.diff(self.grid) / DAYS_IN_YEAR
+        self.years = self.grid / DAYS_IN_YEAR
+        self.log_s = log_s
+        self.log_p = log_p
+        self.hazard = np.diff(log_s, axis=-1) / dt
+        self.total = self.hazard + np.diff(log_p, axis=-1) / dt
+        self.weight = self.hazard * np.exp(-(log_s + log_p))[:, :-1]
+        z = self.total * dt
+        zero = np.zeros(log_s.shape[:-1] + (1,))
+        self.cum0 = np.concatenate((zero, np.cumsum(self.weight * dt * _phi1(z), axis=-1)), axis=-1)
+        self.cum1 = np.concatenate((zero, np.cumsum(self.weight * (self.years[:-1] * dt * _phi1(z) + dt * dt * _phi2(z)), axis=-1)), axis=-1)
+
+    def _segment(self, tdates):
+        days = np.asarray(tdates, dtype=np.int64) - self.today
+        seg = np.clip(np.searchsorted(self.grid, days, side='right') - 1, 0, len(self.grid) - 2)
+        return seg, (days - self.grid[seg]) / DAYS_IN_YEAR
+
+    def survival(self, curve, tdates):
+        seg, dt = self._segment(tdates)
+        return np.exp(-(self.log_s[curve, seg] + self.hazard[curve, seg] * dt))
+
+    def discount(self, curve, tdates):
+        seg, dt = self._segment(tdates)
+        fwd = self.total[curve, seg] - self.hazard[curve, seg]
+        return np.exp(-(self.log_p[curve, seg] + fwd * dt))
+
+    def default_integrals(self, curve, tdates):
+        """Integrals of h.S.P and t.h.S.P from today to each date."""
+        seg, dt = self._segment(tdates)
+        z = self.total[curve, seg] * dt
+        w = self.weight[curve, seg]
+        j0 = self.cum0[curve, seg] + w * dt * _phi1(z)
+        j1 = self.cum1[curve, seg] + w * (self.years[seg] * dt * _phi1(z) + dt * dt * _phi2(z))
+        return j0, j1
+
+    # the arrays survival, discount and default_integrals read, see fields()
+    FIELDS = ('log_s', 'log_p', 'hazard', 'total', 'weight', 'cum0', 'cum1')
+
+    def fields(self):
+        """FIELDS concatenated, one row per curve."""
+        return np.concatenate([getattr(self, name) for name in self.FIELDS], axis=-1)
+
+    def field_offsets(self):
+        """Offset of each of FIELDS in a row of fields(), and the row length."""
+        sizes = [getattr(self, name).shape[-1] for name in self.FIELDS]
+        return dict(zip(self.FIELDS, np.cumsum([0] + sizes[:-1]).tolist())), sum(sizes)
+
+    # reverse sweeps of survival, discount and default_integrals: bar is the adjoint of their result
+
+    def survival_adjoint(self, curve, tdates, bar, adjoint):
+        seg, dt = self._segment(tdates)
+        bar = -bar * self.survival(curve, tdates)
+        adjoint.add('log_s', seg, bar)
+        adjoint.add('hazard', seg, bar * dt)
+
+    def discount_adjoint(self, curve, tdates, bar, adjoint):
+        seg, dt = self._segment(tdates)
+        bar = -bar * self.discount(curve, tdates)
+        adjoint.add('log_p', seg, bar)
+        adjoint.add('total', seg, bar * dt)
+        adjoint.add('hazard', seg, -bar * dt)
+
+    def default_integrals_adjoint(self, curve, tdates, bar0, bar1, adjoint):
+        seg, dt = self._segment(tdates)
+        z = self.total[curve, seg] * dt
+        w = self.weight[curve, seg]
+        years = self.years[seg]
+        phi1, phi2 = _phi1(z), _phi2(z)
+        adjoint.add('cum0', seg, bar0)
+        adjoint.add('cum1', seg, bar1)
+        adjoint.add('weight', seg, bar0 * dt * phi1 + bar1 * (years * dt * phi1 + dt * dt * phi2))
+        adjoint.add('total', seg, -w * dt * dt * (bar0 * phi2 + bar1 * (years * phi2 + dt * _phi3(z))))
+
+
+class _TimelineAdjoint:
+    """Adjoints of the fields of a _Timeline, one row per trade, summed over a reverse sweep."""
+
+    def __init__(self, timeline, n_trades):
+        self.offsets, self.size = timeline.field_offsets()
+        self.n_trades = n_trades
+        self.index = []
+        self.weights = []
+
+    def add(self, field, seg, bar):
+        """Adds bar to the adjoint of field at grid segment seg; the leading axis of bar is the trade."""
+        bar = np.asarray(bar, dtype=np.float64)
+        shape = np.broadcast_shapes(np.shape(seg), bar.shape, (self.n_trades,) + (1,) * (bar.ndim - 1))
+        trade = np.arange(self.n_trades).reshape((self.n_trades,) + (1,) * (len(shape) - 1))
+        self.index.append(np.broadcast_to(trade * self.size + self.offsets[field] + seg, shape).ravel())
+        self.weights.append(np.broadcast_to(bar, shape).ravel())
+
+    def array(self):
+        return np.bincount(np.concatenate(self.index), np.concatenate(self.weights),
+                           minlength=self.n_trades * self.size).reshape(self.n_trades, self.size)
+
+
+def _cds_legs(timeline, curve, value_date, stepin_date, start_date, end_date, coupon_rate, recovery_rate,
+              pay_accrual_on_default, schedule, payment_dcc):
+    """Contingent leg, dirty fee leg and accrued interest per unit notional, valued at value_date."""
+    today = timeline.today
+    curve = np.asarray(curve)
+    value_df = timeline.discount(curve, value_date)
+
+    prot_start = np.maximum(np.maximum(start_date, stepin_date) - 1, today)
+    c0, _ = timeline.default_integrals(curve, prot_start)
+    c1, _ = timeline.default_integrals(curve, end_date)
+    contingent = (1.0 - recovery_rate) * np.where(end_date > prot_start, c1 - c0, 0.0)
+
+    acc_start = schedule['acc_start']
+    acc_end = schedule['acc_end']
+    rate = coupon_rate[:, None]
+    live = schedule['valid'] & (acc_end > stepin_date)
+    accrual = schedule['accrual'] if 'accrual' in schedule else day_count_fraction(acc_start, acc_end, payment_dcc)
+    amount = rate * accrual
+    crv = curve[:, None]
+    obs_end = acc_end - 1
+    fee = np.sum(np.where(live, amount * timeline.survival(crv, obs_end) * timeline.discount(crv, schedule['pay_date']), 0.0), axis=1)
+    if pay_accrual_on_default:
+        obs_start = acc_start - 1
+        sub_start = np.maximum(obs_start, today)
+        s0, s1 = timeline.default_integrals(crv, sub_start)
+        e0, e1 = timeline.default_integrals(crv, obs_end)
+        acc_rate = amount * DAYS_IN_YEAR / np.maximum(acc_end - acc_start, 1)
+        anchor = (obs_start - today - 0.5) / DAYS_IN_YEAR
+        accrual = acc_rate * ((e1 - s1) - anchor * (e0 - s0))
+        fee = fee + np.sum(np.where(live & (obs_end > sub_start), accrual, 0.0), axis=1)
+
+    return contingent / value_df, fee / value_df, _accrued(schedule, stepin_date, coupon_rate, payment_dcc)
+
+
+def _cds_legs_adjoint(timeline, curve, value_date, stepin_date, start_date, end_date, coupon_rate, recovery_rate,
+                      pay_accrual_on_default, schedule, payment_dcc):
+    """Derivatives of the dirty price contingent - fee of _cds_legs with respect to the timeline, shape (N, fields).
+
+    The legs are valued forward as in _cds_legs and then swept in reverse; row
+    n holds the derivatives with respect to the fields of the curve of trade n
+    (_Timeline.fields), the other curves having no effect on it.
+    """
+    today = timeline.today
+    curve = np.asarray(curve)
+    adjoint = _TimelineAdjoint(timeline, len(curve))
+    value_df = timeline.discount(curve, value_date)
+
+    prot_start = np.maximum(np.maximum(start_date, stepin_date) - 1, today)
+    c0, _ = timeline.default_integrals(curve, prot_start)
+    c1, _ = timeline.default_integrals(curve, end_date)
+    protected = end_date > prot_start
+    contingent = (1.0 - recovery_rate) * np.where(protected, c1 - c0, 0.0)
+
+    acc_start = schedule['acc_start']
+    acc_end = schedule['acc_end']
+    rate = coupon_rate[:, None]
+    live = schedule['valid'] & (acc_end > stepin_date)
+    accrual = schedule['accrual'] if 'accrual' in schedule else day_count_fraction(acc_start, acc_end, payment_dcc)
+    amount = rate * accrual
+    crv = curve[:, None]
+    obs_end = acc_end - 1
+    survival = timeline.survival(crv, obs_end)
+    discount = timeline.discount(crv, schedule['pay_date'])
+    fee = np.sum(np.where(live, amount * survival * discount, 0.0), axis=1)
+    if pay_accrual_on_default:
+        obs_start = acc_start - 1
+        sub_start = np.maximum(obs_start, today)
+        s0, s1 = timeline.default_integrals(crv, sub_start)
+        e0, e1 = timeline.default_integrals(crv, obs_end)
+        acc_rate = amount * DAYS_IN_YEAR / np.maximum(acc_end - acc_start, 1)
+        anchor = (obs_start - today - 0.5) / DAYS_IN_YEAR
+        defaulted = live & (obs_end > sub_start)
+        fee = fee + np.sum(np.where(defaulted, acc_rate * ((e1 - s1) - anchor * (e0 - s0)), 0.0), axis=1)
+
+    # reverse sweep of (contingent - fee) / value_df
+    contingent_bar = 1.0 / value_df
+    timeline.discount_adjoint(curve, value_date, -(contingent - fee) / value_df ** 2, adjoint)
+    integral_bar = (1.0 - recovery_rate) * np.where(protected, contingent_bar, 0.0)
+    timeline.default_integrals_adjoint(curve, end_date, integral_bar, 0.0, adjoint)
+    timeline.default_integrals_adjoint(curve, prot_start, -integral_bar, 0.0, adjoint)
+    flow_bar = np.where(live, -amount * contingent_bar[:, None], 0.0)
+    timeline.survival_adjoint(crv, obs_end, flow_bar * discount, adjoint)
+    timeline.discount_adjoint(crv, schedule['pay_date'], flow_bar * survival, adjoint)
+    if pay_accrual_on_default:
+        accrual_bar = np.where(defaulted, -acc_rate * contingent_bar[:, None], 0.0)
+        timeline.default_integrals_adjoint(crv, obs_end, -anchor * accrual_bar, accrual_bar, adjoint)
+        timeline.default_integrals_adjoint(crv, sub_start, anchor * accrual_bar, -accrual_bar, adjoint)
+    return adjoint.array()
+
+
+def _accrued(schedule, stepin_date, coupon_rate, payment_dcc):
+    acc_start = schedule['acc_start']
+    accruing = schedule['valid'] & (acc_start <= stepin_date) & (stepin_date < schedule['acc_end'])
+    return np.sum(np.where(accruing, coupon_rate[:, None] * day_count_fraction(acc_start, stepin_date, payment_dcc),
+                           0.0), axis=1)
+
+
+def accrued_interest(stepin_date, start_date, end_date, coupon_rate, coupon_interval, stub_type, payment_dcc,
+                     bad_day_conv, calendar):
+    """Accrued premium per unit notional at stepin_date of N CDS, the accrued part of JpmcdsCdsPrice.
+
+    It depends on the fee leg schedule only, no curve is needed.
+    """
+    start, end, coupon = np.broadcast_arrays(np.atleast_1d(np.asarray(start_date, dtype=np.int64)),
+                                             np.atleast_1d(np.asarray(end_date, dtype=np.int64)),
+                                             np.atleast_1d(np.asarray(coupon_rate, dtype=np.float64)))
+    schedule = fee_leg_schedule(start, end, coupon_interval, stub_type, bad_day_conv, calendar)
+    return _accrued(schedule, stepin_date, coupon, payment_dcc)
+
+
+def cds_price(today, value_date, stepin_date, start_date, end_date, coupon_rate, pay_accrual_on_default,
+              coupon_interval, stub_type, payment_dcc, bad_day_conv, calendar, disc_curve, spread_curve,
+              recovery_rate, is_price_clean, curve_index=None, schedule_cache=None):
+    """Upfront price per unit notional of N CDS at once, as JpmcdsCdsPrice.
+
+    start_date, end_date, coupon_rate, recovery_rate and curve_index broadcast
+    to N trades; curve_index picks the row of a multi-curve spread_curve for
+    each trade.  The fee leg schedules come from schedule_cache, a
+    ScheduleCache, when one is given.
+    """
+    clean, dirty, _ = cds_prices(today, value_date, stepin_date, start_date, end_date, coupon_rate,
+                                 pay_accrual_on_default, coupon_interval, stub_type, payment_dcc, bad_day_conv,
+                                 calendar, disc_curve, spread_curve, recovery_rate, curve_index, schedule_cache)
+    return clean if is_price_clean else dirty
+
+
+def cds_prices(today, value_date, stepin_date, start_date, end_date, coupon_rate, pay_accrual_on_default,
+               coupon_interval, stub_type, payment_dcc, bad_day_conv, calendar, disc_curve, spread_curve,
+               recovery_rate, curve_index=None, schedule_cache=None):
+    """Clean price, dirty price and accrued per unit notional of N CDS from one valuation of the legs.
+
+    Arguments are those of cds_price; the prices have the sign of
+    JpmcdsCdsPrice and clean = dirty + accrued.
+    """
+    start, end, coupon, recovery, curve = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(start_date, dtype=np.int64)), np.atleast_1d(np.asarray(end_date, dtype=np.int64)),
+        np.atleast_1d(np.asarray(coupon_rate, dtype=np.float64)), np.atleast_1d(np.asarray(recovery_rate, dtype=np.float64)),
+        np.atleast_1d(np.asarray(0 if curve_index is None else curve_index, dtype=np.int64)))
+    if schedule_cache is None:
+        schedule = fee_leg_schedule(start, end, coupon_interval, stub_type, bad_day_conv, calendar)
+    else:
+        schedule = schedule_cache.get(start, end, coupon_interval, stub_type, payment_dcc, bad_day_conv, calendar)
+    timeline = _Timeline(today, disc_curve, spread_curve)
+    contingent, fee, accrued = _cds_legs(timeline, curve, value_date, stepin_date, start, end, coupon, recovery,
+                                         pay_accrual_on_default, schedule, payment_dcc)
+    price = contingent - fee
+    return price + accrued, price, accrued
+
+
+def cds_price_derivatives(today, value_date, stepin_date, start_date, end_date, coupon_rate, pay_accrual_on_default,
+                          coupon_interval, stub_type, payment_dcc, bad_day_conv, calendar, disc_curve, spread_curve,
+                          recovery_rate, disc_steps, spread_steps, curve_index=None, schedule_cache=None):
+    """Derivatives of the dirty prices of N CDS (cds_price) along J moves of their curves, shape (J, N).
+
+    Each move is given as a complex step of the curves: disc_steps and
+    spread_steps hold rates of shape (J, G, nodes), stepped by COMPLEX_STEP
+    along the move, where G is the number of curves of spread_curve and
+    either leading dimension may be 1.  One reverse sweep through the legs
+    (_cds_legs_adjoint) gives the derivatives of every price with respect to
+    the timeline of its curve; only the timeline, which all the trades share,
+    is built with the J steps.  The cost is about two pricings however many
+    moves there are.
+    """
+    start, end, coupon, recovery, curve = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(start_date, dtype=np.int64)), np.atleast_1d(np.asarray(end_date, dtype=np.int64)),
+        np.atleast_1d(np.asarray(coupon_rate, dtype=np.float64)), np.atleast_1d(np.asarray(recovery_rate, dtype=np.float64)),
+        np.atleast_1d(np.asarray(0 if curve_index is None else curve_index, dtype=np.int64)))
+    if schedule_cache is None:
+        schedule = fee_leg_schedule(start, end, coupon_interval, stub_type, bad_day_conv, calendar)
+    else:
+        schedule = schedule_cache.get(start, end, coupon_interval, stub_type, payment_dcc, bad_day_conv, calendar)
+    adjoint = _cds_legs_adjoint(_Timeline(today, disc_curve, spread_curve), curve, value_date, stepin_date, start, end,
+                                coupon, recovery, pay_accrual_on_default, schedule, payment_dcc)
+
+    shape = np.broadcast_shapes(disc_steps.rates.shape[:-1], spread_steps.rates.shape[:-1])
+    stepped = [NumpyCurve(steps.base_date, steps.dates,
+                          np.broadcast_to(steps.rates, shape + steps.rates.shape[-1:]).reshape(-1, len(steps)))
+               for steps in (disc_steps, spread_steps)]
+    tangents = (_Timeline(today, *stepped).fields().imag / COMPLEX_STEP).reshape(shape + (-1,))
+    derivatives = np.empty((shape[0], len(curve)))
+    for c in np.unique(curve):
+        rows = curve == c
+        derivatives[:, rows] = tangents[:, c] @ adjoint[rows].T
+    return derivatives
+
+
+def cds_par_spreads(today, stepin_date, start_date, end_dates, pay_accrual_on_default, coupon_interval, stub_type,
+                    payment_dcc, bad_day_conv, calendar, disc_curve, spread_curve, recovery_rate):
+    """Par spreads of CDS from start_date to each of end_dates, as JpmcdsCdsParSpreads.
+
+    The fee leg schedule is generated once for all the maturities and every
+    maturity of every curve is valued on one timeline.  The legs are valued at
+    today, as the library does, so the par spreads of a bootstrapped curve
+    differ from its quotes (priced at the cash settle date) by the
+    discounting of the accrued, about 1e-6 relative on the shortest quote.  spread_curve may hold
+    G curves, with recovery_rate broadcast to G; the result is then a (G, M)
+    matrix, otherwise it has one par spread per end date.
+    """
+    end_dates = np.atleast_1d(np.asarray(end_dates, dtype=np.int64))
+    n_curves = int(np.prod(spread_curve.rates.shape[:-1]))
+    n_dates = len(end_dates)
+    schedule = {key: np.tile(value, (n_curves, 1))
+                for key, value in fee_leg_schedule(start_date, end_dates, coupon_interval, stub_type, bad_day_conv,
+                                                   calendar).items()}
+    curve = np.repeat(np.arange(n_curves), n_dates)
+    recovery = np.repeat(np.broadcast_to(np.asarray(recovery_rate, dtype=np.float64), (n_curves,)), n_dates)
+    timeline = _Timeline(today, disc_curve, spread_curve)
+    # legs of a unit coupon, the clean fee leg is the risky annuity
+    contingent, fee, accrued = _cds_legs(timeline, curve, today, stepin_date, np.int64(start_date),
+                                         np.tile(end_dates, n_curves), np.ones(n_curves * n_dates), recovery,
+                                         pay_accrual_on_default, schedule, payment_dcc)
+    par_spreads = contingent / (fee - accrued)
+    return par_spreads.reshape(n_curves, n_dates) if spread_curve.rates.ndim > 1 else par_spreads
+
+
+def _flat_legs(today, disc_curve, hazard, value_date, stepin_date, start_date, end_date, coupon_rate, recovery_rate,
+               pay_accrual_on_default, schedule, payment_dcc):
+    """_cds_legs of N CDS, each on its own flat hazard rate curve."""
+    spread_curve = NumpyCurve(today, end_date.max(keepdims=True), hazard[:, None])
+    return _cds_legs(_Timeline(today, disc_curve, spread_curve), np.arange(len(hazard)), value_date, stepin_date,
+                     start_date, end_date, coupon_rate, recovery_rate, pay_accrual_on_default, schedule, payment_dcc)
+
+
+def _solve_hazards(objective, guess, tol=1e-14, max_iter=50):
+    """Roots of objective, increasing in each of its hazard rates, for all the hazard rates at once.
+
+    Newton steps take the derivative from a complex step; a step leaving the
+    bracket of a root is replaced by bisection.  hi is doubled until every
+    root is bracketed.
+    """
+    lo = np.zeros_like(guess)
+    if np.any(objective(lo).real > 0):
+        raise ValueError('Quote implies a negative hazard rate')
+    hi = np.maximum(2.0 * guess, 1e-4)
+    below = objective(hi).real < 0
+    while np.any(below):
+        if hi[below].max() > 1e3:
+            raise ValueError('Unable to bracket the root')
+        lo[below] = hi[below]
+        hi[below] *= 2.0
+        below = objective(hi).real < 0
+    hazard = np.where((guess > lo) & (guess < hi), guess, 0.5 * (lo + hi))
+    done = np.zeros(hazard.shape, dtype=bool)
+    for _ in range(max_iter):
+        value = objective(hazard + 1j * COMPLEX_STEP)
+        f, slope = value.real, value.imag / COMPLEX_STEP
+        lo = np.where(f < 0, hazard, lo)
+        hi = np.where(f > 0, hazard, hi)
+        newton = np.where(slope > 0, hazard - f / np.where(slope > 0, slope, 1.0), np.nan)
+        # a Newton step within rounding of the root, or a bracket closed onto it; converged roots are kept
+        tol1 = 4e-16 * np.abs(hazard) + 0.5 * tol
+        converged = (f == 0) | (np.abs(newton - hazard) <= tol1) | (hi - lo <= 2.0 * tol1)
+        inside = (newton > lo) & (newton < hi)
+        step = np.where(f == 0, hazard, np.where(converged | inside, newton, 0.5 * (lo + hi)))
+        hazard = np.where(done, hazard, step)
+        done |= converged
+        if done.all():
+            return hazard
+    raise ValueError('Hazard rates did not converge')
+
+
+def _cdsone_quotes(start_date, end_date, coupon_rate, quote, recovery_rate, benchmark_start_date):
+    return np.broadcast_arrays(
+        np.atleast_1d(np.asarray(start_date, dtype=np.int64)), np.atleast_1d(np.asarray(end_date, dtype=np.int64)),
+        np.atleast_1d(np.asarray(coupon_rate, dtype=np.float64)), np.atleast_1d(np.asarray(quote, dtype=np.float64)),
+        np.atleast_1d(np.asarray(recovery_rate, dtype=np.float64)),
+        np.atleast_1d(np.asarray(benchmark_start_date, dtype=np.int64)))
+
+
+def cdsone_upfront(today, value_date, benchmark_start_date, stepin_date, start_date, end_date, coupon_rate,
+                   pay_accrual_on_default, coupon_interval, stub_type, payment_dcc, bad_day_conv, calendar, disc_curve,
+                   one_spread, recovery_rate, pay_accrued_at_start):
+    """Upfront charges per unit notional of N CDS quoted in conventional spread, as JpmcdsCdsoneUpfrontCharge.
+
+    Each quote one_spread is turned into a flat hazard rate curve on which
+    the benchmark CDS (from benchmark_start_date, paying one_spread) prices
+    at par; the CDS paying coupon_rate is then priced on that curve, clean
+    when pay_accrued_at_start.  The flat hazard rates of all the quotes are
+    solved together.
+    """
+    start, end, coupon, spread, recovery, benchmark_start = _cdsone_quotes(start_date, end_date, coupon_rate,
+                                                                           one_spread, recovery_rate,
+                                                                           benchmark_start_date)
+    benchmark = fee_leg_schedule(benchmark_start, end, coupon_interval, stub_type, bad_day_conv, calendar)
+
+    def objective(hazard):
+        contingent, fee, accrued = _flat_legs(today, disc_curve, hazard, value_date, stepin_date, benchmark_start,
+                                              end, spread, recovery, pay_accrual_on_default, benchmark, payment_dcc)
+        return contingent - fee + accrued
+
+    hazard = _solve_hazards(objective, spread / (1.0 - recovery))
+    schedule = fee_leg_schedule(start, end, coupon_interval, stub_type, bad_day_conv, calendar)
+    contingent, fee, accrued = _flat_legs(today, disc_curve, hazard, value_date, stepin_date, start, end, coupon,
+                                          recovery, pay_accrual_on_default, schedule, payment_dcc)
+    return contingent - fee + (accrued if pay_accrued_at_start else 0.0)
+
+
+def cdsone_spread(today, value_date, benchmark_start_date, stepin_date, start_date, end_date, coupon_rate,
+                  pay_accrual_on_default, coupon_interval, stub_type, payment_dcc, bad_day_conv, calendar, disc_curve,
+                  upfront_charge, recovery_rate, pay_accrued_at_start):
+    """Conventional spreads of N CDS quoted as upfront charges, the inverse of cdsone_upfront.
+
+    The flat hazard rates at which the CDS paying coupon_rate are worth
+    upfront_charge are solved together, and the conventional spread is the
+    par spread of the benchmark CDS on each flat curve.
+    """
+    start, end, coupon, upfront, recovery, benchmark_start = _cdsone_quotes(start_date, end_date, coupon_rate,
+                                                                            upfront_charge, recovery_rate,
+                                                                            benchmark_start_date)
+    schedule = fee_leg_schedule(start, end, coupon_interval, stub_type, bad_day_conv, calendar)
+
+    def objective(hazard):
+        contingent, fee, accrued = _flat_legs(today, disc_curve, hazard, value_date, stepin_date, start, end,
+                                              coupon, recovery, pay_accrual_on_default, schedule, payment_dcc)
+        return contingent - fee + (accrued if pay_accrued_at_start else 0.0) - upfront
+
+    # an upfront u is worth about u / T a year of spread over the coupon
+    years = np.maximum(end - today, 1) / DAYS_IN_YEAR
+    hazard = _solve_hazards(objective, np.maximum(coupon + upfront / years, 1e-6) / (1.0 - recovery))
+    benchmark = fee_leg_schedule(benchmark_start, end, coupon_interval, stub_type, bad_day_conv, calendar)
+    contingent, fee, accrued = _flat_legs(today, disc_curve, hazard, value_date, stepin_date, benchmark_start, end,
+                                          np.ones(len(end)), recovery, pay_accrual_on_default, benchmark, payment_dcc)
+    return contingent / (fee - accrued)
+
+
+def clean_spread_curve(today, disc_curve, start_date, stepin_date, cash_settle_date, end_dates, coupon_rates,
+                       includes, recovery_rate, pay_accrual_on_default, coupon_interval, payment_dcc, stub_type,
+                       bad_day_conv, calendar, previous=None):
+    """Bootstrap piecewise constant hazard rates from par spreads, as JpmcdsCleanSpreadCurve.
+
+    Each benchmark CDS is priced clean and the hazard rate of its segment is
+    solved so that the upfront is zero.
+
+    previous is (curve, coupon_rates) of an earlier bootstrap of the same
+    dates on the same discount curve.  The hazard rates before the first
+    spread that changed are kept and the later ones are solved from a
+    bracket around their previous value.
+    """
+    end_dates = np.asarray(end_dates, dtype=np.int64)
+    coupon_rates = np.asarray(coupon_rates, dtype=np.float64)
+    if len(end_dates) != len(coupon_rates):
+        raise ValueError('Spread curve dates and spreads do not match')
+    if previous is not None:
+        previous_curve, previous_rates = previous
+        previous_rates = np.asarray(previous_rates, dtype=np.float64)
+        if previous_rates.shape != coupon_rates.shape:
+            raise ValueError('Previous spreads do not match')
+    if includes is not None:
+        keep = np.asarray(includes, dtype=bool)
+        end_dates, coupon_rates = end_dates[keep], coupon_rates[keep]
+        if previous is not None:
+            previous_rates = previous_rates[keep]
+    if np.any(np.diff(end_dates) <= 0) or end_dates[0] <= today:
+        raise ValueError('Spread curve dates must be increasing and after today')
+
+    schedule = fee_leg_schedule(start_date, end_dates, coupon_interval, stub_type, bad_day_conv, calendar)
+    times = (end_dates - today) / DAYS_IN_YEAR
+    node_rt = np.zeros(len(end_dates))
+    curve = np.zeros(1, dtype=np.int64)
+    first = 0
+    if previous is not None:
+        if previous_curve.base_date != today or not np.array_equal(previous_curve.dates, end_dates):
+            raise ValueError('Previous spread curve dates do not match')
+        previous_rt = previous_curve.rates * previous_curve.times
+        changed = np.flatnonzero(previous_rates != coupon_rates)
+        first = changed[0] if len(changed) else len(end_dates)
+        node_rt[:first] = previous_rt[:first]
+        move = np.max(np.abs(coupon_rates - previous_rates)) / (1.0 - recovery_rate)
+    for i in range(first, len(end_dates)):
+        row = {key: value[i:i + 1] for key, value in schedule.items()}
+        prev_t, prev_rt = (times[i - 1], node_rt[i - 1]) if i else (0.0, 0.0)
+
+        def objective(hazard):
+            node_rt[i] = prev_rt + hazard * (times[i] - prev_t)
+            spread_curve = NumpyCurve(today, end_dates[:i + 1], node_rt[:i + 1] / times[:i + 1])
+            timeline = _Timeline(today, disc_curve, spread_curve)
+            contingent, fee, accrued = _cds_legs(timeline, curve, cash_settle_date, stepin_date,
+                                                 np.int64(start_date), end_dates[i:i + 1], coupon_rates[i:i + 1],
+                                                 recovery_rate, pay_accrual_on_default, row, payment_dcc)
+            return float(contingent[0] - fee[0] + accrued[0])
+
+        guess = coupon_rates[i] / (1.0 - recovery_rate)
+        if previous is None:
+            objective(_brent(objective, 0.0, max(2.0 * guess, 1e-4)))
+        else:
+            # a spread move of ds shifts the hazard of the segment by about ds / (1 - R), scaled up by the
+            # share of the benchmark already fixed by earlier segments
+            previous_hazard = (previous_rt[i] - (previous_rt[i - 1] if i else 0.0)) / (times[i] - prev_t)
+            width = max(move * times[i] / (times[i] - prev_t), 1e-10)
+            objective(_secant(objective, previous_hazard, width, max(2.0 * guess, 1e-4)))
+
+    return NumpyCurve(today, end_dates, node_rt / times)
+
+
+def clean_spread_curves(today, disc_curve, start_date, stepin_date, cash_settle_date, end_dates, coupon_rates,
+                        recovery_rate, pay_accrual_on_default, coupon_interval, payment_dcc, stub_type, bad_day_conv,
+                        calendar):
+    """clean_spread_curve for G names at once, solving each pillar for all the names in lock-step.
+
+    coupon_rates are the (G, K) par spreads of the names on the K end_dates
+    and recovery_rate is broadcast to G.  disc_curve holds one curve shared by
+    all the names or one curve per name.  The fee leg schedule is generated
+    once and the hazard rates of a pillar are found by Newton steps on the
+    G-vector (_solve_hazards).  Returns the G curves stacked in one NumpyCurve.
+    """
+    end_dates = np.asarray(end_dates, dtype=np.int64)
+    coupon_rates = np.atleast_2d(np.asarray(coupon_rates, dtype=np.float64))
+    n_curves, n_nodes = coupon_rates.shape
+    if n_nodes != len(end_dates):
+        raise ValueError('Spread curve dates and spreads do not match')
+    if np.any(np.diff(end_dates) <= 0) or end_dates[0] <= today:
+        raise ValueError('Spread curve dates must be increasing and after today')
+    recovery = np.broadcast_to(np.asarray(recovery_rate, dtype=np.float64), (n_curves,))
+
+    schedule = fee_leg_schedule(start_date, end_dates, coupon_interval, stub_type, bad_day_conv, calendar)
+    times = (end_dates - today) / DAYS_IN_YEAR
+    node_rt = np.zeros((n_curves, n_nodes))
+    curve = np.arange(n_curves)
+    start = np.int64(start_date)
+    for i in range(n_nodes):
+        # one schedule row, cut to its periods, broadcast against the curves
+        periods = int(schedule['valid'][i].sum())
+        row = {key: value[i:i + 1, :periods] for key, value in schedule.items()}
+        end = np.full(n_curves, end_dates[i])
+        prev_t, prev_rt = (times[i - 1], node_rt[:, i - 1]) if i else (0.0, 0.0)
+
+        def objective(hazard):
+            rt = node_rt[:, :i + 1].astype(hazard.dtype)
+            rt[:, i] = prev_rt + hazard * (times[i] - prev_t)
+            spread_curve = NumpyCurve(today, end_dates[:i + 1], rt / times[:i + 1])
+            timeline = _Timeline(today, disc_curve, spread_curve)
+            contingent, fee, accrued = _cds_legs(timeline, curve, cash_settle_date, stepin_date, start, end,
+                                                 coupon_rates[:, i], recovery, pay_accrual_on_default, row,
+                                                 payment_dcc)
+            return contingent - fee + accrued
+
+        # credit triangle on the forward spread of the segment
+        forward = coupon_rates[:, i] * times[i] - (coupon_rates[:, i - 1] * prev_t if i else 0.0)
+        guess = np.maximum(forward / (times[i] - prev_t), 0.1 * coupon_rates[:, i]) / (1.0 - recovery)
+        hazard = _solve_hazards(objective, guess)
+        node_rt[:, i] = prev_rt + hazard * (times[i] - prev_t)
+
+    return NumpyCurve(today, end_dates, node_rt / times)
+
+
+def spread_curve_jacobian(today, disc_curve, spread_curve, start_date, stepin_date, cash_settle_date, coupon_rates,
+                          recovery_rate, pay_accrual_on_default, coupon_interval, payment_dcc, stub_type, bad_day_conv,
+                          calendar):
+    """Derivatives of the node r*t of bootstrapped spread curves with respect to their par spreads.
+
+    spread_curve holds G curves from clean_spread_curve (rates of shape (G, K))
+    and coupon_rates the (G, K) par spreads they were bootstrapped from.  The
+    benchmarks price at zero, B(x(s), s) = 0, so dx/ds = -(dB/dx)^-1 dB/ds:
+    dB/dx is taken column by column with a complex step on one node of every
+    curve at once, and dB/ds is the clean price of a unit coupon fee leg.  Returns a
+    (G, K, K) array indexed [curve, node, spread].
+    """
+    node_rt = np.atleast_2d(spread_curve.rates) * spread_curve.times
+    n_curves, n_nodes = node_rt.shape
+    end_dates = np.tile(spread_curve.dates, n_curves)
+    schedule = {key: np.tile(value, (n_curves, 1))
+                for key, value in fee_leg_schedule(start_date, spread_curve.dates, coupon_interval, stub_type,
+                                                   bad_day_conv, calendar).items()}
+    curve = np.repeat(np.arange(n_curves), n_nodes)
+    coupon = np.asarray(coupon_rates, dtype=np.float64).reshape(-1)
+    recovery = np.repeat(np.broadcast_to(np.asarray(recovery_rate, dtype=np.float64), (n_curves,)), n_nodes)
+    start = np.int64(start_date)
+
+    def benchmarks(curves, coupon):
+        timeline = _Timeline(today, disc_curve, curves)
+        contingent, fee, accrued = _cds_legs(timeline, curve, cash_settle_date, stepin_date, start, end_dates, coupon,
+                                             recovery, pay_accrual_on_default, schedule, payment_dcc)
+        return (contingent - fee + accrued).reshape(n_curves, n_nodes)
+
+    db_dx = np.empty((n_curves, n_nodes, n_nodes))
+    for j in range(n_nodes):
+        stepped = node_rt.astype(np.complex128)
+        stepped[:, j] += 1j * COMPLEX_STEP
+        db_dx[:, :, j] = benchmarks(NumpyCurve(today, spread_curve.dates, stepped / spread_curve.times), coupon).imag / COMPLEX_STEP
+    # benchmark prices are linear in the coupon
+    curves = NumpyCurve(today, spread_curve.dates, node_rt / spread_curve.times)
+    db_ds = benchmarks(curves, np.ones_like(coupon)) - benchmarks(curves, np.zeros_like(coupon))
+    return -np.linalg.solve(db_dx, db_ds[:, :, None] * np.eye(n_nodes))
+
+
+def _secant(f, guess, width, hi, tol=1e-15, max_iter=20):
+    """Secant method from guess and guess + width; Brent's method on [0, hi] if it does not converge."""
+    x0, x1 = guess, guess + width
+    f0, f1 = f(x0), f(x1)
+    for _ in range(max_iter):
+        if f1 == f0:
+            break
+        x0, x1, f0 = x1, x1 - f1 * (x1 - x0) / (f1 - f0), f1
+        if x1 < 0:
+            break
+        if abs(x1 - x0) <= 2e-16 * abs(x1) + 0.5 * tol:
+            return x1
+        f1 = f(x1)
+    return _brent(f, 0.0, hi)
+
+
+def _brent(f, lo, hi, tol=1e-15, max_iter=200):
+    """Brent's method; hi is expanded until the root is bracketed."""
+    f_lo, f_hi = f(lo), f(hi)
+    while f_lo * f_hi > 0:
+        if hi > 1e3:
+            raise ValueError('Unable to bracket the root')
+        lo, f_lo = hi, f_hi
+        hi *= 2.0
+        f_hi = f(hi)
+    a, b, fa, fb = lo, hi, f_lo, f_hi
+    c, fc, d = a, fa, b - a
+    e = d
+    for _ in range(max_iter):
+        if fb * fc > 0:
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol1 = 2e-16 * abs(b) + 0.5 * tol
+        xm = 0.5 * (c - b)
+        if abs(xm) <= tol1 or fb == 0:
+            return b
+        if abs(e) >= tol1 and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                p, q = 2 * xm * s, 1 - s
+            else:
+                q, r = fa / fc, fb / fc
+                p = s * (2 * xm * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * xm * q - abs(tol1 * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = xm
+        else:
+            d = e = xm
+        a, fa = b, fb
+        b += d if abs(d) > tol1 else (tol1 if xm > 0 else -tol1)
+        fb = f(b)
+    return b
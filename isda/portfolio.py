@@ -0,0 +1,228 @@
+import numpy as np
+
+from isda import numpy_model
+from isda.dates import from_datetime64, next_imm_date, tenor_months
+from isda.results import to_records
+from isda.valuation_context import ValuationContext
+
+TRADE_COLUMNS = ('refob', 'accrual_start_date', 'maturity_date', 'running_coupon', 'recovery_rate', 'notional',
+                 'is_buy_protection')
+
+
+def trade_columns(trades):
+    """Columns of a book given as a list of CDSTrade or a dict of columns.
+
+    Dates may be TDates or datetime64; the result holds NumPy arrays keyed as
+    TRADE_COLUMNS.
+    """
+    if isinstance(trades, dict):
+        missing = [name for name in TRADE_COLUMNS if name not in trades]
+        if missing:
+            raise ValueError('Trade table is missing columns {}'.format(missing))
+        columns = {name: np.asarray(trades[name]) for name in TRADE_COLUMNS}
+    else:
+        columns = {name: np.asarray([getattr(cds, name) for cds in trades]) for name in TRADE_COLUMNS}
+    for name in ('accrual_start_date', 'maturity_date'):
+        if columns[name].dtype.kind == 'M':
+            columns[name] = from_datetime64(columns[name])
+    columns['refob'] = columns['refob'].astype(str)
+    columns['is_buy_protection'] = columns['is_buy_protection'].astype(bool)
+    for name in ('running_coupon', 'recovery_rate', 'notional'):
+        columns[name] = columns[name].astype(np.float64)
+    return columns
+
+
+class ISDAPortfolioModel:
+    """Prices a book of CDS on the NumPy backend, building each curve once.
+
+    Trades are grouped by reference entity and recovery rate; one credit curve
+    is bootstrapped per group against a single zero curve, and the whole book
+    is then priced in one vectorized call.  The benchmark CDS of the curves
+    start on the valuation date, as for quotes of the day, whatever the
+    effective dates of the trades.  ISDAModel starts them on the effective
+    date of its trade instead, so the two agree on a seasoned trade when
+    ISDAModel is given it with effective_date set to the valuation date.  credit_spreads maps each reference
+    entity to its par spreads on credit_spread_tenors; for a list of CDSTrade
+    both default to the spreads held on the trades.  The valuation, step-in
+    and cash settle dates, the zero curve instrument dates and the
+    conventions are taken from context, a ValuationContext built for market
+    unless one is given; they are copied so that the book can be sent to
+    worker processes.
+    """
+
+    def __init__(self, trades, market, credit_spreads=None, credit_spread_tenors=None, context=None):
+        self.market = market
+        self.trades = trade_columns(trades)
+        if credit_spreads is None or credit_spread_tenors is None:
+            if isinstance(trades, dict):
+                raise ValueError('credit_spreads and credit_spread_tenors are required for a trade table')
+            credit_spreads = credit_spreads or self._trade_spreads(trades)
+            credit_spread_tenors = credit_spread_tenors or trades[0].credit_spread_tenors
+        self.credit_spreads = {refob: list(spreads) for refob, spreads in credit_spreads.items()}
+        self.credit_spread_tenors = list(credit_spread_tenors)
+        self.credit_spread_months = tenor_months(self.credit_spread_tenors)
+        for refob, spreads in self.credit_spreads.items():
+            if len(spreads) != len(self.credit_spread_tenors):
+                raise ValueError('{} - credit spread tenors and spreads do not match'.format(refob))
+
+        if context is None:
+            context = ValuationContext(market, backend='numpy')
+        self.valuation_date = context.valuation_date
+        self.step_in_date = context.step_in_date
+        self.cash_settle_date = context.cash_settle_date
+        self.zero_curve_dates = context.zero_curve_dates
+        self.zero_curve_conventions = context.zero_curve_conventions
+        self.payment_dcc = context.payment_dcc
+        self.stub_type = context.stub_type
+        self.bad_day_conv = context.bad_day_conv
+        self.calendar = context.calendar
+        # the trades of a roll share their fee leg schedule, built on first pricing
+        self.schedules = numpy_model.ScheduleCache()
+
+        keys = list(zip(self.trades['refob'], self.trades['recovery_rate']))
+        self.groups = sorted(set(keys))
+        index = {key: i for i, key in enumerate(self.groups)}
+        self.curve_index = np.array([index[key] for key in keys], dtype=np.int64)
+
+    @staticmethod
+    def _trade_spreads(trades):
+        spreads = {}
+        for cds in trades:
+            if spreads.setdefault(cds.refob, list(cds.credit_spreads)) != list(cds.credit_spreads):
+                raise ValueError('{} - trades carry different credit spreads'.format(cds.refob))
+        return spreads
+
+    def buildZeroCurve(self, shift=None):
+        """shift is a parallel rate shift, one shift per market instrument or one row of them per curve."""
+        rates = np.asarray(self.market.rates) + (0.0 if shift is None else np.asarray(shift))
+        return numpy_model.build_ir_zero_curve(self.valuation_date, self.market.instr_names, self.zero_curve_dates,
+                                               rates, *self.zero_curve_conventions)
+
+    def imm_dates(self):
+        return next_imm_date(np.datetime64(self.market.valuation_date), self.credit_spread_months)
+
+    def buildCreditCurves(self, zero_curve, shift=None):
+        """One curve per (refob, recovery) group, stacked into a multi-curve NumpyCurve.
+
+        shift is a parallel spread shift, one shift per credit spread tenor or
+        one row of tenor shifts per group, in the order of groups.  The groups
+        are bootstrapped together, pillar by pillar (clean_spread_curves).
+        """
+        spreads = np.array([self.credit_spreads[refob] for refob, _ in self.groups], dtype=np.float64)
+        return self.bootstrap(zero_curve, spreads + (0.0 if shift is None else np.asarray(shift)))
+
+    def bootstrap(self, zero_curves, spreads):
+        """Credit curves of (curve, tenor) spreads of the groups, repeated as many times as needed.
+
+        zero_curves is one zero curve or one zero curve per row of spreads;
+        row r takes the recovery rate of group r modulo the number of groups.
+        """
+        spreads = np.atleast_2d(spreads)
+        recovery_rates = np.array([recovery_rate for _, recovery_rate in self.groups])
+        return numpy_model.clean_spread_curves(self.valuation_date, zero_curves, self.valuation_date,
+                                               self.step_in_date, self.cash_settle_date, self.imm_dates(), spreads,
+                                               np.tile(recovery_rates, len(spreads) // len(self.groups)), True, None,
+                                               self.payment_dcc, self.stub_type, self.bad_day_conv, self.calendar)
+
+    def updateCreditCurves(self, zero_curve, credit_curves, previous_spreads, shift=None):
+        """credit_curves from buildCreditCurves, updated after credit_spreads moved from previous_spreads.
+
+        Only the groups of reference entities whose spreads changed are
+        rebootstrapped, each from its first changed tenor and starting from
+        its previous hazard rates; the other curves are kept as they are.
+        shift is the shift credit_curves were built with.
+        """
+        end_dates = self.imm_dates()
+        rates = np.array(credit_curves.rates)
+        shifts = np.broadcast_to(0.0 if shift is None else np.asarray(shift),
+                                 (len(self.groups), len(self.credit_spread_tenors)))
+        for g, (refob, recovery_rate) in enumerate(self.groups):
+            if np.array_equal(self.credit_spreads[refob], previous_spreads[refob]):
+                continue
+            spreads = np.asarray(self.credit_spreads[refob], dtype=np.float64) + shifts[g]
+            old_spreads = np.asarray(previous_spreads[refob], dtype=np.float64) + shifts[g]
+            previous = numpy_model.NumpyCurve(self.valuation_date, end_dates, rates[g])
+            curve = numpy_model.clean_spread_curve(self.valuation_date, zero_curve, self.valuation_date,
+                                                   self.step_in_date, self.cash_settle_date, end_dates, spreads, None,
+                                                   recovery_rate, True, None, self.payment_dcc, self.stub_type,
+                                                   self.bad_day_conv, self.calendar, previous=(previous, old_spreads))
+            rates[g] = curve.rates
+        return numpy_model.NumpyCurve(self.valuation_date, end_dates, rates)
+
+    def par_spreads(self, zero_curve, credit_curves, end_dates=None):
+        """(group, maturity) par spreads of the curves from buildCreditCurves at end_dates, by default the IMM dates of the tenors."""
+        end_dates = self.imm_dates() if end_dates is None else end_dates
+        recovery_rates = np.array([recovery_rate for _, recovery_rate in self.groups])
+        return numpy_model.cds_par_spreads(self.valuation_date, self.step_in_date, self.valuation_date, end_dates, True,
+                                           None, self.stub_type, self.payment_dcc, self.bad_day_conv, self.calendar,
+                                           zero_curve, credit_curves, recovery_rates)
+
+    def credit_curve_jacobian(self, zero_curve, credit_curves):
+        """d(node r*t)/d(par spread) of the curves from buildCreditCurves, shape (group, node, tenor)."""
+        spreads = np.array([self.credit_spreads[refob] for refob, _ in self.groups])
+        recovery_rates = np.array([recovery_rate for _, recovery_rate in self.groups])
+        return numpy_model.spread_curve_jacobian(self.valuation_date, zero_curve, credit_curves, self.valuation_date,
+                                                 self.step_in_date, self.cash_settle_date, spreads, recovery_rates,
+                                                 True, None, self.payment_dcc, self.stub_type, self.bad_day_conv,
+                                                 self.calendar)
+
+    def calc_cds_price(self, zero_curve, credit_curves, is_clean, rows=None):
+        """Prices of the book, or of the trades at positions rows only."""
+        rows = slice(None) if rows is None else rows
+        price = numpy_model.cds_price(self.valuation_date, self.cash_settle_date, self.step_in_date,
+                                      self.trades['accrual_start_date'][rows], self.trades['maturity_date'][rows],
+                                      self.trades['running_coupon'][rows] / 10000., True, None, self.stub_type,
+                                      self.payment_dcc, self.bad_day_conv, self.calendar, zero_curve, credit_curves,
+                                      self.trades['recovery_rate'][rows], is_clean, self.curve_index[rows],
+                                      self.schedules)
+        return price * -1.0
+
+    def calc_cds_price_derivatives(self, zero_curve, credit_curves, zero_steps, credit_steps):
+        """(move, trade) derivatives of the dirty prices of calc_cds_price along complex stepped curves.
+
+        zero_steps and credit_steps hold one stepped copy of the curves per
+        move, with rates of shape (move, 1, nodes) and (move, group, nodes),
+        see numpy_model.cds_price_derivatives.
+        """
+        derivatives = numpy_model.cds_price_derivatives(
+            self.valuation_date, self.cash_settle_date, self.step_in_date, self.trades['accrual_start_date'],
+            self.trades['maturity_date'], self.trades['running_coupon'] / 10000., True, None, self.stub_type,
+            self.payment_dcc, self.bad_day_conv, self.calendar, zero_curve, credit_curves, self.trades['recovery_rate'],
+            zero_steps, credit_steps, self.curve_index, self.schedules)
+        return derivatives * -1.0
+
+    def calc_cds_prices(self, zero_curve, credit_curves, rows=None):
+        """(clean price, dirty price, accrued) of the book, or of the trades at positions rows, in one pass."""
+        rows = slice(None) if rows is None else rows
+        clean, dirty, accrued = numpy_model.cds_prices(
+            self.valuation_date, self.cash_settle_date, self.step_in_date, self.trades['accrual_start_date'][rows],
+            self.trades['maturity_date'][rows], self.trades['running_coupon'][rows] / 10000., True, None,
+            self.stub_type, self.payment_dcc, self.bad_day_conv, self.calendar, zero_curve, credit_curves,
+            self.trades['recovery_rate'][rows], self.curve_index[rows], self.schedules)
+        return clean * -1.0, dirty * -1.0, accrued
+
+    def portfolio_pricer(self):
+        """Same measures as ISDAModel.single_name_pricer, as arrays over the book."""
+        notional = self.trades['notional']
+        scale_factor = np.where(self.trades['is_buy_protection'], -1.0, 1.0)
+
+        zero_curve = self.buildZeroCurve()
+        credit_curves = self.buildCreditCurves(zero_curve)
+        clean_price, dirty_price, accrued = self.calc_cds_prices(zero_curve, credit_curves)
+        accrued_premium = accrued * notional
+
+        zero_curve_shifted = self.buildZeroCurve(shift=0.0001)
+        credit_curves_shifted = self.buildCreditCurves(zero_curve_shifted, shift=0.0001)
+        dirty_price_shifted_cs01 = self.calc_cds_price(zero_curve, credit_curves_shifted, is_clean=False)
+        dirty_price_shifted_dv01 = self.calc_cds_price(zero_curve_shifted, credit_curves, is_clean=False)
+
+        return {'clean_price': clean_price, 'dirty_price': dirty_price,
+                'clean_pv': clean_price * notional * scale_factor, 'dirty_pv': dirty_price * notional * scale_factor,
+                'accrued_premium': accrued_premium,
+                'days_accrued': accrued_premium * (360. / self.trades['running_coupon']) / notional,
+                'cs01': (dirty_price_shifted_cs01 - dirty_price) * notional * scale_factor,
+                'dv01': (dirty_price_shifted_dv01 - dirty_price) * notional * scale_factor}
+
+    def price(self):
+        """portfolio_pricer results as a record array, one RESULT_DTYPE row per trade."""
+        return to_records(self.portfolio_pricer())
@@ -0,0 +1,41 @@
+import numpy as np
+
+# measures of single_name_pricer and portfolio_pricer
+RESULT_FIELDS = ('clean_price', 'dirty_price', 'clean_pv', 'dirty_pv', 'accrued_premium', 'days_accrued', 'cs01',
+                 'dv01')
+
+RESULT_DTYPE = np.dtype([(name, np.float64) for name in RESULT_FIELDS])
+
+
+class PricingResult:
+    """Measures of one trade, as returned by ISDAModel.price()."""
+
+    __slots__ = RESULT_FIELDS
+
+    def __init__(self, clean_price, dirty_price, clean_pv, dirty_pv, accrued_premium, days_accrued, cs01, dv01):
+        self.clean_price = clean_price
+        self.dirty_price = dirty_price
+        self.clean_pv = clean_pv
+        self.dirty_pv = dirty_pv
+        self.accrued_premium = accrued_premium
+        self.days_accrued = days_accrued
+        self.cs01 = cs01
+        self.dv01 = dv01
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in RESULT_FIELDS}
+
+    def __eq__(self, other):
+        return isinstance(other, PricingResult) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return 'PricingResult({})'.format(', '.join('{}={!r}'.format(name, getattr(self, name))
+                                                    for name in RESULT_FIELDS))
+
+
+def to_records(results):
+    """Record array with one RESULT_DTYPE row per trade from a dict of measure arrays, as portfolio_pricer returns."""
+    records = np.empty(len(results[RESULT_FIELDS[0]]), dtype=RESULT_DTYPE)
+    for name in RESULT_FIELDS:
+        records[name] = results[name]
+    return records.view(np.recarray)
@@ -0,0 +1,122 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from isda import numpy_model
+from isda.scenarios import ScenarioEngine
+
+CS01 = 'cs01'
+IR01 = 'ir01'
+
+# per process state of the pool workers, set by _init_worker
+_worker = {}
+
+
+class _Scenarios:
+    """Unbumped curves of a book, built once and shared by every batch of bumped scenarios."""
+
+    def __init__(self, book, bump):
+        self.book = book
+        self.bump = bump
+        self.engine = ScenarioEngine(book)
+        self.zero_curve = book.buildZeroCurve()
+        self.credit_curves = book.buildCreditCurves(self.zero_curve)
+        self.base_pv = self.engine.base_pv
+
+    def sensitivities(self, kind, indices):
+        """(bucket, trade) PV changes when each par spread (CS01) or zero rate (IR01) of indices moves by bump.
+
+        The bumped curves of all the buckets are built in one pass as stacked
+        rows and the book is priced against them in one call
+        (ScenarioEngine.dirty_pv).  A spread bump rebootstraps the credit
+        curves on the unbumped zero curve; a rate bump rebuilds the zero curve
+        and keeps the credit curves, as single_name_pricer does for its
+        parallel DV01.
+        """
+        book = self.book
+        indices = np.asarray(indices, dtype=np.int64)
+        if kind == CS01:
+            shifts = self.bump * np.eye(len(book.credit_spread_tenors))[indices]
+            spreads = np.array([book.credit_spreads[refob] for refob, _ in book.groups], dtype=np.float64)
+            spreads = (spreads + shifts[:, None, :]).reshape(len(indices) * len(book.groups), -1)
+            credit_curves = book.bootstrap(self.zero_curve, spreads)
+            zero_rates = np.repeat(self.zero_curve.rates[None], len(indices), axis=0)
+            zero_curves = numpy_model.NumpyCurve(self.zero_curve.base_date, self.zero_curve.dates, zero_rates)
+            credit_rates = credit_curves.rates.reshape(len(indices), len(book.groups), -1)
+        elif kind == IR01:
+            zero_curves = book.buildZeroCurve(shift=self.bump * np.eye(len(book.market.expiries))[indices])
+            credit_curves = self.credit_curves
+            credit_rates = np.repeat(credit_curves.rates[None], len(indices), axis=0)
+        else:
+            raise ValueError('Unknown risk measure {}'.format(kind))
+        credit_curves = numpy_model.NumpyCurve(credit_curves.base_date, credit_curves.dates, credit_rates)
+        return self.engine.dirty_pv(zero_curves, credit_curves) - self.base_pv
+
+
+def analytic_risk(book, bump=0.0001):
+    """Same measures as bucketed_risk from derivatives rather than bumped rebuilds.
+
+    The book is priced once forward and swept once in reverse, which gives
+    the derivative of every price with respect to the survival and discount
+    timeline of its curve (calc_cds_price_derivatives).  The curve moves are
+    carried to that timeline with complex steps, exact to rounding: CS01 steps
+    each credit curve node and chains with the bootstrap Jacobian from the
+    implicit function theorem, so no credit curve is rebootstrapped; IR01
+    steps every zero rate at once in one multi-curve zero curve build.
+    Results are first order sensitivities scaled by bump.
+    """
+    zero_curve = book.buildZeroCurve()
+    credit_curves = book.buildCreditCurves(zero_curve)
+    trades = book.trades
+    scale_factor = np.where(trades['is_buy_protection'], -1.0, 1.0) * trades['notional'] * bump
+    step = 1j * numpy_model.COMPLEX_STEP
+
+    n_nodes = len(credit_curves)
+    node_rt = np.repeat((credit_curves.rates * credit_curves.times)[None], n_nodes, axis=0).astype(np.complex128)
+    node_rt[np.arange(n_nodes), :, np.arange(n_nodes)] += step
+    dv_dx = book.calc_cds_price_derivatives(
+        zero_curve, credit_curves,
+        numpy_model.NumpyCurve(zero_curve.base_date, zero_curve.dates, zero_curve.rates[None, None]),
+        numpy_model.NumpyCurve(credit_curves.base_date, credit_curves.dates, node_rt / credit_curves.times))
+    dx_ds = book.credit_curve_jacobian(zero_curve, credit_curves)[book.curve_index]
+    cs01 = np.einsum('jn,njk->kn', dv_dx, dx_ds) * scale_factor
+
+    zero_steps = book.buildZeroCurve(shift=step * np.eye(len(book.market.expiries)))
+    ir01 = book.calc_cds_price_derivatives(
+        zero_curve, credit_curves,
+        numpy_model.NumpyCurve(zero_steps.base_date, zero_steps.dates, zero_steps.rates[:, None]),
+        numpy_model.NumpyCurve(credit_curves.base_date, credit_curves.dates, credit_curves.rates[None])) * scale_factor
+    return {'cs01': cs01, 'ir01': ir01, 'tenors': list(book.credit_spread_tenors), 'expiries': list(book.market.expiries)}
+
+
+def _init_worker(book, bump):
+    _worker['scenarios'] = _Scenarios(book, bump)
+
+
+def _run_batch(batch):
+    return _worker['scenarios'].sensitivities(*batch)
+
+
+def bucketed_risk(book, bump=0.0001, workers=None, chunksize=None):
+    """Bucketed CS01 per credit spread tenor and IR01 per zero curve instrument of an ISDAPortfolioModel.
+
+    Returns a dict with a tenor by trade 'cs01' matrix, an instrument by trade
+    'ir01' matrix and the 'tenors' and 'expiries' labelling their rows.  The
+    bumped curves of all the CS01 buckets, and of all the IR01 buckets, are
+    built as one stacked batch.  With workers greater than 1 the batches are
+    split into chunks of chunksize buckets (by default one chunk per worker)
+    priced over a process pool; each worker builds the unbumped curves once.
+    """
+    batches = [(CS01, np.arange(len(book.credit_spread_tenors))), (IR01, np.arange(len(book.market.expiries)))]
+    if workers is None or workers <= 1:
+        local = _Scenarios(book, bump)
+        results = [local.sensitivities(*batch) for batch in batches]
+    else:
+        chunks = [(kind, chunk) for kind, indices in batches
+                  for chunk in np.array_split(indices, -(-len(indices) // chunksize) if chunksize else workers) if len(chunk)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(book, bump)) as pool:
+            blocks = list(pool.map(_run_batch, chunks))
+        results = [np.concatenate([block for (kind, _), block in zip(chunks, blocks) if kind == batch_kind])
+                   for batch_kind, _ in batches]
+    return {'cs01': results[0], 'ir01': results[1], 'tenors': list(book.credit_spread_tenors),
+            'expiries': list(book.market.expiries)}
@@ -0,0 +1,169 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from isda import numpy_model
+
+# per process state of the pool workers, set by _init_worker
+_worker = {}
+
+
+def historical_shifts(store, book, dates, horizon=1):
+    """Scenario cube of the day over day changes in a MarketDataStore, for ScenarioEngine.
+
+    One scenario per date in dates: the move of the zero rates and of the
+    credit spreads of every group of book from that date to horizon store days
+    later.  Returns (rate_shifts, spread_shifts) of shapes (scenario,
+    instrument) and (scenario, group, tenor).
+    """
+    if list(store.expiries) != list(book.market.expiries) or store.instr_names != book.market.instr_names:
+        raise ValueError('Market store and book zero curve instruments do not match')
+    if list(store.credit_spread_tenors) != list(book.credit_spread_tenors):
+        raise ValueError('Market store and book credit spread tenors do not match')
+    rows = np.array([store.row(date) for date in dates], dtype=np.int64)
+    if len(rows) and rows.max() + horizon >= len(store):
+        raise ValueError('Market store ends before the scenario horizon')
+    names = np.array([store.name_index[refob] for refob, _ in book.groups], dtype=np.int64)
+    rate_shifts = store.rates[rows + horizon] - store.rates[rows]
+    # the scenario rows are read first, only they are paged in from the file
+    return rate_shifts, store.spreads[rows + horizon][:, names] - store.spreads[rows][:, names]
+
+
+def _init_worker(book, trade_chunk):
+    _worker['engine'] = ScenarioEngine(book, trade_chunk=trade_chunk)
+
+
+def _run_chunk(chunk):
+    start, rate_shifts, spread_shifts = chunk
+    return start, _worker['engine'].scenario_pnl(rate_shifts, spread_shifts)
+
+
+class ScenarioEngine:
+    """Reprices an ISDAPortfolioModel book under a cube of rate and spread scenarios.
+
+    Scenarios are taken scenario_chunk at a time: the zero curves of a chunk
+    are bootstrapped together, the credit curves per scenario, and the book is
+    then priced against all the curves of the chunk in one vectorized call per
+    trade_chunk trades, which bounds the memory of the pricing to about
+    scenario_chunk * trade_chunk trades.  run() streams one P&L block per
+    scenario chunk and pnl() writes them into a (scenario, trade) matrix,
+    which may be an np.memmap for books too big to hold in memory.  With
+    workers greater than 1 the chunks are priced over a process pool.
+    """
+
+    def __init__(self, book, scenario_chunk=16, trade_chunk=4000, workers=None, max_pending=None):
+        if scenario_chunk < 1 or trade_chunk < 1:
+            raise ValueError('Chunk sizes must be at least 1')
+        self.book = book
+        self.scenario_chunk = scenario_chunk
+        self.trade_chunk = trade_chunk
+        self.workers = workers
+        self.max_pending = max_pending
+        trades = book.trades
+        self.pv_factor = trades['notional'] * np.where(trades['is_buy_protection'], -1.0, 1.0)
+        base_curves = self.build_curves(np.zeros((1, len(book.market.expiries))),
+                                        np.zeros((1, 1, len(book.credit_spread_tenors))))
+        self.base_pv = self.dirty_pv(*base_curves)[0]
+
+    def dirty_pv(self, zero_curves, credit_curves):
+        """(scenario, trade) dirty PVs against stacked curves.
+
+        zero_curves holds one curve per scenario and credit_curves one curve
+        per (scenario, group), groups varying fastest.
+        """
+        book = self.book
+        n_scenarios = zero_curves.rates.shape[0]
+        n_groups = len(book.groups)
+        # one discount curve row per credit curve row
+        zero_curves = numpy_model.NumpyCurve(zero_curves.base_date, zero_curves.dates,
+                                             np.repeat(zero_curves.rates, n_groups, axis=0))
+        credit_curves = numpy_model.NumpyCurve(credit_curves.base_date, credit_curves.dates,
+                                               credit_curves.rates.reshape(n_scenarios * n_groups, -1))
+        trades = book.trades
+        n_trades = len(book.curve_index)
+        pv = np.empty((n_scenarios, n_trades))
+        for start in range(0, n_trades, self.trade_chunk):
+            rows = slice(start, start + self.trade_chunk)
+            curve_index = (np.arange(n_scenarios)[:, None] * n_groups + book.curve_index[rows]).reshape(-1)
+            tile = lambda column: np.tile(column[rows], n_scenarios)
+            price = numpy_model.cds_price(book.valuation_date, book.cash_settle_date, book.step_in_date,
+                                          tile(trades['accrual_start_date']), tile(trades['maturity_date']),
+                                          tile(trades['running_coupon']) / 10000., True, None, book.stub_type,
+                                          book.payment_dcc, book.bad_day_conv, book.calendar, zero_curves,
+                                          credit_curves, tile(trades['recovery_rate']), False, curve_index,
+                                          book.schedules)
+            pv[:, rows] = -price.reshape(n_scenarios, -1) * self.pv_factor[rows]
+        return pv
+
+    def build_curves(self, rate_shifts, spread_shifts):
+        """Stacked zero curves (scenario) and credit curves (scenario * group) of a chunk of scenarios.
+
+        The credit curves of every scenario and group are bootstrapped
+        together, each on the zero curve of its scenario.
+        """
+        book = self.book
+        zero_curves = book.buildZeroCurve(shift=rate_shifts)
+        n_scenarios = len(rate_shifts)
+        n_groups = len(book.groups)
+        spreads = np.array([book.credit_spreads[refob] for refob, _ in book.groups], dtype=np.float64)
+        spreads = spreads + np.broadcast_to(spread_shifts, (n_scenarios, n_groups, spreads.shape[1]))
+        disc_curves = numpy_model.NumpyCurve(zero_curves.base_date, zero_curves.dates,
+                                             np.repeat(zero_curves.rates, n_groups, axis=0))
+        credit_curves = book.bootstrap(disc_curves, spreads.reshape(n_scenarios * n_groups, -1))
+        return zero_curves, numpy_model.NumpyCurve(book.valuation_date, credit_curves.dates,
+                                                   credit_curves.rates.reshape(n_scenarios, n_groups, -1))
+
+    def scenario_pnl(self, rate_shifts, spread_shifts):
+        """(scenario, trade) P&L of a chunk of scenarios against the base dirty PV."""
+        return self.dirty_pv(*self.build_curves(rate_shifts, spread_shifts)) - self.base_pv
+
+    def _chunks(self, rate_shifts, spread_shifts):
+        book = self.book
+        rate_shifts = np.asarray(rate_shifts, dtype=np.float64)
+        spread_shifts = np.asarray(spread_shifts, dtype=np.float64)
+        n_tenors = len(book.credit_spread_tenors)
+        if rate_shifts.ndim != 2 or rate_shifts.shape[1] != len(book.market.expiries):
+            raise ValueError('Rate shifts must have one column per zero curve instrument')
+        if spread_shifts.ndim == 2:
+            spread_shifts = spread_shifts[:, None, :]
+        if spread_shifts.ndim != 3 or spread_shifts.shape[2] != n_tenors or \
+                spread_shifts.shape[1] not in (1, len(book.groups)):
+            raise ValueError('Spread shifts must have one column per credit spread tenor')
+        if len(rate_shifts) != len(spread_shifts):
+            raise ValueError('Rate and spread shifts must have the same number of scenarios')
+        for start in range(0, len(rate_shifts), self.scenario_chunk):
+            end = start + self.scenario_chunk
+            yield start, rate_shifts[start:end], spread_shifts[start:end]
+
+    def run(self, rate_shifts, spread_shifts):
+        """Yields (first scenario, P&L block) per scenario chunk, as soon as it is priced.
+
+        rate_shifts is (scenario, instrument); spread_shifts is (scenario,
+        tenor), applied to every name, or (scenario, group, tenor) in the order
+        of book.groups.
+        """
+        chunks = self._chunks(rate_shifts, spread_shifts)
+        if self.workers is None or self.workers <= 1:
+            for start, rates, spreads in chunks:
+                yield start, self.scenario_pnl(rates, spreads)
+            return
+        max_pending = self.max_pending or 2 * self.workers
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.book, self.trade_chunk)) as pool:
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(pool.submit(_run_chunk, chunk))
+            for future in pending:
+                yield future.result()
+
+    def pnl(self, rate_shifts, spread_shifts, out=None):
+        """(scenario, trade) P&L matrix, written into out when given."""
+        if out is None:
+            out = np.empty((len(rate_shifts), len(self.book.curve_index)))
+        for start, block in self.run(rate_shifts, spread_shifts):
+            out[start:start + len(block)] = block
+        return out
@@ -0,0 +1,185 @@
+import asyncio
+from collections import namedtuple
+import time
+
+import numpy as np
+
+# a new par spread for one tenor of a reference entity, a new rate for one zero curve instrument
+SpreadTick = namedtuple('SpreadTick', 'refob tenor spread')
+RateTick = namedtuple('RateTick', 'expiry rate')
+
+# repriced trades (positions in the book) after a batch of ticks, with the tick to price latency of each tick
+PriceUpdate = namedtuple('PriceUpdate', 'positions dirty_pv cs01 ticks latencies')
+
+STAGES = ('queue', 'curves', 'pricing', 'publish', 'tick_to_price')
+
+
+class LatencyHistogram:
+    """Latencies counted in log spaced buckets, 20 per decade from 1 microsecond to 100 seconds."""
+
+    EDGES = np.logspace(-6, 2, 161)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[np.searchsorted(self.EDGES, seconds)] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        bucket = np.searchsorted(np.cumsum(self.counts), q / 100.0 * self.count)
+        return min(float(self.EDGES[min(bucket, len(self.EDGES) - 1)]), self.max)
+
+    def summary(self):
+        count = self.count
+        return {'count': count, 'mean': self.total / count if count else 0.0, 'p50': self.percentile(50),
+                'p99': self.percentile(99), 'max': self.max}
+
+
+class StreamingPricer:
+    """Reprices an ISDAPortfolioModel book as spread and rate ticks arrive.
+
+    Ticks are submitted to a bounded queue; run() takes whatever has queued
+    up since the last repricing, keeps the last quote per tenor of each name
+    and per zero curve instrument, and then rebuilds only what the batch
+    touched: for spread ticks the curves of the names that moved, incrementally
+    from their first changed tenor (updateCreditCurves), and the trades on
+    those names; a rate tick rebuilds every curve and reprices the book.  Each
+    batch is published as a PriceUpdate on the bounded updates queue, and the
+    time spent in every stage is recorded in the latency histograms.
+
+    Batches are priced on executor (the loop's default executor when None) so
+    the event loop keeps taking ticks meanwhile.  book.credit_spreads, rates,
+    dirty_pv and cs01 are replaced by updated copies rather than changed in
+    place, so a reader always sees one consistent batch.
+    """
+
+    def __init__(self, book, queue_size=1024, max_batch=1024, bump=0.0001, executor=None):
+        self.book = book
+        self.executor = executor
+        self.max_batch = max_batch
+        self.bump = bump
+        self.ticks = asyncio.Queue(queue_size)
+        self.updates = asyncio.Queue(queue_size)
+        self.latency = {stage: LatencyHistogram() for stage in STAGES}
+
+        self.rates = np.array(book.market.rates, dtype=np.float64)
+        self.group_trades = [np.flatnonzero(book.curve_index == g) for g in range(len(book.groups))]
+        self.refob_groups = {}
+        for g, (refob, _) in enumerate(book.groups):
+            self.refob_groups.setdefault(refob, []).append(g)
+        trades = book.trades
+        self.pv_factor = trades['notional'] * np.where(trades['is_buy_protection'], -1.0, 1.0)
+        self._rebuild_all()
+        self.dirty_pv, self.cs01 = self._price(slice(None))
+
+    def _rebuild_all(self):
+        book = self.book
+        self.zero_curve = book.buildZeroCurve(shift=self.rates - np.asarray(book.market.rates))
+        self.credit_curves = book.buildCreditCurves(self.zero_curve)
+        self.credit_curves_cs01 = book.buildCreditCurves(self.zero_curve, shift=self.bump)
+
+    def _price(self, rows):
+        book = self.book
+        dirty_pv = book.calc_cds_price(self.zero_curve, self.credit_curves, False, rows) * self.pv_factor[rows]
+        bumped_pv = book.calc_cds_price(self.zero_curve, self.credit_curves_cs01, False, rows) * self.pv_factor[rows]
+        return dirty_pv, bumped_pv - dirty_pv
+
+    def _check(self, tick):
+        if isinstance(tick, SpreadTick):
+            if tick.refob not in self.book.credit_spreads or tick.tenor not in self.book.credit_spread_tenors:
+                raise ValueError('Unknown credit spread {} {}'.format(tick.refob, tick.tenor))
+        elif isinstance(tick, RateTick):
+            if tick.expiry not in self.book.market.expiries:
+                raise ValueError('Unknown zero curve instrument {}'.format(tick.expiry))
+        else:
+            raise ValueError('Unknown tick {}'.format(tick))
+
+    async def submit(self, tick):
+        """Queues a tick, waiting while the queue is full."""
+        self._check(tick)
+        await self.ticks.put((time.perf_counter(), tick))
+
+    async def close(self):
+        """Ends run() once the ticks already queued are priced."""
+        await self.ticks.put(None)
+
+    def apply(self, ticks):
+        """Reprices after a batch of (received time, tick), returns the PriceUpdate."""
+        book = self.book
+        started = time.perf_counter()
+        previous = book.credit_spreads
+        credit_spreads = dict(previous)
+        rates = self.rates.copy()
+        for _, tick in ticks:
+            if isinstance(tick, RateTick):
+                rates[book.market.expiries.index(tick.expiry)] = tick.rate
+            else:
+                if credit_spreads[tick.refob] is previous[tick.refob]:
+                    credit_spreads[tick.refob] = list(previous[tick.refob])
+                credit_spreads[tick.refob][book.credit_spread_tenors.index(tick.tenor)] = tick.spread
+        book.credit_spreads = credit_spreads
+
+        if not np.array_equal(rates, self.rates):
+            self.rates = rates
+            self._rebuild_all()
+            rows = np.arange(len(book.curve_index))
+        else:
+            moved = [refob for refob, spreads in credit_spreads.items() if spreads != previous[refob]]
+            self.credit_curves = book.updateCreditCurves(self.zero_curve, self.credit_curves, previous)
+            self.credit_curves_cs01 = book.updateCreditCurves(self.zero_curve, self.credit_curves_cs01, previous,
+                                                              shift=self.bump)
+            groups = [g for refob in moved for g in self.refob_groups[refob]]
+            rows = np.sort(np.concatenate([self.group_trades[g] for g in groups])) if groups else \
+                np.zeros(0, dtype=np.int64)
+        priced = time.perf_counter()
+        self.latency['curves'].record(priced - started)
+
+        if len(rows):
+            dirty_pv, cs01 = self.dirty_pv.copy(), self.cs01.copy()
+            dirty_pv[rows], cs01[rows] = self._price(rows)
+            self.dirty_pv, self.cs01 = dirty_pv, cs01
+        done = time.perf_counter()
+        self.latency['pricing'].record(done - priced)
+        return PriceUpdate(rows, self.dirty_pv[rows], self.cs01[rows], [tick for _, tick in ticks],
+                           [done - received for received, _ in ticks])
+
+    async def run(self):
+        """Prices queued ticks until close(), then puts None on the updates queue."""
+        loop = asyncio.get_running_loop()
+        closed = False
+        while not closed:
+            item = await self.ticks.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.max_batch or self.ticks.empty():
+                    break
+                item = self.ticks.get_nowait()
+            closed = item is None
+            if not batch:
+                continue
+            dequeued = time.perf_counter()
+            for received, _ in batch:
+                self.latency['queue'].record(dequeued - received)
+            update = await loop.run_in_executor(self.executor, self.apply, batch)
+            published = time.perf_counter()
+            await self.updates.put(update)
+            self.latency['publish'].record(time.perf_counter() - published)
+            for received, _ in batch:
+                self.latency['tick_to_price'].record(published - received)
+        await self.updates.put(None)
+
+    def latency_summary(self):
+        """{stage: {'count', 'mean', 'p50', 'p99', 'max'}} in seconds."""
+        return {stage: histogram.summary() for stage, histogram in self.latency.items()}
@@ -0,0 +1,88 @@
+from ctypes import POINTER, c_char, c_int, cast, sizeof
+
+import numpy as np
+
+from isda.c_interface import TCashFlow, TCashFlowList, TCurve, TDateList, TRatePt
+
+
+def struct_dtype(struct, formats):
+    """NumPy dtype laid out exactly as a ctypes Structure, padding included."""
+    names = [name for (name, _) in struct._fields_]
+    return np.dtype({'names': names, 'formats': formats,
+                     'offsets': [getattr(struct, name).offset for name in names], 'itemsize': sizeof(struct)})
+
+
+RATE_PT_DTYPE = struct_dtype(TRatePt, [np.int32, np.float64])
+CASH_FLOW_DTYPE = struct_dtype(TCashFlow, [np.int32, np.float64])
+DATE_DTYPE = np.dtype(np.int32)
+
+
+def _view(array, count, dtype):
+    """Array over the count items behind a ctypes pointer, sharing its memory."""
+    if count == 0 or not array:
+        return np.empty(0, dtype)
+    buffer = cast(array, POINTER(c_char * (count * dtype.itemsize))).contents
+    return np.frombuffer(buffer, dtype)
+
+
+def _struct(arg):
+    return arg[0] if hasattr(arg, 'contents') else arg
+
+
+def curve_array(curve):
+    """Structured (fDate, fRate) view over the TRatePt array of a TCurve (or pointer to one).
+
+    No copy is made: writes go straight to the curve, and the view is only
+    valid while the curve is alive (for a curve from the dll, until
+    JpmcdsFreeTCurve).
+    """
+    curve = _struct(curve)
+    return _view(curve.fArray, curve.fNumItems, RATE_PT_DTYPE)
+
+
+def cash_flow_array(cash_flows):
+    """Structured (fDate, fAmount) view over a TCashFlowList (or pointer to one)."""
+    cash_flows = _struct(cash_flows)
+    return _view(cash_flows.fArray, cash_flows.fNumItems, CASH_FLOW_DTYPE)
+
+
+def date_list_array(date_list):
+    """int32 view over the dates of a TDateList (or pointer to one)."""
+    date_list = _struct(date_list)
+    return _view(date_list.fArray, date_list.fNumItems, DATE_DTYPE)
+
+
+def curve_from_arrays(base_date, dates, rates, basis, day_count_conv):
+    """TCurve holding dates and rates, filled in bulk rather than point by point."""
+    dates = np.asarray(dates)
+    tcurve = TCurve.__new__(TCurve)
+    tcurve.fArray = cast((TRatePt * len(dates))(), POINTER(TRatePt))
+    tcurve.fNumItems = len(dates)
+    tcurve.fBaseDate = int(base_date)
+    tcurve.fBasis = basis
+    tcurve.fDayCountConv = day_count_conv
+    points = curve_array(tcurve)
+    points['fDate'] = dates
+    points['fRate'] = rates
+    return tcurve
+
+
+def cash_flow_list_from_arrays(dates, amounts):
+    """TCashFlowList holding dates and amounts, filled in bulk."""
+    dates = np.asarray(dates)
+    cash_flows = TCashFlowList.__new__(TCashFlowList)
+    cash_flows.fArray = cast((TCashFlow * len(dates))(), POINTER(TCashFlow))
+    cash_flows.fNumItems = len(dates)
+    flows = cash_flow_array(cash_flows)
+    flows['fDate'] = dates
+    flows['fAmount'] = amounts
+    return cash_flows
+
+
+def date_list_from_array(dates):
+    dates = np.asarray(dates)
+    date_list = TDateList()
+    date_list.fArray = cast((c_int * len(dates))(), POINTER(c_int))
+    date_list.fNumItems = len(dates)
+    date_list_array(date_list)[:] = dates
+    return date_list
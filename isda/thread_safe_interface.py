@@ -0,0 +1,124 @@
+import inspect
+import threading
+
+from isda.c_interface import CInterface
+
+SUCCESS = 0
+
+# calendars that never touch the holiday registry of the library: the library maps them to its built-in
+# weekend rules before looking up a holiday list, so they neither read nor fill the registry
+NO_HOLIDAYS = ('NONE', 'NO_WEEKENDS')
+
+# lines and line length of the library error record
+ERROR_RECORD = (20, 128)
+
+# functions returning a status code and functions returning a pointer, NULL on failure
+STATUS_FUNCTIONS = ('JpmcdsDateIntervalToFreq', 'JpmcdsStringToDayCountConv', 'JpmcdsDateFwdThenAdjust',
+                    'JpmcdsStringToDateInterval', 'JpmcdsCdsContingentLegPV', 'JpmcdsCdsFeeLegPV', 'JpmcdsCdsPrice',
+                    'JpmcdsCdsParSpreads', 'JpmcdsHolidayLoadFromDisk', 'JpmcdsStringToStubMethod',
+                    'JpmcdsCdsoneUpfrontCharge', 'JpmcdsDateToMDY')
+POINTER_FUNCTIONS = ('JpmcdsBuildIRZeroCurve', 'JpmcdsCdsFeeLegFlows', 'JpmcdsCleanSpreadCurve', 'JpmcdsNewDateList')
+
+
+class ThreadSafeCInterface(CInterface):
+    """CInterface that can be shared by threads pricing concurrently.
+
+    ctypes releases the GIL for the duration of every dll call; what is not
+    safe is the global state of the library:
+
+    - function prototypes are set once when the dll is loaded (load_library)
+      and never reassigned;
+    - the library error log is switched on once per process, further
+      JpmcdsErrMsgOn / JpmcdsErrMsgEnableRecord calls are no-ops, and failed
+      calls are recorded per thread instead, with the messages the library
+      logged for them, see errors().  The record is shared by all threads, so
+      every call holds a lock until its lines are read and cleared;
+    - JpmcdsHolidayLoadFromDisk and calls given a holiday calendar other than
+      'None' or 'No_Weekends' take a lock, as they read or fill the holiday
+      registry.  Those two names are resolved to the built-in weekend rules
+      without a registry lookup (NO_HOLIDAYS), so calls given them need none.
+
+    Calls therefore run one at a time, a pool of threads only overlaps the
+    Python work around them.
+    """
+
+    _holiday_lock = threading.RLock()
+    _error_log_lock = threading.Lock()
+    _error_log_enabled = False
+
+    def __init__(self):
+        super().__init__()
+        self._thread = threading.local()
+        self._enable_error_log()
+
+    def errors(self):
+        """(function name, result, library message) of the calls that failed on the calling thread."""
+        if not hasattr(self._thread, 'errors'):
+            self._thread.errors = []
+        return self._thread.errors
+
+    def clear_errors(self):
+        self.errors().clear()
+
+    def JpmcdsErrMsgOn(self):
+        self._enable_error_log()
+        return SUCCESS
+
+    def JpmcdsErrMsgEnableRecord(self, lines, length):
+        self._enable_error_log(lines, length)
+        return SUCCESS
+
+    def _enable_error_log(self, lines=ERROR_RECORD[0], length=ERROR_RECORD[1]):
+        with ThreadSafeCInterface._error_log_lock:
+            if not ThreadSafeCInterface._error_log_enabled:
+                CInterface.JpmcdsErrMsgOn(self)
+                CInterface.JpmcdsErrMsgEnableRecord(self, lines, length)
+                ThreadSafeCInterface._error_log_enabled = True
+
+    def _error_message(self):
+        """Lines logged by the library since the record was last read, the record is then emptied.
+
+        Called with _error_log_lock held since the failed call.
+        """
+        record = CInterface.JpmcdsErrGetMsgRecord(self)
+        lines = []
+        while record and record[len(lines)] is not None:
+            lines.append(record[len(lines)].decode('utf-8', 'replace').rstrip())
+        CInterface.JpmcdsErrMsgDisableRecord(self)
+        CInterface.JpmcdsErrMsgEnableRecord(self, *ERROR_RECORD)
+        return '\n'.join(line for line in lines if line)
+
+
+def _uses_holidays(calendar):
+    if isinstance(calendar, bytes):
+        calendar = calendar.decode('utf-8')
+    return calendar.upper() not in NO_HOLIDAYS
+
+
+def _thread_safe(name, failed):
+    method = getattr(CInterface, name)
+    parameters = list(inspect.signature(method).parameters)
+    calendar_index = next((parameters.index(p) - 1 for p in ('holidayFile', 'calendar', 'file') if p in parameters), None)
+
+    def locked_call(self, args):
+        with ThreadSafeCInterface._error_log_lock:
+            result = method(self, *args)
+            if failed(result):
+                self.errors().append((name, result, self._error_message()))
+        return result
+
+    def call(self, *args):
+        if calendar_index is not None and _uses_holidays(args[calendar_index]):
+            with self._holiday_lock:
+                return locked_call(self, args)
+        return locked_call(self, args)
+
+    call.__name__ = name
+    call.__doc__ = method.__doc__
+    return call
+
+
+for _name in STATUS_FUNCTIONS:
+    setattr(ThreadSafeCInterface, _name, _thread_safe(_name, lambda result: result != SUCCESS))
+for _name in POINTER_FUNCTIONS:
+    setattr(ThreadSafeCInterface, _name, _thread_safe(_name, lambda result: not result))
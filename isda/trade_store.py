@@ -0,0 +1,103 @@
+import numpy as np
+
+from isda.dates import from_datetime64
+from isda.portfolio import TRADE_COLUMNS, trade_columns
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# field types of the trade table, refob gets the width of the longest name
+TRADE_FIELDS = (('accrual_start_date', np.int64), ('maturity_date', np.int64), ('running_coupon', np.float64),
+                ('recovery_rate', np.float64), ('notional', np.float64), ('is_buy_protection', np.bool_))
+
+TRUE_STRINGS = ('1', 'true', 'y', 'yes')
+
+
+def trade_dtype(refob_length):
+    return np.dtype([('refob', 'U{}'.format(max(refob_length, 1)))] + list(TRADE_FIELDS))
+
+
+class TradeStore:
+    """A book of CDS held as one NumPy structured array, one row per trade.
+
+    Files are read in one pass straight into the table, dates are converted to
+    TDates for the whole column at once and no per trade Python object is
+    built; columns() hands the fields, as views, to ISDAPortfolioModel,
+    BatchRunner and risk.
+    """
+
+    def __init__(self, table):
+        missing = [name for name in TRADE_COLUMNS if name not in (table.dtype.names or ())]
+        if missing:
+            raise ValueError('Trade table is missing columns {}'.format(missing))
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def columns(self):
+        """The trade columns keyed as TRADE_COLUMNS, views on the table."""
+        return {name: self.table[name] for name in TRADE_COLUMNS}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Store of a dict of columns or a list of CDSTrade, as accepted by trade_columns."""
+        columns = trade_columns(columns)
+        table = np.empty(len(columns['refob']), trade_dtype(_refob_length(columns['refob'])))
+        for name in TRADE_COLUMNS:
+            table[name] = columns[name]
+        return cls(table)
+
+    @classmethod
+    def read_csv(cls, path):
+        """Store of a CSV file with a header row naming TRADE_COLUMNS, other columns are ignored.
+
+        Dates are ISO formatted (YYYY-MM-DD) and is_buy_protection is true/false
+        or 1/0.
+        """
+        with open(path, newline='') as f:
+            header = [name.strip() for name in f.readline().split(',')]
+            missing = [name for name in TRADE_COLUMNS if name not in header]
+            if missing:
+                raise ValueError('Trade file {} is missing columns {}'.format(path, missing))
+            # names are read as objects, the table column is then sized by the longest one
+            dtype = np.dtype([('refob', object),
+                              ('accrual_start_date', 'datetime64[D]'), ('maturity_date', 'datetime64[D]'),
+                              ('running_coupon', np.float64), ('recovery_rate', np.float64),
+                              ('notional', np.float64), ('is_buy_protection', 'U8')])
+            rows = np.loadtxt(f, dtype=dtype, delimiter=',', quotechar='"', ndmin=1,
+                              usecols=[header.index(name) for name in TRADE_COLUMNS])
+        if not len(rows):
+            raise ValueError('Trade file {} is empty'.format(path))
+        table = np.empty(len(rows), trade_dtype(_refob_length(rows['refob'])))
+        table['refob'] = rows['refob']
+        for name in ('accrual_start_date', 'maturity_date'):
+            table[name] = from_datetime64(rows[name])
+        for name in ('running_coupon', 'recovery_rate', 'notional'):
+            table[name] = rows[name]
+        table['is_buy_protection'] = np.isin(np.char.lower(np.char.strip(rows['is_buy_protection'])),
+                                             TRUE_STRINGS)
+        return cls(table)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Store of a pyarrow Table holding TRADE_COLUMNS, dates as date32 or timestamps."""
+        columns = {name: table.column(name).to_numpy() for name in TRADE_COLUMNS}
+        for name in ('accrual_start_date', 'maturity_date'):
+            columns[name] = columns[name].astype('datetime64[D]')
+        return cls.from_columns(columns)
+
+    @classmethod
+    def read_parquet(cls, path):
+        """Store of a Parquet file, needs pyarrow."""
+        if pq is None:
+            raise ImportError('pyarrow is required to read Parquet trade files')
+        return cls.from_arrow(pq.read_table(path, columns=list(TRADE_COLUMNS)))
+
+
+def _refob_length(refobs):
+    if refobs.dtype == object:
+        return max(map(len, refobs), default=1)
+    return int(np.char.str_len(refobs).max()) if len(refobs) else 1
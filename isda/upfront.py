@@ -0,0 +1,45 @@
+import numpy as np
+
+from isda import numpy_model
+from isda.valuation_context import ValuationContext
+
+
+class UpfrontConverter:
+    """Converts standard coupon CDS quotes between conventional spread and upfront, in bulk.
+
+    One zero curve is built for market; every conversion then solves the
+    flat hazard rates of all the quotes together (numpy_model.cdsone_upfront
+    and cdsone_spread).  Coupons are in basis points, as running_coupon, and
+    spreads and upfronts are decimals per unit notional, the upfront being
+    paid by the protection buyer.  Upfronts are clean unless clean is False.
+    The dates, conventions and zero curve are taken from context.
+    """
+
+    def __init__(self, market, context=None):
+        self.market = market
+        if context is None:
+            context = ValuationContext(market, backend='numpy')
+        self.valuation_date = context.valuation_date
+        self.step_in_date = context.step_in_date
+        self.cash_settle_date = context.cash_settle_date
+        self.payment_dcc = context.payment_dcc
+        self.stub_type = context.stub_type
+        self.bad_day_conv = context.bad_day_conv
+        self.calendar = context.calendar
+        self.zero_curve = context.numpy_zero_curve()
+
+    def _convert(self, convert, quotes, coupons, accrual_start_dates, maturity_dates, recovery_rates, clean):
+        return convert(self.valuation_date, self.cash_settle_date, accrual_start_dates, self.step_in_date,
+                       accrual_start_dates, maturity_dates, np.asarray(coupons, dtype=np.float64) / 10000., True,
+                       None, self.stub_type, self.payment_dcc, self.bad_day_conv, self.calendar, self.zero_curve,
+                       quotes, recovery_rates, clean)
+
+    def upfront(self, spreads, coupons, accrual_start_dates, maturity_dates, recovery_rates=0.4, clean=True):
+        """Upfronts of quotes in conventional spread; dates are TDates, all arguments broadcast together."""
+        return self._convert(numpy_model.cdsone_upfront, spreads, coupons, accrual_start_dates, maturity_dates,
+                             recovery_rates, clean)
+
+    def spread(self, upfronts, coupons, accrual_start_dates, maturity_dates, recovery_rates=0.4, clean=True):
+        """Conventional spreads of quotes in upfront, the inverse of upfront."""
+        return self._convert(numpy_model.cdsone_spread, upfronts, coupons, accrual_start_dates, maturity_dates,
+                             recovery_rates, clean)
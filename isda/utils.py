@@ -28,19 +28,16 @@ class Utils:
                  semi_annual_roll_start=datetime.datetime(2015, 12, 20),
                  imm_month_list=[3, 6, 9, 12], imm_semi_annual_roll_months=[3, 9]):
 
-        imm_date_count = 0
         imm_day_of_month = 20
         months_between_imm_dates = 3
-        one_day = datetime.timedelta(1)
 
-        # break after reaching first immdate
-        while True:
-            if imm_date_count >= 1:
-                break
-            s_date = s_date + one_day
-            if s_date.day == imm_day_of_month \
-                    and s_date.month in imm_month_list:
-                imm_date_count += 1
+        # first imm date strictly after s_date
+        later_months = [m for m in sorted(imm_month_list)
+                        if m > s_date.month or (m == s_date.month and s_date.day < imm_day_of_month)]
+        if later_months:
+            s_date = datetime.datetime(s_date.year, later_months[0], imm_day_of_month)
+        else:
+            s_date = datetime.datetime(s_date.year + 1, min(imm_month_list), imm_day_of_month)
 
         # semi annual roll date adjustment, implemented after 2015
         if s_date >= semi_annual_roll_start:
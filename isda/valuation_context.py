@@ -0,0 +1,106 @@
+from ctypes import c_double, c_int, c_long
+import weakref
+
+import numpy as np
+
+from isda import numpy_model
+from isda.backend import get_interface
+from isda.conventions import get_conventions
+from isda.dates import date_fwd_then_adjust, jpm_date
+
+
+class ValuationContext:
+    """Everything that depends only on the valuation date, the calendar and the market.
+
+    Built once per valuation date and shared by all the ISDAModel instances
+    pricing that day: the JPM valuation, step-in (T+1) and cash settle (T+3,
+    modified following) dates, the zero curve instrument dates, the parsed
+    conventions and the zero curves, which are built on first use for each
+    rate shift.  close(), leaving a with block or garbage collection of the
+    context releases those curves.
+    """
+
+    def __init__(self, market, backend=None, calendar='None'):
+        self.market = market
+        self.calendar = calendar
+        self.c_interface = get_interface(backend)
+        self.conventions = get_conventions(self.c_interface)
+
+        conventions = self.conventions
+        self.valuation_date = int(jpm_date(market.valuation_date.year, market.valuation_date.month,
+                                           market.valuation_date.day))
+        self.step_in_date = int(date_fwd_then_adjust(self.valuation_date, conventions.tenor('1D'),
+                                                     conventions.bad_day('N'), calendar))
+        self.cash_settle_date = int(date_fwd_then_adjust(self.valuation_date, conventions.tenor('3D'),
+                                                         conventions.bad_day('M'), calendar))
+        # zero curve instruments are not bad day adjusted
+        self.zero_curve_dates = [int(date_fwd_then_adjust(self.valuation_date, conventions.tenor(expiry),
+                                                          conventions.bad_day('N'), 'None'))
+                                 for expiry in market.expiries]
+
+        # fixed and floating swap frequencies, money market, fixed and floating swap day counts, bad day
+        # convention and calendar of the zero curve instruments, in the order of JpmcdsBuildIRZeroCurve
+        self.zero_curve_conventions = (conventions.frequency('6M'), conventions.frequency('3M'),
+                                       conventions.day_count('Act/360'), conventions.day_count('30/360'),
+                                       conventions.day_count('ACT/360'), conventions.bad_day('N'), 'None')
+
+        self.payment_dcc = conventions.day_count('Act/360')
+        self.stub = conventions.stub('F/S')
+        # the stub as (stub_at_end, long_stub), for numpy_model
+        self.stub_type = (bool(self.stub.stubAtEnd), bool(self.stub.longStub))
+        self.bad_day_conv = conventions.bad_day('F')
+        self._zero_curves = {}
+        self._finalizer = weakref.finalize(self, _free_curves, self.c_interface, self._zero_curves)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def zero_curve(self, shift=None):
+        """Zero curve of the market with rates shifted by shift, built once."""
+        if shift not in self._zero_curves:
+            self._zero_curves[shift] = self.build_zero_curve(shift)
+        return self._zero_curves[shift]
+
+    def build_zero_curve(self, shift=None):
+        """A new zero curve, owned by the caller."""
+        nInstr = len(self.market.instr_names)
+        dates = (c_int * nInstr)(*self.zero_curve_dates)
+        temp_rates = self.market.rates if shift is None else [r + shift for r in self.market.rates]
+        rates = (c_double * len(temp_rates))(*temp_rates)
+        fixed_freq, float_freq, mm_dcc, swap_dcc, float_dcc, bad_day_conv, calendar = self.zero_curve_conventions
+
+        zero_curve = self.c_interface.JpmcdsBuildIRZeroCurve(
+                        self.valuation_date,
+                        self.market.instr_names,
+                        dates,
+                        rates,
+                        nInstr,
+                        c_long(fixed_freq),
+                        c_long(float_freq),
+                        c_long(mm_dcc),
+                        c_long(swap_dcc),
+                        c_long(float_dcc),
+                        bad_day_conv,
+                        calendar)
+        return zero_curve[0]
+
+    def numpy_zero_curve(self, shift=None):
+        """Zero curve of the market as a NumpyCurve, owned by the caller.
+
+        shift is a parallel rate shift, one shift per market instrument or one
+        row of them per curve, which are then built together.
+        """
+        rates = np.asarray(self.market.rates) + (0.0 if shift is None else np.asarray(shift))
+        return numpy_model.build_ir_zero_curve(self.valuation_date, self.market.instr_names, self.zero_curve_dates,
+                                               rates, *self.zero_curve_conventions)
+
+    def close(self):
+        self._finalizer()
+
+
+def _free_curves(c_interface, zero_curves):
+    while zero_curves:
+        c_interface.JpmcdsFreeTCurve(zero_curves.popitem()[1])
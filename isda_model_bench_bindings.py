@@ -0,0 +1,51 @@
+"""Per call overhead of the ctypes bindings, before and after the prototypes are set once.
+
+"per call prototypes" repeats what every CInterface method used to do: look up
+the function on the dll and assign argtypes/restype before calling it.
+"cached prototypes" calls the CInterface methods, whose prototypes are set
+once by load_library.  Needs ISDA_Clib.dll, i.e. 64-bit Windows python.
+"""
+from ctypes import *
+import timeit
+
+from isda.c_interface import CInterface, PROTOTYPES, TDateInterval, load_library
+
+CALLS = 200000
+REPEAT = 5
+
+
+def per_call(dll, name, *args):
+    func = getattr(dll, name)
+    func.argtypes, func.restype = PROTOTYPES[name]
+    return func(*args)
+
+
+def report(label, stmt):
+    seconds = min(timeit.repeat(stmt, number=CALLS, repeat=REPEAT))
+    print('{:<45} {:8.3f} us/call'.format(label, seconds / CALLS * 1e6))
+
+
+if __name__ == "__main__":
+    dll = load_library()
+    c_interface = CInterface()
+
+    valuation_date = c_interface.JpmcdsDate(2018, 1, 8)
+    interval = TDateInterval()
+    c_interface.JpmcdsStringToDateInterval('3M', 'bench', interval)
+    adjusted = (c_int * 1)()
+    dates = (c_int * 2)(c_interface.JpmcdsDate(2019, 1, 8), c_interface.JpmcdsDate(2023, 1, 8))
+    rates = (c_double * 2)(0.02, 0.025)
+    curve = c_interface.JpmcdsBuildIRZeroCurve(valuation_date, 'MS', dates, rates, 2, 2, 4, 3, 4, 3, ord('N'), 'None')
+
+    report('JpmcdsDate, per call prototypes',
+           lambda: per_call(dll, 'JpmcdsDate', 2018, 1, 8))
+    report('JpmcdsDate, cached prototypes',
+           lambda: c_interface.JpmcdsDate(2018, 1, 8))
+    report('JpmcdsDateFwdThenAdjust, per call prototypes',
+           lambda: per_call(dll, 'JpmcdsDateFwdThenAdjust', valuation_date, byref(interval), ord('M'), b'None', adjusted))
+    report('JpmcdsDateFwdThenAdjust, cached prototypes',
+           lambda: c_interface.JpmcdsDateFwdThenAdjust(valuation_date, interval, ord('M'), 'None', adjusted))
+    report('JpmcdsZeroPrice, per call prototypes',
+           lambda: per_call(dll, 'JpmcdsZeroPrice', curve, valuation_date + 400))
+    report('JpmcdsZeroPrice, cached prototypes',
+           lambda: c_interface.JpmcdsZeroPrice(curve, valuation_date + 400))
@@ -0,0 +1,64 @@
+"""Trades and market shared by the isda_model_test_*.py suites."""
+from datetime import date
+import os
+import tempfile
+
+import numpy as np
+
+from isda.c_interface import load_library
+from isda.cds_trade import CDSTrade
+from isda.dates import jpm_date
+
+VALUATION_DATE = date(2018, 1, 8)
+
+TENORS = ['6M', '1Y', '2Y', '3Y', '4Y', '5Y', '10Y', '30Y']
+
+# par spreads on TENORS of a tight (A) and a wide (B) reference entity
+SPREADS = {'A': (0.0006, 0.0007, 0.0012, 0.002, 0.0028, 0.004, 0.008, 0.0098),
+           'B': (0.004, 0.0045, 0.006, 0.008, 0.01, 0.012, 0.016, 0.018)}
+
+
+def c_library_available():
+    try:
+        load_library()
+    except (OSError, RuntimeError, AttributeError):
+        return False
+    return True
+
+
+def jpm(dt):
+    return int(jpm_date(dt.year, dt.month, dt.day))
+
+
+def credit_spreads(*names):
+    """{name: spreads} of names (A and B by default), fresh lists a test may change."""
+    return {name: list(SPREADS[name]) for name in names or SPREADS}
+
+
+def make_trade(valuation_date=VALUATION_DATE, **kwargs):
+    """CDSTrade traded on valuation_date, a 5 year 100bp protection sale unless overridden."""
+    args = dict(trade_date=valuation_date, effective_date=valuation_date, accrual_start_date=date(2017, 12, 20),
+                maturity_date=date(2022, 12, 20), is_buy_protection=False, running_coupon=100, recovery_rate=0.4,
+                notional=10000000)
+    args.update(kwargs)
+    return CDSTrade(**args)
+
+
+def trade_table(refob, maturity_date, accrual_start_date='2017-12-20', running_coupon=100, recovery_rate=0.4,
+                notional=10000000, is_buy_protection=True):
+    """Trade columns of a book, dates ISO formatted; scalars apply to every trade."""
+    columns = {'refob': refob, 'accrual_start_date': accrual_start_date, 'maturity_date': maturity_date,
+               'running_coupon': running_coupon, 'recovery_rate': recovery_rate, 'notional': notional,
+               'is_buy_protection': is_buy_protection}
+    columns = {name: np.broadcast_to(np.asarray(values), len(refob)).copy() for name, values in columns.items()}
+    for name in ('accrual_start_date', 'maturity_date'):
+        columns[name] = columns[name].astype('datetime64[D]')
+    return columns
+
+
+def write_csv(rows):
+    """Path of a temporary CSV file holding rows, removed by the caller."""
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(handle, 'w') as f:
+        f.write('\n'.join(rows))
+    return path
@@ -0,0 +1,49 @@
+import unittest
+
+from isda.curve_cache import CurveCache
+from isda.isda_model import ISDAModel
+from isda.market_data import Market_Data
+from isda_model_fixtures import VALUATION_DATE, c_library_available, make_trade
+
+
+class TestCurveCache(unittest.TestCase):
+    def testLeastRecentlyUsedCurveIsFreed(self):
+        freed = []
+        cache = CurveCache(max_size=2)
+        cache.get('a', lambda: 'curve a', freed.append)
+        cache.get('b', lambda: 'curve b', freed.append)
+        self.assertEqual(cache.get('a', lambda: 'rebuilt a', freed.append), 'curve a')
+        cache.get('c', lambda: 'curve c', freed.append)
+        self.assertEqual(freed, ['curve b'])
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 3, 'evictions': 1, 'size': 2, 'max_size': 2})
+        cache.clear()
+        self.assertEqual(sorted(freed), ['curve a', 'curve b', 'curve c'])
+
+    def testSingleNamePricerReusesCurves(self):
+        cds = make_trade()
+        cache = CurveCache()
+        model = ISDAModel(cds, Market_Data(VALUATION_DATE), backend='numpy', curve_cache=cache)
+        first = model.single_name_pricer()
+        self.assertEqual(cache.stats()['misses'], 4)
+        second = ISDAModel(cds, Market_Data(VALUATION_DATE), backend='numpy', curve_cache=cache).single_name_pricer()
+        self.assertEqual(cache.stats()['hits'], 4)
+        self.assertEqual(first, second)
+        self.assertEqual(first, ISDAModel(cds, Market_Data(VALUATION_DATE), backend='numpy').single_name_pricer())
+
+
+@unittest.skipUnless(c_library_available(), 'ISDA_Clib.dll cannot be loaded on this platform')
+class TestCCurveCache(unittest.TestCase):
+    def testEvictedCurvesAreFreed(self):
+        trades = [make_trade(recovery_rate=recovery_rate) for recovery_rate in (0.4, 0.25, 0.4)]
+        # two curves fit: every trade evicts the curves of the one before
+        cache = CurveCache(max_size=2)
+        for cds in trades:
+            cached = ISDAModel(cds, Market_Data(VALUATION_DATE), backend='c', curve_cache=cache).single_name_pricer()
+            self.assertEqual(cached, ISDAModel(cds, Market_Data(VALUATION_DATE), backend='c').single_name_pricer())
+        self.assertGreater(cache.stats()['evictions'], 0)
+        cache.clear()
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
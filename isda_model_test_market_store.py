@@ -0,0 +1,45 @@
+from datetime import date
+import tempfile
+import unittest
+
+import numpy as np
+
+from isda.isda_model import ISDAModel
+from isda.market_data import Market_Data
+from isda.market_store import MarketDataStore, create_market_store
+from isda_model_fixtures import TENORS, VALUATION_DATE, make_trade
+
+
+class TestMarketDataStore(unittest.TestCase):
+    def testDailyLookup(self):
+        market = Market_Data(VALUATION_DATE)
+        dates = np.busday_offset('2018-01-02', np.arange(30), roll='forward')
+        with tempfile.TemporaryDirectory() as path:
+            self.assertRaises(ValueError, create_market_store, path, dates[::-1], market.instr_names,
+                              market.expiries, ['A', 'B'], TENORS)
+            store = create_market_store(path, dates, market.instr_names, market.expiries, ['A', 'B'], TENORS)
+            store.rates[:] = np.add.outer(np.arange(30) * 1e-4, market.rates)
+            store.spreads[:] = np.arange(30 * 2 * 8).reshape(30, 2, 8) * 1e-5
+            store.set_day('2018-01-08', market.rates, np.zeros((2, 8)))
+            store.flush()
+            del store
+
+            store = MarketDataStore(path)
+            self.assertEqual(len(store), 30)
+            self.assertIsInstance(store.rates, np.memmap)
+            day = store.market_data(VALUATION_DATE)
+            self.assertEqual((day.valuation_date, day.rates, day.expiries), (VALUATION_DATE, market.rates,
+                                                                            market.expiries))
+            self.assertEqual(store.credit_spreads(date(2018, 1, 9), ['B']), {'B': (np.arange(88, 96) * 1e-5).tolist()})
+            self.assertEqual(store.spread_surface(np.datetime64('2018-01-08')).sum(), 0.0)
+            self.assertNotIn(date(2018, 1, 6), store)
+            self.assertRaises(ValueError, store.market_data, date(2017, 12, 29))
+            self.assertRaises(ValueError, store.market_data, date(2019, 1, 1))
+            result = ISDAModel(make_trade(), day, backend='numpy').single_name_pricer()
+            self.assertEqual(result['dirty_pv'],
+                             ISDAModel(make_trade(), market, backend='numpy').single_name_pricer()['dirty_pv'])
+            del store, day
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,284 @@
+from ctypes import pointer
+from datetime import datetime
+import gc
+import math
+import os
+import tempfile
+import unittest
+import weakref
+
+import numpy as np
+
+from isda import dates, numpy_model
+from isda.backend import get_interface
+from isda.conventions import get_conventions
+from isda.dates import ACT_360, B30_360, date_fwd_then_adjust, next_imm_date, string_to_interval, tenor_months
+from isda.isda_model import ISDAModel
+from isda.market_data import Market_Data
+from isda.numpy_interface import NumpyInterface, curve_to_struct, zero_prices
+from isda.struct_views import cash_flow_array, cash_flow_list_from_arrays, curve_array, curve_from_arrays, \
+    date_list_array, date_list_from_array
+from isda.utils import Utils
+from isda_model_fixtures import TENORS, VALUATION_DATE, jpm, make_trade
+
+date_format = "%d/%m/%Y"
+
+# same OpenGamma example as isda_model_test_curves.py
+open_gamma_zero_rates = [("M", "1M", 0.00445), ("M", "2M", 0.00949), ("M", "3M", 0.01234),
+    ("M", "6M", 0.01776), ("M", "9M", 0.01935), ("M", "1Y", 0.02084), ("S", "2Y", 0.01652),
+    ("S", "3Y", 0.02018), ("S", "4Y", 0.02303), ("S", "5Y", 0.02525), ("S", "6Y", 0.02696),
+    ("S", "7Y", 0.02825), ("S", "8Y", 0.02931), ("S", "9Y", 0.03017), ("S", "10Y", 0.03092),
+    ("S", "11Y", 0.03160), ("S", "12Y", 0.03231), ("S", "15Y", 0.03367), ("S", "20Y", 0.03419),
+    ("S", "25Y", 0.03411), ("S", "30Y", 0.03412)]
+
+open_gamma_cds_spreads = [("6M", "20/12/2011", 0.007927), ("1Y", "20/06/2012", 0.007927),
+    ("3Y", "20/06/2014", 0.012239), ("5Y", "20/06/2016", 0.016979),
+    ("7Y", "20/06/2018", 0.019271), ("10Y", "20/06/2021", 0.02086)]
+
+# node dates of the OpenGamma zero curve, the 64 of the C library, and the discount factors at them
+open_gamma_discount_factors = [
+    ('2011-07-13', 0.9996293041), ('2011-08-15', 0.9983420035), ('2011-09-13', 0.9968563581),
+    ('2011-12-13', 0.9910527755), ('2012-03-13', 0.9854862512), ('2012-06-13', 0.9792522560),
+    ('2012-12-13', 0.9734389015), ('2013-06-13', 0.9676915430), ('2013-12-13', 0.9544216363),
+    ('2014-06-13', 0.9414047280), ('2014-12-15', 0.9263854886), ('2015-06-15', 0.9118436456),
+    ('2015-12-14', 0.8963051845), ('2016-06-13', 0.8810315098), ('2016-12-13', 0.8652600932),
+    ('2017-06-13', 0.8498548839), ('2017-12-13', 0.8344018396), ('2018-06-13', 0.8193119336),
+    ('2018-12-13', 0.8040651394), ('2019-06-13', 0.7891830809), ('2019-12-13', 0.7743954345),
+    ('2020-06-15', 0.7597278038), ('2020-12-14', 0.7452236956), ('2021-06-14', 0.7309964881),
+    ('2021-12-13', 0.7167169555), ('2022-06-13', 0.7027163642), ('2022-12-13', 0.6881846015),
+    ('2023-06-13', 0.6740303082), ('2023-12-13', 0.6604866587), ('2024-06-13', 0.6472151489),
+    ('2024-12-13', 0.6342103106), ('2025-06-13', 0.6215357217), ('2025-12-15', 0.6089117792),
+    ('2026-06-15', 0.5967427773), ('2026-12-14', 0.5860841924), ('2027-06-14', 0.5756159834),
+    ('2027-12-13', 0.5653347499), ('2028-06-13', 0.5551821721), ('2028-12-13', 0.5452119197),
+    ('2029-06-13', 0.5354737414), ('2029-12-13', 0.5258574234), ('2030-06-13', 0.5164649410),
+    ('2030-12-13', 0.5071899929), ('2031-06-13', 0.4981309346), ('2031-12-15', 0.4897994838),
+    ('2032-06-14', 0.4817391257), ('2032-12-13', 0.4738114125), ('2033-06-13', 0.4660141613),
+    ('2033-12-13', 0.4583034386), ('2034-06-13', 0.4507613935), ('2034-12-13', 0.4433030448),
+    ('2035-06-13', 0.4360078529), ('2035-12-13', 0.4287936179), ('2036-06-13', 0.4216987506),
+    ('2036-12-15', 0.4145148633), ('2037-06-15', 0.4075669036), ('2037-12-14', 0.4007354032),
+    ('2038-06-14', 0.3940184102), ('2038-12-13', 0.3874140051), ('2039-06-13', 0.3809203009),
+    ('2039-12-13', 0.3745006577), ('2040-06-13', 0.3681892046), ('2040-12-13', 0.3619841182),
+    ('2041-06-13', 0.3559166613)]
+
+
+class TestNumpyModel(unittest.TestCase):
+    def setUp(self):
+        self.value_date = jpm(datetime.strptime("13/06/2011", date_format))
+        dates = [int(date_fwd_then_adjust(self.value_date, string_to_interval(tenor), "M"))
+                 for (_, tenor, _) in open_gamma_zero_rates]
+        self.zero_curve = numpy_model.build_ir_zero_curve(
+            self.value_date, "".join(tp for (tp, _, _) in open_gamma_zero_rates), dates,
+            [rate for (_, _, rate) in open_gamma_zero_rates], 2, 4,
+            ACT_360, B30_360, ACT_360, "M", "None")
+
+        self.stepin_date = int(date_fwd_then_adjust(self.value_date, (1, 'D'), "F"))
+        self.cash_settle_date = int(date_fwd_then_adjust(self.value_date, (3, 'D'), "F"))
+        self.end_dates = [jpm(datetime.strptime(dt, date_format)) for (_, dt, _) in open_gamma_cds_spreads]
+        self.spreads = [spread for (_, _, spread) in open_gamma_cds_spreads]
+        self.credit_curve = numpy_model.clean_spread_curve(
+            self.value_date, self.zero_curve, self.value_date, self.stepin_date, self.cash_settle_date,
+            self.end_dates, self.spreads, None, 0.4, True, None, ACT_360, (False, False), "F", "None")
+
+    def zero_rate(self, dt):
+        tdate = jpm(dt)
+        return -math.log(self.zero_curve.zero_price(tdate)) / ((tdate - self.value_date) / 365.0)
+
+    def price(self, start_dates, end_dates, coupons, is_clean):
+        return numpy_model.cds_price(self.value_date, self.cash_settle_date, self.stepin_date, start_dates, end_dates,
+                                     coupons, True, None, (False, False), ACT_360, "F", "None",
+                                     self.zero_curve, self.credit_curve, 0.4, is_clean)
+
+    def testZeros(self):
+        self.assertAlmostEqual(self.zero_rate(datetime(2011, 7, 13)), 0.00451, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2011, 8, 15)), 0.00961, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2011, 9, 13)), 0.01249, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2011, 12, 13)), 0.01793, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2012, 3, 13)), 0.01948, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2012, 6, 13)), 0.02091, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2012, 12, 13)), 0.01790, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2013, 6, 13)), 0.01640, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2013, 12, 13)), 0.01863, 5)
+        self.assertAlmostEqual(self.zero_rate(datetime(2014, 6, 13)), 0.02011, 5)
+
+        self.assertAlmostEqual(self.zero_rate(datetime(2041, 6, 13)), 0.03441, 5)
+
+    def testImmDates(self):
+        expected = [jpm(d) for (_, d) in Utils.imm_date_vector(datetime(2018, 1, 8), tenor_list=TENORS, format='')]
+        dates = next_imm_date(np.datetime64(VALUATION_DATE), tenor_months(TENORS))
+        self.assertEqual(dates.tolist(), expected)
+        # semi-annual roll: a September maturity after December 2015 moves back to June
+        self.assertEqual(next_imm_date(jpm(datetime(2018, 7, 1)), 0), jpm(datetime(2018, 6, 20)))
+        self.assertEqual(next_imm_date(jpm(datetime(2014, 7, 1)), 0), jpm(datetime(2014, 9, 20)))
+        book = next_imm_date(np.array(['2018-01-08', '2018-03-20', '2018-12-21'], dtype='datetime64[D]'),
+                                         np.array([[12], [60]]))
+        self.assertEqual(book.shape, (2, 3))
+
+    def testIRCurveTenors(self):
+        expected = np.array([dt for (dt, _) in open_gamma_discount_factors], dtype='datetime64[D]')
+        self.assertEqual(self.zero_curve.dates.tolist(), dates.from_datetime64(expected).tolist())
+
+    def testIRCurveDiscountFactors(self):
+        discount_factors = self.zero_curve.zero_price(self.zero_curve.dates)
+        for (dt, expected), df in zip(open_gamma_discount_factors, discount_factors):
+            self.assertAlmostEqual(df, expected, 10, dt)
+
+    def testCreditCurveTenors(self):
+        self.assertEqual(list(self.credit_curve.dates), self.end_dates)
+
+    def testSurvivalProbabilities(self):
+        survival = self.credit_curve.zero_price(self.credit_curve.dates)
+        self.assertAlmostEqual(survival[0], 0.99307, 5)
+        self.assertAlmostEqual(survival[1], 0.98644, 5)
+        self.assertAlmostEqual(survival[2], 0.93914, 5)
+        self.assertAlmostEqual(survival[3], 0.86255, 5)
+        self.assertAlmostEqual(survival[4], 0.78860, 5)
+        self.assertAlmostEqual(survival[5], 0.69042, 5)
+
+    def testZeroPricesOverDateGrid(self):
+        tcurve = curve_to_struct(self.zero_curve)
+        daily = np.arange(self.value_date, self.value_date + 365 * 31)
+        discount_factors = zero_prices(tcurve, daily)
+        self.assertTrue(np.all(np.diff(discount_factors) < 0))
+        for i in range(0, len(daily), 997):
+            self.assertAlmostEqual(discount_factors[i], NumpyInterface().JpmcdsZeroPrice(tcurve, int(daily[i])), 15)
+        np.testing.assert_allclose(zero_prices(tcurve, self.zero_curve.dates),
+                                   np.exp(-self.zero_curve.rates * self.zero_curve.times), rtol=1e-15)
+
+        # the same discount factors quoted annually compounded on ACT/360
+        annual = curve_from_arrays(self.zero_curve.base_date, self.zero_curve.dates,
+                                   np.expm1(self.zero_curve.rates * 360.0 / 365.0), 1, dates.ACT_360)
+        np.testing.assert_allclose(zero_prices(annual, daily), discount_factors, rtol=1e-14)
+        for basis, dcc in ((0, dates.ACT_365F), (numpy_model.CONTINUOUS_BASIS, dates.B30_360)):
+            curve = curve_from_arrays(self.zero_curve.base_date, self.zero_curve.dates, self.zero_curve.rates, basis,
+                                      dcc)
+            self.assertRaises(ValueError, zero_prices, curve, daily)
+
+    def testBenchmarksPriceAtPar(self):
+        prices = self.price(self.value_date, self.end_dates, self.spreads, True)
+        np.testing.assert_allclose(prices, 0.0, atol=1e-12)
+
+    def testLockStepBootstrapMatchesSingleNames(self):
+        spreads = np.array(self.spreads) * np.array([[0.5], [1.0], [3.0]])
+        recovery_rates = np.array([0.4, 0.25, 0.4])
+        bumped = numpy_model.NumpyCurve(self.value_date, self.zero_curve.dates, self.zero_curve.rates + 0.001)
+        for disc_curves in (self.zero_curve, numpy_model.NumpyCurve(
+                self.value_date, self.zero_curve.dates, np.array([self.zero_curve.rates, self.zero_curve.rates,
+                                                                  bumped.rates]))):
+            curves = numpy_model.clean_spread_curves(self.value_date, disc_curves, self.value_date, self.stepin_date,
+                                                     self.cash_settle_date, self.end_dates, spreads, recovery_rates,
+                                                     True, None, ACT_360, (False, False), "F", "None")
+            self.assertEqual(curves.rates.shape, (3, len(self.end_dates)))
+            for g in range(3):
+                disc_curve = bumped if g == 2 and disc_curves is not self.zero_curve else self.zero_curve
+                curve = numpy_model.clean_spread_curve(self.value_date, disc_curve, self.value_date, self.stepin_date,
+                                                       self.cash_settle_date, self.end_dates, spreads[g], None,
+                                                       recovery_rates[g], True, None, ACT_360,
+                                                       (False, False), "F", "None")
+                np.testing.assert_allclose(curves.rates[g], curve.rates, rtol=1e-12)
+
+    def testBatchMatchesSingleTrades(self):
+        start_dates = self.value_date - np.array([0, 30, 85, 85])
+        end_dates = np.array(self.end_dates[2:])
+        coupons = np.array([0.01, 0.05, 0.01, 0.05])
+        prices = self.price(start_dates, end_dates, coupons, False)
+        for i in range(len(prices)):
+            self.assertAlmostEqual(prices[i], self.price(start_dates[i], end_dates[i], coupons[i], False)[0], 14)
+
+
+class TestNumpyBackend(unittest.TestCase):
+    def testSingleNamePricer(self):
+        result = ISDAModel(make_trade(), Market_Data(VALUATION_DATE), backend='numpy').single_name_pricer()
+        # 20 days accrued from 20/12/2017 to the 09/01/2018 step-in date
+        self.assertAlmostEqual(result['accrued_premium'], 10000000 * 0.01 * 20 / 360., 6)
+        self.assertLess(result['cs01'], 0.0)
+
+
+class TestDates(unittest.TestCase):
+    def testTDateRoundTrip(self):
+        days = np.arange('1990-01-01', '2060-01-01', dtype='datetime64[D]')
+        tdates = dates.from_datetime64(days)
+        self.assertEqual(dates.jpm_date(1601, 1, 1), 0)
+        self.assertTrue(np.all(np.diff(tdates) == 1))
+        np.testing.assert_array_equal(dates.to_datetime64(tdates), days)
+        self.assertEqual(dates.format_date(jpm(datetime(2018, 1, 8))), b'20180108')
+
+    def testHolidayCalendars(self):
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, 'w') as f:
+            f.write('# test holidays\n20141215\n20141216 # second day\n')
+        try:
+            dates.load_holidays('TEST', path)
+        finally:
+            os.remove(path)
+        saturday = jpm(datetime(2014, 12, 13))
+        self.assertEqual(dates.business_day_adjust(saturday, 'M', 'None'), jpm(datetime(2014, 12, 15)))
+        self.assertEqual(dates.business_day_adjust(saturday, 'M', 'test'), jpm(datetime(2014, 12, 17)))
+        self.assertEqual(dates.business_day_adjust(saturday, 'P', 'TEST'), jpm(datetime(2014, 12, 12)))
+        self.assertEqual(dates.business_day_adjust(saturday, 'F', 'No_Weekends'), saturday)
+        self.assertRaises(ValueError, dates.business_day_adjust, saturday, 'F', 'NOT A CALENDAR')
+        end_of_month = jpm(datetime(2015, 2, 28))
+        self.assertEqual(dates.business_day_adjust(end_of_month, 'M', 'None'), jpm(datetime(2015, 2, 27)))
+
+    def testDayCounts(self):
+        start, end = jpm(datetime(2011, 6, 13)), jpm(datetime(2011, 12, 31))
+        self.assertAlmostEqual(dates.day_count_fraction(start, end, dates.ACT_360), 201 / 360.0)
+        self.assertAlmostEqual(dates.day_count_fraction(start, end, dates.ACT_365F), 201 / 365.0)
+        self.assertAlmostEqual(dates.day_count_fraction(start, end, dates.B30_360), 198 / 360.0)
+        # actual/actual splits the period at the start of each year, 2012 is a leap year
+        leap = jpm(datetime(2012, 3, 1))
+        self.assertEqual(dates.string_to_day_count('Act/Act'), dates.ACT_365)
+        self.assertAlmostEqual(dates.day_count_fraction(start, leap, dates.ACT_365), 202 / 365.0 + 60 / 366.0)
+        self.assertAlmostEqual(dates.day_count_fraction(leap, start, dates.ACT_365), -(202 / 365.0 + 60 / 366.0))
+        self.assertAlmostEqual(dates.day_count_fraction(start, end, dates.ACT_365), 201 / 365.0)
+
+
+class TestConventions(unittest.TestCase):
+    def testParsedOnceAndShared(self):
+        conventions = get_conventions(get_interface('numpy'))
+        self.assertIs(conventions, get_conventions(get_interface('numpy')))
+        self.assertEqual(conventions.day_count('Act/360'), ACT_360)
+        self.assertEqual(conventions.day_count('30/360'), B30_360)
+        self.assertEqual(conventions.frequency('6M'), 2)
+        self.assertEqual(conventions.tenor('3D'), (3, 'D'))
+        interval = conventions.interval('3M')
+        self.assertEqual((interval.prd, interval.prd_type), (3, b'M'))
+        self.assertIs(conventions.interval('3m'), interval)
+        stub = conventions.stub('F/S')
+        self.assertEqual((stub.stubAtEnd, stub.longStub), (0, 0))
+        self.assertIs(conventions.stub('F/S'), stub)
+        self.assertEqual(conventions.bad_day('M'), ord('M'))
+        with self.assertRaises(AttributeError):
+            interval.prd = 6
+        self.assertRaises(ValueError, conventions.bad_day, 'X')
+
+    def testRegistryDoesNotKeepInterfaceAlive(self):
+        interface = NumpyInterface()
+        self.assertEqual(get_conventions(interface).day_count('30/360'), B30_360)
+        reference = weakref.ref(interface)
+        del interface
+        gc.collect()
+        self.assertIsNone(reference())
+
+
+class TestStructViews(unittest.TestCase):
+    def testCurveViewSharesMemory(self):
+        tcurve = curve_to_struct(numpy_model.NumpyCurve(150000, [150100, 150200, 150300], [0.01, 0.02, 0.03]))
+        points = curve_array(tcurve)
+        self.assertEqual(points['fDate'].tolist(), [150100, 150200, 150300])
+        self.assertEqual(points['fRate'].tolist(), [0.01, 0.02, 0.03])
+        points['fRate'][1] = 0.05
+        self.assertEqual(tcurve.fArray[1].fRate, 0.05)
+        self.assertEqual(curve_array(pointer(tcurve))['fRate'][1], 0.05)
+
+    def testCashFlowAndDateLists(self):
+        flows = cash_flow_list_from_arrays([150100, 150191], [2500.0, 2527.78])
+        self.assertEqual((flows.fArray[1].fDate, flows.fArray[1].fAmount), (150191, 2527.78))
+        self.assertEqual(cash_flow_array(flows).tolist(), [(150100, 2500.0), (150191, 2527.78)])
+        dates = date_list_from_array(np.arange(150000, 150005))
+        self.assertEqual(dates.fArray[4], 150004)
+        self.assertEqual(date_list_array(dates).tolist(), list(range(150000, 150005)))
+        self.assertEqual(len(cash_flow_array(cash_flow_list_from_arrays([], []))), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
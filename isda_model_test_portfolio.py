@@ -0,0 +1,197 @@
+from datetime import date
+import os
+import unittest
+
+import numpy as np
+
+from isda import numpy_model
+from isda.batch import BatchRunner, read_trade_file, shard_trades
+from isda.dates import jpm_date, to_datetime64
+from isda.isda_model import ISDAModel
+from isda.market_data import Market_Data
+from isda.portfolio import ISDAPortfolioModel
+from isda.trade_store import TradeStore, pq
+from isda_model_fixtures import TENORS, VALUATION_DATE, credit_spreads, make_trade, trade_table, write_csv
+
+
+class TestPortfolio(unittest.TestCase):
+    def testMatchesSingleNamePricer(self):
+        trades = [make_trade(maturity_date=date(2020 + i, 12, 20), is_buy_protection=bool(i % 2),
+                             running_coupon=(100, 500)[i % 2], recovery_rate=(0.4, 0.25)[i % 3 == 0])
+                  for i in range(4)]
+        book = ISDAPortfolioModel(trades, Market_Data(VALUATION_DATE))
+        self.assertEqual(len(book.groups), 2)
+        result = book.portfolio_pricer()
+        for i, cds in enumerate(trades):
+            expected = ISDAModel(cds, Market_Data(VALUATION_DATE), backend='numpy').single_name_pricer()
+            for key, value in expected.items():
+                self.assertAlmostEqual(result[key][i], value, 6)
+
+    def testSeasonedTradeBootstrapsFromValuationDate(self):
+        seasoned = make_trade(trade_date=date(2017, 6, 20), effective_date=date(2017, 6, 21),
+                              accrual_start_date=date(2017, 6, 20), maturity_date=date(2022, 6, 20))
+        result = ISDAPortfolioModel([seasoned], Market_Data(VALUATION_DATE)).portfolio_pricer()
+        fresh = make_trade(accrual_start_date=date(2017, 6, 20), maturity_date=date(2022, 6, 20))
+        expected = ISDAModel(fresh, Market_Data(VALUATION_DATE), backend='numpy').single_name_pricer()
+        for key, value in expected.items():
+            self.assertAlmostEqual(result[key][0], value, 6)
+        own_curve = ISDAModel(seasoned, Market_Data(VALUATION_DATE), backend='numpy').single_name_pricer()
+        self.assertNotAlmostEqual(result['dirty_pv'][0], own_curve['dirty_pv'], 2)
+
+    def testIncrementalRebootstrap(self):
+        spreads = credit_spreads()
+        trades = trade_table(['A', 'B', 'A'], '2022-12-20', recovery_rate=[0.4, 0.4, 0.25])
+        book = ISDAPortfolioModel(trades, Market_Data(VALUATION_DATE), spreads, TENORS)
+        zero_curve = book.buildZeroCurve()
+        credit_curves = book.buildCreditCurves(zero_curve)
+        for tenor, move in ((5, 0.00005), (0, -0.0003), (7, 0.001)):
+            book.credit_spreads['A'] = list(spreads['A'])
+            book.credit_spreads['A'][tenor] += move
+            updated = book.updateCreditCurves(zero_curve, credit_curves, spreads)
+            np.testing.assert_allclose(updated.rates, book.buildCreditCurves(zero_curve).rates, rtol=1e-12)
+            # hazard rates before the changed tenor and the curve of B are kept as they were
+            np.testing.assert_array_equal(updated.rates[:, :tenor], credit_curves.rates[:, :tenor])
+            np.testing.assert_array_equal(updated.rates[book.groups.index(('B', 0.4))],
+                                          credit_curves.rates[book.groups.index(('B', 0.4))])
+
+    def testScheduleCacheSharesRolls(self):
+        trades = trade_table(['A'] * 5, ['2022-12-20', '2019-06-20', '2022-12-20', '2027-12-20', '2019-06-20'],
+                             ['2017-12-20', '2017-09-20', '2017-12-20', '2017-12-20', '2017-09-20'],
+                             [100, 500, 500, 100, 100], is_buy_protection=[True, False, True, False, True])
+        book = ISDAPortfolioModel(trades, Market_Data(VALUATION_DATE), credit_spreads('A'), TENORS)
+        zero_curve = book.buildZeroCurve()
+        credit_curves = book.buildCreditCurves(zero_curve)
+        prices = book.calc_cds_prices(zero_curve, credit_curves)
+        self.assertEqual(book.schedules.stats(), {'hits': 0, 'misses': 3, 'evictions': 0, 'size': 3,
+                                                  'max_size': 4096})
+        book.calc_cds_price(zero_curve, credit_curves, False, rows=[1, 3])
+        self.assertEqual(book.schedules.stats(), {'hits': 2, 'misses': 3, 'evictions': 0, 'size': 3,
+                                                  'max_size': 4096})
+
+        # a bounded cache drops the least recently used schedules and still hands out every schedule asked for
+        small = numpy_model.ScheduleCache(max_size=2)
+        first = small.get(book.trades['accrual_start_date'], book.trades['maturity_date'])
+        self.assertEqual(small.stats(), {'hits': 0, 'misses': 3, 'evictions': 1, 'size': 2, 'max_size': 2})
+        again = small.get(book.trades['accrual_start_date'], book.trades['maturity_date'])
+        self.assertEqual(small.stats(), {'hits': 2, 'misses': 4, 'evictions': 2, 'size': 2, 'max_size': 2})
+        for name, values in first.items():
+            np.testing.assert_array_equal(again[name], values)
+        self.assertRaises(ValueError, numpy_model.ScheduleCache, 0)
+
+        schedule = book.schedules.get(book.trades['accrual_start_date'], book.trades['maturity_date'], None,
+                                      book.stub_type, book.payment_dcc, book.bad_day_conv, book.calendar)
+        expected = numpy_model.fee_leg_schedule(book.trades['accrual_start_date'], book.trades['maturity_date'], None,
+                                                book.stub_type, book.bad_day_conv, book.calendar)
+        np.testing.assert_array_equal(schedule['valid'], expected['valid'])
+        for name in ('acc_start', 'acc_end', 'pay_date'):
+            np.testing.assert_array_equal(schedule[name][schedule['valid']], expected[name][expected['valid']])
+        book.schedules = None
+        for cached, built in zip(prices, book.calc_cds_prices(zero_curve, credit_curves)):
+            np.testing.assert_array_equal(cached, built)
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.spreads = dict(credit_spreads(), C=[0.001, 0.0011, 0.0018, 0.003, 0.0042, 0.006, 0.012, 0.0147])
+        rows = ['refob,accrual_start_date,maturity_date,running_coupon,recovery_rate,notional,is_buy_protection']
+        for i in range(12):
+            rows.append('{},2017-12-20,{}-12-20,{},0.4,10000000,{}'.format('BCA'[i % 3], 2019 + i % 5,
+                                                                            (100, 500)[i % 2], i % 2 == 0))
+        self.path = write_csv(rows)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testShardsKeepNamesTogether(self):
+        trades = read_trade_file(self.path)
+        chunks = list(shard_trades(trades, 5))
+        self.assertEqual([sorted(set(chunk['refob'])) for _, chunk in chunks], [['A'], ['B'], ['C']])
+        self.assertEqual(sorted(np.concatenate([positions for positions, _ in chunks])), list(range(12)))
+        self.assertEqual(len(list(shard_trades(trades, 8))), 2)
+
+    def testPoolMatchesWholeBook(self):
+        trades = read_trade_file(self.path)
+        expected = ISDAPortfolioModel(trades, Market_Data(VALUATION_DATE), self.spreads,
+                                      TENORS).portfolio_pricer()
+        runner = BatchRunner(Market_Data(VALUATION_DATE), self.spreads, TENORS, workers=2, chunk_size=4,
+                             max_pending=1)
+        result = runner.price(trades)
+        for key, values in expected.items():
+            np.testing.assert_allclose(result[key], values, rtol=1e-12, atol=1e-9)
+
+
+class TestTradeStore(unittest.TestCase):
+    def setUp(self):
+        spreads = credit_spreads()
+        self.spreads = {'TARGET, CORP': spreads['A'], 'B': spreads['B']}
+        rows = ['trade_id,is_buy_protection,refob,maturity_date,accrual_start_date,notional,recovery_rate,'
+                'running_coupon']
+        for i in range(6):
+            rows.append('{},{},{},{}-12-20,2017-12-20,10000000,0.4,{}'.format(
+                i, ('false', 'TRUE')[i % 2], ('"TARGET, CORP"', 'B')[i % 2], 2019 + i, (100, 500)[i % 2]))
+        self.path = write_csv(rows)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testReadCsv(self):
+        store = TradeStore.read_csv(self.path)
+        self.assertEqual(len(store), 6)
+        self.assertEqual(store.table.dtype['refob'].itemsize // 4, len('TARGET, CORP'))
+        columns = store.columns()
+        self.assertEqual(columns['refob'].tolist()[:2], ['TARGET, CORP', 'B'])
+        self.assertEqual(columns['is_buy_protection'].tolist(), [False, True] * 3)
+        self.assertEqual(columns['maturity_date'][0], jpm_date(2019, 12, 20))
+        self.assertEqual(columns['running_coupon'].tolist(), [100.0, 500.0] * 3)
+        same = TradeStore.from_columns(columns)
+        self.assertEqual(same.table.tolist(), store.table.tolist())
+
+    def testFeedsBatchRunner(self):
+        store = TradeStore.read_csv(self.path)
+        expected = ISDAPortfolioModel(store.columns(), Market_Data(VALUATION_DATE), self.spreads,
+                                      TENORS).portfolio_pricer()
+        result = BatchRunner(Market_Data(VALUATION_DATE), self.spreads, TENORS, workers=1, chunk_size=2).price(store)
+        for key, values in expected.items():
+            np.testing.assert_allclose(result[key], values, rtol=1e-12, atol=1e-9)
+
+    def testFromArrow(self):
+        # stands in for a pyarrow Table: names come back as objects and dates as timestamps
+        class Column:
+            def __init__(self, values):
+                self.values = values
+
+            def to_numpy(self):
+                return self.values
+
+        class Table:
+            def __init__(self, columns):
+                self.columns = columns
+
+            def column(self, name):
+                return Column(self.columns[name])
+
+        store = TradeStore.read_csv(self.path)
+        columns = {name: to_datetime64(column).astype('datetime64[ms]') if name.endswith('date')
+                   else column for name, column in store.columns().items()}
+        columns['refob'] = columns['refob'].astype(object)
+        same = TradeStore.from_arrow(Table(columns))
+        self.assertEqual(same.table.dtype, store.table.dtype)
+        self.assertEqual(same.table.tolist(), store.table.tolist())
+
+    @unittest.skipIf(pq is None, 'pyarrow is not installed')
+    def testParquetRoundTrip(self):
+        import pyarrow as pa
+        store = TradeStore.read_csv(self.path)
+        columns = store.columns()
+        table = pa.table({name: to_datetime64(column) if name.endswith('date') else column
+                          for name, column in columns.items()})
+        path = self.path + '.parquet'
+        pq.write_table(table, path)
+        try:
+            self.assertEqual(TradeStore.read_parquet(path).table.tolist(), store.table.tolist())
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
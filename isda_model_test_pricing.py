@@ -0,0 +1,193 @@
+from contextlib import redirect_stdout
+from datetime import date
+import gc
+import io
+import unittest
+
+import numpy as np
+
+from isda import numpy_model
+from isda.dates import ACT_360, jpm_date
+from isda.isda_model import ISDAModel
+from isda.market_data import Market_Data
+from isda.portfolio import ISDAPortfolioModel
+from isda.results import RESULT_FIELDS, PricingResult
+from isda.struct_views import curve_array
+from isda.upfront import UpfrontConverter
+from isda.valuation_context import ValuationContext
+from isda_model_fixtures import VALUATION_DATE, c_library_available, make_trade
+
+
+class TestQuietPricing(unittest.TestCase):
+    def setUp(self):
+        self.cds = make_trade()
+        self.market = Market_Data(VALUATION_DATE)
+
+    def testNothingPrintedAndDiagnosticsLogged(self):
+        model = ISDAModel(self.cds, self.market, backend='numpy')
+        with redirect_stdout(io.StringIO()) as stdout:
+            result = model.price()
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertIsInstance(result, PricingResult)
+        self.assertFalse(hasattr(result, '__dict__'))
+        self.assertEqual(result.as_dict(), model.single_name_pricer())
+        with self.assertLogs('isda.isda_model', 'DEBUG') as logs:
+            self.assertEqual(model.price(), result)
+        self.assertTrue(any(line.startswith('DEBUG:isda.isda_model:Date:') for line in logs.output))
+        self.assertTrue(any('CashFlow' in line for line in logs.output))
+
+    def testSinglePassMatchesCleanAndDirtyCalls(self):
+        model = ISDAModel(self.cds, self.market, backend='numpy')
+        zero_curve, _ = model.buildZeroCurve()
+        credit_curve, _ = model.buildCreditCurve(zero_curve)
+        clean, dirty, accrued = model.calc_cds_prices(100, zero_curve, credit_curve)
+        self.assertEqual(clean, model.calc_cds_price(100, zero_curve, credit_curve, is_clean=True))
+        self.assertEqual(dirty, model.calc_cds_price(100, zero_curve, credit_curve, is_clean=False))
+        # 20 Dec 2017 to the 9 Jan 2018 step-in date, Act/360
+        self.assertAlmostEqual(accrued, 0.01 * 20 / 360, 15)
+
+    def testBookRecords(self):
+        book = ISDAPortfolioModel([self.cds, self.cds], self.market)
+        records = book.price()
+        self.assertEqual(records.dtype.names, RESULT_FIELDS)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records.dirty_pv.tolist(), book.portfolio_pricer()['dirty_pv'].tolist())
+
+
+@unittest.skipUnless(c_library_available(), 'ISDA_Clib.dll cannot be loaded on this platform')
+class TestCPricing(unittest.TestCase):
+    def testAccruedMatchesLibrary(self):
+        # the accrued of the numpy fee leg schedule is the one JpmcdsCdsPrice takes off the dirty price
+        model = ISDAModel(make_trade(), Market_Data(VALUATION_DATE), backend='c')
+        zero_curve, _ = model.buildZeroCurve()
+        credit_curve, _ = model.buildCreditCurve(zero_curve)
+        clean, dirty, accrued = model.calc_cds_prices(100, zero_curve, credit_curve)
+        self.assertEqual(dirty, model.calc_cds_price(100, zero_curve, credit_curve, is_clean=False))
+        self.assertAlmostEqual(clean, model.calc_cds_price(100, zero_curve, credit_curve, is_clean=True), 14)
+        self.assertAlmostEqual(accrued, 0.01 * 20 / 360, 15)
+
+
+class TestParSpreads(unittest.TestCase):
+    def setUp(self):
+        self.cds = make_trade()
+        self.market = Market_Data(VALUATION_DATE)
+
+    def testParSpreadsReproduceQuotes(self):
+        model = ISDAModel(self.cds, self.market, backend='numpy')
+        zero_curve, _ = model.buildZeroCurve()
+        credit_curve, _ = model.buildCreditCurve(zero_curve)
+        # quotes are priced at the cash settle date and par spreads at today, the accrued is discounted differently
+        np.testing.assert_allclose(model.par_spreads(zero_curve, credit_curve), self.cds.credit_spreads, rtol=2e-6)
+        maturities = [self.cds.maturity_date, self.cds.maturity_date + 365]
+        spreads = model.par_spreads(zero_curve, credit_curve, maturities)
+        self.assertTrue(self.cds.credit_spreads[4] < spreads[0] < spreads[1] < self.cds.credit_spreads[6])
+
+        book = ISDAPortfolioModel([self.cds, make_trade(maturity_date=date(2020, 12, 20), is_buy_protection=True,
+                                                        running_coupon=500, recovery_rate=0.25)], self.market)
+        book_zero_curve = book.buildZeroCurve()
+        matrix = book.par_spreads(book_zero_curve, book.buildCreditCurves(book_zero_curve))
+        self.assertEqual(matrix.shape, (2, len(self.cds.credit_spread_tenors)))
+        np.testing.assert_allclose(matrix, [self.cds.credit_spreads] * 2, rtol=2e-6)
+
+
+class TestUpfrontConverter(unittest.TestCase):
+    def setUp(self):
+        self.cds = make_trade(par_spread=0.0125)
+        self.market = Market_Data(VALUATION_DATE)
+        self.converter = UpfrontConverter(self.market)
+
+    def testMatchesSinglePillarBootstrap(self):
+        converter = self.converter
+        spreads = np.array([0.0005, 0.0125, 0.03, 0.08])
+        coupons = np.array([100, 100, 500, 500])
+        maturity_dates = self.cds.maturity_date + np.array([-365, 0, 0, 730])
+        upfronts = converter.upfront(spreads, coupons, self.cds.accrual_start_date, maturity_dates)
+        for i in range(len(spreads)):
+            curve = numpy_model.clean_spread_curve(converter.valuation_date, converter.zero_curve,
+                                                   self.cds.accrual_start_date, converter.step_in_date,
+                                                   converter.cash_settle_date, [maturity_dates[i]], [spreads[i]], None,
+                                                   0.4, True, None, ACT_360, converter.stub_type, ord('F'),
+                                                   'None')
+            price = numpy_model.cds_price(converter.valuation_date, converter.cash_settle_date, converter.step_in_date,
+                                          self.cds.accrual_start_date, maturity_dates[i], coupons[i] / 10000., True,
+                                          None, converter.stub_type, ACT_360, ord('F'), 'None',
+                                          converter.zero_curve, curve, 0.4, True)
+            self.assertAlmostEqual(upfronts[i], price[0], 12)
+        self.assertLess(upfronts[0], 0.0)
+        self.assertGreater(upfronts[3], 0.0)
+
+    def testSpreadInvertsUpfront(self):
+        rng = np.random.default_rng(7)
+        spreads = rng.uniform(0.0005, 0.1, 500)
+        coupons = np.where(spreads > 0.03, 500, 100)
+        maturity_dates = self.cds.maturity_date + 91 * rng.integers(-16, 20, 500)
+        recovery_rates = rng.choice([0.25, 0.4], 500)
+        for clean in (True, False):
+            upfronts = self.converter.upfront(spreads, coupons, self.cds.accrual_start_date, maturity_dates,
+                                              recovery_rates, clean)
+            np.testing.assert_allclose(self.converter.spread(upfronts, coupons, self.cds.accrual_start_date,
+                                                             maturity_dates, recovery_rates, clean), spreads,
+                                       rtol=1e-10)
+
+    def testSpreadBelowDefaultFreeValue(self):
+        with self.assertRaises(ValueError):
+            self.converter.spread(-0.2, 100, self.cds.accrual_start_date, self.cds.maturity_date)
+
+    def testSingleNameUpfrontAndAccrued(self):
+        model = ISDAModel(self.cds, self.market, backend='numpy')
+        with redirect_stdout(io.StringIO()) as out:
+            upfront_charge = model.get_upfront_charge(100)
+            accrued_premium = model.get_accrued_premium()
+        self.assertEqual(out.getvalue(), '')
+        dirty = self.converter.upfront(0.0125, 100, self.cds.accrual_start_date, self.cds.maturity_date, clean=False)
+        clean = self.converter.upfront(0.0125, 100, self.cds.accrual_start_date, self.cds.maturity_date)
+        self.assertAlmostEqual(upfront_charge, dirty[0] * 10000000, 6)
+        self.assertAlmostEqual(accrued_premium, 10000000 * 0.01 * 20 / 360., 6)
+        self.assertAlmostEqual(self.cds.clean_price, 100. - clean[0] * 100., 8)
+
+
+class TestValuationContext(unittest.TestCase):
+    def testSharedByTrades(self):
+        valuation_date = date(2018, 1, 5)
+        context = ValuationContext(Market_Data(valuation_date), backend='numpy')
+        self.assertEqual(context.valuation_date, jpm_date(2018, 1, 5))
+        self.assertEqual(context.step_in_date - context.valuation_date, 1)
+        self.assertEqual(context.cash_settle_date - context.valuation_date, 3)
+        built = []
+        build_zero_curve = context.build_zero_curve
+        context.build_zero_curve = lambda shift=None: built.append(shift) or build_zero_curve(shift)
+        for maturity in (2020, 2022):
+            cds = make_trade(valuation_date, maturity_date=date(maturity, 12, 20), is_buy_protection=True)
+            shared = ISDAModel(cds, context.market, context=context).single_name_pricer()
+            self.assertEqual(shared, ISDAModel(cds, Market_Data(valuation_date), backend='numpy').single_name_pricer())
+        self.assertEqual(built, [None, 0.0001])
+        context.close()
+        self.assertEqual(context._zero_curves, {})
+
+    def testCurvesReleased(self):
+        with ValuationContext(Market_Data(date(2018, 1, 5)), backend='numpy') as context:
+            context.zero_curve()
+            zero_curves = context._zero_curves
+            self.assertEqual(len(zero_curves), 1)
+        self.assertEqual(zero_curves, {})
+        # the context of a model that was not given one is released with the model
+        model = ISDAModel(make_trade(date(2018, 1, 5), is_buy_protection=True), Market_Data(date(2018, 1, 5)),
+                          backend='numpy')
+        model.single_name_pricer()
+        zero_curves = model.context._zero_curves
+        self.assertEqual(len(zero_curves), 2)
+        del model
+        gc.collect()
+        self.assertEqual(zero_curves, {})
+
+    def testNumpyZeroCurve(self):
+        context = ValuationContext(Market_Data(VALUATION_DATE), backend='numpy')
+        zero_curve = context.numpy_zero_curve()
+        np.testing.assert_allclose(zero_curve.rates, curve_array(context.zero_curve())['fRate'], rtol=1e-14)
+        shifted = context.numpy_zero_curve(np.array([[0.0], [0.0001]]))
+        np.testing.assert_allclose(shifted.rates[0], zero_curve.rates, rtol=1e-14)
+        np.testing.assert_allclose(shifted.rates[1], context.numpy_zero_curve(0.0001).rates, rtol=1e-15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+from datetime import date
+import tempfile
+import unittest
+
+import numpy as np
+
+from isda import numpy_model
+from isda.market_data import Market_Data
+from isda.market_store import create_market_store
+from isda.portfolio import ISDAPortfolioModel
+from isda.risk import analytic_risk, bucketed_risk
+from isda.scenarios import ScenarioEngine, historical_shifts
+from isda_model_fixtures import TENORS, VALUATION_DATE, credit_spreads, make_trade, trade_table
+
+
+class TestBucketedRisk(unittest.TestCase):
+    def setUp(self):
+        trades = [make_trade(maturity_date=date(2019 + 2 * i, 12, 20), is_buy_protection=bool(i % 2))
+                  for i in range(3)]
+        self.book = ISDAPortfolioModel(trades, Market_Data(VALUATION_DATE))
+
+    def testBucketsAddUpToParallelShift(self):
+        risk = bucketed_risk(self.book)
+        self.assertEqual(risk['cs01'].shape, (8, 3))
+        self.assertEqual(risk['ir01'].shape, (19, 3))
+        # no sensitivity to spread tenors beyond the maturity of the 2019 trade
+        np.testing.assert_allclose(risk['cs01'][4:, 0], 0.0, atol=1e-6)
+        parallel = self.book.portfolio_pricer()
+        np.testing.assert_allclose(risk['ir01'].sum(axis=0), parallel['dv01'], rtol=1e-3)
+        zero_curve = self.book.buildZeroCurve()
+        base = self.book.calc_cds_price(zero_curve, self.book.buildCreditCurves(zero_curve), False)
+        shifted = self.book.calc_cds_price(zero_curve, self.book.buildCreditCurves(zero_curve, shift=0.0001), False)
+        scale_factor = np.array([1.0, -1.0, 1.0]) * 10000000
+        np.testing.assert_allclose(risk['cs01'].sum(axis=0), (shifted - base) * scale_factor, rtol=1e-3)
+
+    def testProcessPoolMatchesSerial(self):
+        serial = bucketed_risk(self.book)
+        pooled = bucketed_risk(self.book, workers=2, chunksize=4)
+        np.testing.assert_allclose(pooled['cs01'], serial['cs01'], rtol=0, atol=1e-9)
+        np.testing.assert_allclose(pooled['ir01'], serial['ir01'], rtol=0, atol=1e-9)
+
+    def testAnalyticMatchesBumpedRebuilds(self):
+        bumped = bucketed_risk(self.book)
+        analytic = analytic_risk(self.book)
+        # bumped rebuilds include the second order term, about 1e-4 of the first order one
+        np.testing.assert_allclose(analytic['cs01'], bumped['cs01'], rtol=5e-4, atol=1e-3)
+        np.testing.assert_allclose(analytic['ir01'], bumped['ir01'], rtol=5e-4, atol=1e-3)
+
+    def testAdjointMatchesComplexStep(self):
+        book = self.book
+        zero_curve = book.buildZeroCurve()
+        credit_curves = book.buildCreditCurves(zero_curve)
+        rng = np.random.default_rng(3)
+        zero_moves = rng.normal(size=(4, 1, len(zero_curve)))
+        credit_moves = rng.normal(size=(4, len(book.groups), len(credit_curves)))
+        step = 1j * numpy_model.COMPLEX_STEP
+        derivatives = book.calc_cds_price_derivatives(
+            zero_curve, credit_curves,
+            numpy_model.NumpyCurve(zero_curve.base_date, zero_curve.dates, zero_curve.rates + step * zero_moves),
+            numpy_model.NumpyCurve(credit_curves.base_date, credit_curves.dates,
+                                   credit_curves.rates + step * credit_moves))
+        for j in range(4):
+            stepped = book.calc_cds_price(
+                numpy_model.NumpyCurve(zero_curve.base_date, zero_curve.dates,
+                                       zero_curve.rates + step * zero_moves[j, 0]),
+                numpy_model.NumpyCurve(credit_curves.base_date, credit_curves.dates,
+                                       credit_curves.rates + step * credit_moves[j]), False)
+            np.testing.assert_allclose(derivatives[j], stepped.imag / numpy_model.COMPLEX_STEP, rtol=1e-10)
+
+
+class TestScenarioEngine(unittest.TestCase):
+    def setUp(self):
+        self.spreads = credit_spreads()
+        self.trades = trade_table(['A', 'B', 'A', 'B', 'A'],
+                                  ['2019-12-20', '2020-12-20', '2022-12-20', '2023-06-20', '2027-12-20'],
+                                  running_coupon=[100, 500, 100, 500, 100], recovery_rate=[0.4, 0.4, 0.25, 0.4, 0.4],
+                                  is_buy_protection=[True, False, False, True, False])
+        self.market = Market_Data(VALUATION_DATE)
+        rng = np.random.default_rng(7)
+        self.rate_shifts = rng.normal(0.0, 0.0005, (5, len(self.market.expiries)))
+        self.rate_shifts[0] = 0.0
+        self.spread_shifts = rng.normal(0.0, 0.0001, (5, len(TENORS))) * np.linspace(0.5, 2.0, len(TENORS))
+        self.spread_shifts[0] = 0.0
+
+    def book(self, market=None, spreads=None):
+        return ISDAPortfolioModel(self.trades, market or self.market, spreads or self.spreads, TENORS)
+
+    def testMatchesRepricing(self):
+        engine = ScenarioEngine(self.book(), scenario_chunk=2, trade_chunk=3)
+        pnl = engine.pnl(self.rate_shifts, self.spread_shifts)
+        self.assertEqual(pnl.shape, (5, 5))
+        np.testing.assert_array_equal(pnl[0], 0.0)
+        base = self.book().portfolio_pricer()['dirty_pv']
+        for s in range(1, 5):
+            market = Market_Data(VALUATION_DATE, rates=np.add(self.market.rates, self.rate_shifts[s]))
+            spreads = {name: np.add(values, self.spread_shifts[s]).tolist() for name, values in self.spreads.items()}
+            expected = self.book(market, spreads).portfolio_pricer()['dirty_pv'] - base
+            np.testing.assert_allclose(pnl[s], expected, rtol=1e-9, atol=1e-6)
+        pool = ScenarioEngine(self.book(), scenario_chunk=2, workers=2, max_pending=1)
+        np.testing.assert_allclose(pool.pnl(self.rate_shifts, self.spread_shifts), pnl, rtol=1e-12, atol=1e-9)
+
+    def testHistoricalShifts(self):
+        book = self.book()
+        dates = np.busday_offset('2018-01-02', np.arange(6), roll='forward')
+        with tempfile.TemporaryDirectory() as path:
+            store = create_market_store(path, dates, self.market.instr_names, self.market.expiries, ['B', 'A'],
+                                        TENORS)
+            store.rates[:] = np.add(self.market.rates, np.cumsum(np.vstack([np.zeros(19), self.rate_shifts]), axis=0))
+            store.spreads[:] = np.arange(6 * 2 * 8).reshape(6, 2, 8) * 1e-5
+            rate_shifts, spread_shifts = historical_shifts(store, book, dates[:5])
+            np.testing.assert_allclose(rate_shifts, self.rate_shifts, atol=1e-15)
+            self.assertEqual(spread_shifts.shape, (5, len(book.groups), 8))
+            np.testing.assert_allclose(spread_shifts, 16e-5)
+            self.assertRaises(ValueError, historical_shifts, store, book, dates[5:])
+            del store
+        self.assertEqual(ScenarioEngine(book).pnl(rate_shifts, spread_shifts).shape, (5, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from isda.market_data import Market_Data
+from isda.portfolio import ISDAPortfolioModel
+from isda.streaming import LatencyHistogram, RateTick, SpreadTick, StreamingPricer
+from isda_model_fixtures import TENORS, VALUATION_DATE, credit_spreads, trade_table
+
+
+class TestStreamingPricer(unittest.TestCase):
+    def setUp(self):
+        self.market = Market_Data(VALUATION_DATE)
+        self.spreads = credit_spreads()
+        self.trades = trade_table(['A', 'B', 'A', 'B'], ['2020-12-20', '2022-12-20', '2022-12-20', '2027-12-20'],
+                                  running_coupon=[100, 500, 100, 100], recovery_rate=[0.4, 0.4, 0.25, 0.4],
+                                  is_buy_protection=[True, False, False, True])
+
+    def expected(self, spreads, rates):
+        """Dirty PV and CS01 (spreads bumped on the unbumped zero curve) of a book built from scratch."""
+        book = ISDAPortfolioModel(self.trades, Market_Data(self.market.valuation_date, rates=rates), spreads,
+                                  TENORS)
+        zero_curve = book.buildZeroCurve()
+        scale = np.where(book.trades['is_buy_protection'], -1.0, 1.0) * book.trades['notional']
+        dirty_pv = book.calc_cds_price(zero_curve, book.buildCreditCurves(zero_curve), False) * scale
+        bumped_pv = book.calc_cds_price(zero_curve, book.buildCreditCurves(zero_curve, shift=0.0001), False) * scale
+        return {'dirty_pv': dirty_pv, 'cs01': bumped_pv - dirty_pv}
+
+    def testTicksRepriceDependentTrades(self):
+        pricer = StreamingPricer(ISDAPortfolioModel(self.trades, self.market, self.spreads, TENORS))
+        original = pricer.book.credit_spreads
+        updates = []
+
+        async def consume():
+            while True:
+                update = await pricer.updates.get()
+                if update is None:
+                    return
+                updates.append(update)
+
+        async def stream():
+            consumer = asyncio.ensure_future(consume())
+            runner = asyncio.ensure_future(pricer.run())
+            # a burst on A is coalesced, the last 5Y quote wins
+            for spread in (0.0041, 0.0042, 0.0043):
+                await pricer.submit(SpreadTick('A', '5Y', spread))
+            await asyncio.sleep(0)
+            while not pricer.ticks.empty():
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.01)
+            await pricer.submit(RateTick('5Y', 0.025))
+            await pricer.close()
+            await asyncio.gather(runner, consumer)
+
+        asyncio.run(stream())
+        self.assertEqual(updates[0].positions.tolist(), [0, 2])
+        self.assertEqual(len(updates[0].ticks), 3)
+        self.assertEqual(updates[-1].positions.tolist(), [0, 1, 2, 3])
+        spreads = dict(self.spreads, A=self.spreads['A'][:5] + [0.0043] + self.spreads['A'][6:])
+        # the spreads a batch started from are swapped out, never changed
+        self.assertEqual(original, self.spreads)
+        self.assertEqual(pricer.book.credit_spreads, spreads)
+        rates = list(self.market.rates)
+        rates[self.market.expiries.index('5Y')] = 0.025
+        expected = self.expected(spreads, rates)
+        np.testing.assert_allclose(pricer.dirty_pv, expected['dirty_pv'], rtol=1e-10)
+        np.testing.assert_allclose(pricer.cs01, expected['cs01'], rtol=1e-8)
+        after_spreads = self.expected(spreads, self.market.rates)
+        np.testing.assert_allclose(updates[0].dirty_pv, after_spreads['dirty_pv'][[0, 2]], rtol=1e-10)
+        summary = pricer.latency_summary()
+        self.assertEqual(summary['tick_to_price']['count'], 4)
+        self.assertEqual(summary['curves']['count'], len(updates))
+        self.assertRaises(ValueError, asyncio.run, pricer.submit(SpreadTick('C', '5Y', 0.01)))
+
+    def testLatencyHistogram(self):
+        histogram = LatencyHistogram()
+        for seconds in [0.001] * 98 + [0.1, 0.2]:
+            histogram.record(seconds)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(50), 0.001, delta=0.0002)
+        self.assertAlmostEqual(histogram.percentile(99), 0.1, delta=0.02)
+        self.assertEqual(histogram.summary()['max'], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import date
+import io
+import unittest
+
+from isda.backend import get_interface
+from isda.c_interface import TDateInterval
+from isda.isda_model import ISDAModel
+from isda.market_data import Market_Data
+from isda_model_fixtures import VALUATION_DATE, c_library_available, make_trade
+
+THREADS = 16
+ROUNDS = 2
+
+
+class ConcurrentPricingStressTest:
+    """Prices the same trades serially and then from many threads at once, the results must match."""
+
+    backend = None
+
+    def setUp(self):
+        self.trades = [make_trade(maturity_date=date(2019 + i % 10, 12, 20), is_buy_protection=bool(i % 2),
+                                  running_coupon=(100, 500)[i % 2], recovery_rate=(0.4, 0.25)[i % 3 == 0])
+                       for i in range(THREADS * 2)]
+
+    def price(self, cds):
+        return ISDAModel(cds, Market_Data(VALUATION_DATE), backend=self.backend).single_name_pricer()
+
+    def testConcurrentMatchesSerial(self):
+        with redirect_stdout(io.StringIO()):
+            serial = [self.price(cds) for cds in self.trades]
+            with ThreadPoolExecutor(max_workers=THREADS) as pool:
+                concurrent = list(pool.map(self.price, self.trades * ROUNDS))
+        for i, result in enumerate(concurrent):
+            self.assertEqual(result, serial[i % len(self.trades)])
+
+
+@unittest.skipUnless(c_library_available(), 'ISDA_Clib.dll cannot be loaded on this platform')
+class TestThreadSafeCInterface(ConcurrentPricingStressTest, unittest.TestCase):
+    backend = 'c_threadsafe'
+
+    def testFailuresAreRecordedPerThread(self):
+        interface = get_interface(self.backend)
+        interface.clear_errors()
+        interface.JpmcdsStringToDateInterval('not a tenor', 'test', TDateInterval())
+        self.assertEqual([name for name, _, _ in interface.errors()], ['JpmcdsStringToDateInterval'])
+        self.assertNotEqual(interface.errors()[0][2], '')
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            self.assertEqual(pool.submit(interface.errors).result(), [])
+
+
+class TestNumpyInterface(ConcurrentPricingStressTest, unittest.TestCase):
+    backend = 'numpy'
+
+
+if __name__ == "__main__":
+    unittest.main()